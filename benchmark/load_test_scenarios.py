@@ -28,9 +28,10 @@ class DistributedSystemUser(HttpUser):
         acquire_payload = {
             "resource_id": self.resource_id,
             "lock_type": "exclusive",
-            "client_id": self.client_id
+            "client_id": self.client_id,
+            "wait": 10  # Menunggu grant di server, bukan mengulang acquire
         }
-        with self.client.post("/lock/acquire", json=acquire_payload, name="/lock/acquire") as response:
+        with self.client.post("/lock/acquire", json=acquire_payload, name="/lock/acquire", catch_response=True) as response:
             if not response.json().get("success"):
                 response.failure(f"Failed to acquire lock for {self.resource_id}")
                 return # Hentikan tugas jika gagal mendapatkan lock
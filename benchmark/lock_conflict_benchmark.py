@@ -0,0 +1,59 @@
+# benchmark/lock_conflict_benchmark.py
+#
+# Mengukur biaya satu acquire yang konflik (masuk wait list + cek deadlock) saat
+# tabel lock membesar. Dijalankan langsung tanpa cluster:
+#   python -m benchmark.lock_conflict_benchmark
+# Kolom 'rebuild' mensimulasikan cara lama: Wait-For Graph dibangun ulang dari
+# seluruh _wait_list setiap konflik. Kolom 'incremental' memakai LockManager saat ini.
+
+import logging
+import time
+from collections import defaultdict
+from src.nodes.lock_manager import LockManager
+
+TABLE_SIZES = [1_000, 10_000, 50_000, 100_000]
+CONFLICTS = 2_000
+
+
+def build_manager(size):
+    """'size' resource terkunci, masing-masing dengan satu waiter."""
+    manager = LockManager()
+    for i in range(size):
+        manager._internal_handle_acquire(f"res{i}", "exclusive", f"owner{i}")
+        manager._internal_handle_acquire(f"res{i}", "exclusive", f"waiter{i}")
+    return manager
+
+
+def rebuild_graph(manager):
+    graph = defaultdict(set)
+    for resource, waiters in manager._wait_list.items():
+        owners = manager._locks.get(resource, {}).get('owners', set())
+        for waiter in waiters:
+            graph[waiter].update(owners)
+    return graph
+
+
+def measure(manager, size, rebuild):
+    """Rata-rata mikrodetik per konflik: klien baru menunggu resource acak lalu dilepas dari wait list."""
+    start = time.perf_counter()
+    for n in range(CONFLICTS):
+        resource, client = f"res{(n * 7919) % size}", f"bench{n}"
+        if rebuild:
+            rebuild_graph(manager)
+        manager._internal_handle_acquire(resource, "exclusive", client)
+        manager._remove_client_from_all_wait_lists(client)
+    return (time.perf_counter() - start) / CONFLICTS * 1e6
+
+
+def main():
+    logging.disable(logging.CRITICAL)  # Log per acquire tidak ikut diukur
+    print(f"{'resources':>10} {'incremental (us)':>18} {'rebuild (us)':>14}")
+    for size in TABLE_SIZES:
+        manager = build_manager(size)
+        incremental = measure(manager, size, rebuild=False)
+        rebuild = measure(manager, size, rebuild=True) if size <= 10_000 else float('nan')
+        print(f"{size:>10} {incremental:>18.1f} {rebuild:>14.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,172 @@
+# src/communication/binary_transport.py
+
+import asyncio
+import itertools
+import logging
+import struct
+import weakref
+from urllib.parse import urlsplit
+import msgpack
+from ..utils.config import RPC_BINARY_PORT_OFFSET
+from ..utils.metrics import increment_counter
+
+# Frame: header (jenis, request id, panjang body) + body msgpack.
+# Request body = [endpoint, data]; response body = hasil handler (atau None).
+FRAME_HEADER = struct.Struct("!BII")
+KIND_REQUEST = 0
+KIND_RESPONSE = 1
+MAX_FRAME_SIZE = 64 * 1024 * 1024
+
+_handlers = {}  # endpoint -> async handler(data) -> dict atau None
+_connections = weakref.WeakKeyDictionary()  # event loop -> {peer_url: PeerConnection}
+
+
+def register_handler(endpoint, handler):
+    """Mendaftarkan handler RPC internal yang dilayani lewat transport biner."""
+    _handlers[endpoint] = handler
+
+
+def has_handler(endpoint):
+    # Semua node menjalankan kode yang sama: endpoint yang terdaftar lokal juga ada di peer
+    return endpoint in _handlers
+
+
+def binary_address(peer_url):
+    """Alamat transport biner peer: host yang sama, port HTTP + RPC_BINARY_PORT_OFFSET."""
+    parts = urlsplit(peer_url)
+    return parts.hostname, parts.port + RPC_BINARY_PORT_OFFSET
+
+
+def _encode_frame(kind, request_id, payload):
+    body = msgpack.packb(payload, use_bin_type=True)
+    return FRAME_HEADER.pack(kind, request_id, len(body)) + body
+
+
+async def _read_frame(reader):
+    kind, request_id, length = FRAME_HEADER.unpack(await reader.readexactly(FRAME_HEADER.size))
+    if length > MAX_FRAME_SIZE:
+        raise ValueError(f"Frame too large: {length} bytes")
+    body = await reader.readexactly(length)
+    return kind, request_id, msgpack.unpackb(body, raw=False)
+
+
+class PeerConnection:
+    """
+    Satu koneksi TCP long-lived ke satu peer. Banyak RPC berjalan bersamaan di
+    koneksi yang sama dan respons dicocokkan lewat request id, sehingga heartbeat
+    tidak perlu menunggu RPC lain selesai (multiplexing).
+    """
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+        self._read_task = None
+        self._pending = {}  # request_id -> future
+        self._ids = itertools.count(1)
+        self._connect_lock = asyncio.Lock()
+
+    async def call(self, endpoint, data):
+        await self._ensure_connected()
+        request_id = next(self._ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            frame = _encode_frame(KIND_REQUEST, request_id, [endpoint, data])
+            self._writer.write(frame)
+            increment_counter("rpc_binary_bytes_sent", len(frame))
+            await self._writer.drain()
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _ensure_connected(self):
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+            self._read_task = asyncio.create_task(self._read_loop(self._reader, self._writer))
+
+    async def _read_loop(self, reader, writer):
+        try:
+            while True:
+                _, request_id, result = await _read_frame(reader)
+                future = self._pending.get(request_id)
+                if future is not None and not future.done():
+                    future.set_result(result)
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+            # Koneksi putus: RPC yang masih menunggu gagal (None), koneksi baru dibuat saat call berikutnya
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_result(None)
+
+    async def close(self):
+        if self._writer is not None:
+            self._writer.close()
+        if self._read_task is not None:
+            self._read_task.cancel()
+
+
+async def call(peer_url, endpoint, data, timeout):
+    """RPC lewat transport biner; None jika gagal/timeout (sama seperti send_rpc HTTP)."""
+    connections = _connections.setdefault(asyncio.get_running_loop(), {})
+    connection = connections.get(peer_url)
+    if connection is None:
+        connection = connections[peer_url] = PeerConnection(*binary_address(peer_url))
+    try:
+        return await asyncio.wait_for(connection.call(endpoint, data), timeout)
+    except (OSError, asyncio.TimeoutError):
+        return None
+
+
+async def close_connections():
+    """Menutup semua koneksi biner milik event loop saat ini (dipanggil saat shutdown)."""
+    for connection in _connections.pop(asyncio.get_running_loop(), {}).values():
+        await connection.close()
+
+
+class BinaryRpcServer:
+    """Listener TCP untuk RPC biner; setiap request diproses sebagai task terpisah."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        logging.info(f"Binary RPC server listening on {self.host}:{self.port}")
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle_connection(self, reader, writer):
+        try:
+            while True:
+                _, request_id, (endpoint, data) = await _read_frame(reader)
+                asyncio.create_task(self._dispatch(writer, request_id, endpoint, data))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, writer, request_id, endpoint, data):
+        handler = _handlers.get(endpoint)
+        result = None
+        if handler is None:
+            logging.warning(f"Binary RPC for unknown endpoint {endpoint}")
+        else:
+            try:
+                result = await handler(data)
+            except Exception as e:
+                logging.error(f"Error handling binary RPC {endpoint}: {e}", exc_info=True)
+        if not writer.is_closing():
+            writer.write(_encode_frame(KIND_RESPONSE, request_id, result))
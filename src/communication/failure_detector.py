@@ -1,59 +1,131 @@
 # src/communication/failure_detector.py
 
-import asyncio
+import math
 import time
-import logging
-from .message_passing import send_rpc
+from collections import deque
+from ..utils.config import (
+    PHI_THRESHOLD, PHI_WINDOW_SIZE, PHI_MIN_STD, PHI_ACCEPTABLE_PAUSE,
+    PHI_FIRST_HEARTBEAT_ESTIMATE, PHI_PROBE_INTERVAL,
+)
+
+
+class _ArrivalWindow:
+    """Jendela bergulir interval antar-bukti (inter-arrival) untuk satu peer."""
+
+    def __init__(self, size):
+        self._intervals = deque(maxlen=size)
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def add(self, interval):
+        if len(self._intervals) == self._intervals.maxlen:
+            oldest = self._intervals[0]
+            self._sum -= oldest
+            self._sum_sq -= oldest * oldest
+        self._intervals.append(interval)
+        self._sum += interval
+        self._sum_sq += interval * interval
+
+    def __len__(self):
+        return len(self._intervals)
+
+    def mean(self):
+        return self._sum / len(self._intervals)
+
+    def std(self):
+        mean = self.mean()
+        return math.sqrt(max(self._sum_sq / len(self._intervals) - mean * mean, 0.0))
+
 
 class FailureDetector:
     """
-    Implementasi failure detector berbasis heartbeat (pull model).
-    Setiap node secara aktif memeriksa kesehatan peer-nya.
+    Phi-accrual failure detector (Hayashibara dkk.). Tidak mengirim ping sendiri:
+    setiap respons RPC dan setiap RPC Raft yang masuk dari peer dicatat sebagai
+    bukti hidup lewat heartbeat(). Dari distribusi interval antar-bukti dihitung
+    phi = -log10(P(bukti berikutnya datang selambat ini)); peer dianggap
+    suspected jika phi > threshold.
+
+    Keheningan hanya dihitung selama ada RPC ke peer yang belum dijawab
+    (expect()), sehingga pasangan node yang memang jarang berkomunikasi tidak
+    ikut dicurigai. Peer dikunci dengan URL-nya.
     """
-    def __init__(self, node_id, peers, check_interval=2.0, failure_timeout=5.0):
-        self.node_id = node_id
-        self.peers = peers
-        self.check_interval = check_interval
-        self.failure_timeout = failure_timeout
-        # Lacak status setiap peer: 'UP' atau 'DOWN'
-        self.peer_status = {peer_id: 'UP' for peer_id in self.peers.keys()}
-        # Lacak kapan terakhir kali peer merespons
-        self.last_ack_time = {peer_id: time.time() for peer_id in self.peers.keys()}
-        self.is_running = False
-
-    async def monitor_peers(self):
-        """Tugas background yang berjalan terus-menerus untuk memantau peer."""
-        logging.info(f"[{self.node_id}] Failure Detector started.")
-        self.is_running = True
-        while self.is_running:
-            # Periksa setiap peer secara paralel
-            tasks = [self._check_peer(peer_id, peer_url) for peer_id, peer_url in self.peers.items()]
-            await asyncio.gather(*tasks)
-            
-            # Perbarui status berdasarkan waktu ack terakhir
-            current_time = time.time()
-            for peer_id in self.peers.keys():
-                if current_time - self.last_ack_time[peer_id] > self.failure_timeout:
-                    if self.peer_status[peer_id] == 'UP':
-                        self.peer_status[peer_id] = 'DOWN'
-                        logging.warning(f"[{self.node_id}] Peer {peer_id} detected as DOWN.")
-                else:
-                    if self.peer_status[peer_id] == 'DOWN':
-                        self.peer_status[peer_id] = 'UP'
-                        logging.info(f"[{self.node_id}] Peer {peer_id} is back UP.")
-
-            await asyncio.sleep(self.check_interval)
-
-    async def _check_peer(self, peer_id, peer_url):
-        """Mengirim ping/health check ke satu peer."""
-        response = await send_rpc(peer_url, 'health', {'from': self.node_id})
-        if response and response.get('status') == 'ok':
-            # Jika berhasil, perbarui waktu ack
-            self.last_ack_time[peer_id] = time.time()
-
-    def get_alive_peers(self):
-        """Mengembalikan daftar peer_id yang saat ini dianggap UP."""
-        return [peer_id for peer_id, status in self.peer_status.items() if status == 'UP']
-    
-    def stop(self):
-        self.is_running = False
\ No newline at end of file
+
+    def __init__(self, threshold=PHI_THRESHOLD, window_size=PHI_WINDOW_SIZE, min_std=PHI_MIN_STD,
+                 acceptable_pause=PHI_ACCEPTABLE_PAUSE, first_heartbeat_estimate=PHI_FIRST_HEARTBEAT_ESTIMATE,
+                 probe_interval=PHI_PROBE_INTERVAL):
+        self.threshold = threshold
+        self.window_size = window_size
+        self.min_std = min_std
+        self.acceptable_pause = acceptable_pause
+        self.first_heartbeat_estimate = first_heartbeat_estimate
+        self.probe_interval = probe_interval
+        self._windows = {}          # peer -> _ArrivalWindow
+        self._last_arrival = {}     # peer -> waktu bukti terakhir
+        self._awaiting_since = {}   # peer -> waktu RPC pertama yang belum dijawab
+        self._last_probe = {}       # peer -> waktu request terakhir yang diloloskan saat suspected
+
+    def expect(self, peer, now=None):
+        """Dipanggil saat RPC dikirim ke peer: mulai sekarang keheningan peer dihitung."""
+        self._awaiting_since.setdefault(peer, time.monotonic() if now is None else now)
+
+    def heartbeat(self, peer, now=None):
+        """Mencatat bukti hidup peer (respons RPC atau RPC masuk dari peer)."""
+        now = time.monotonic() if now is None else now
+        last = self._last_arrival.get(peer)
+        if last is not None and now > last:
+            self._windows.setdefault(peer, _ArrivalWindow(self.window_size)).add(now - last)
+        self._last_arrival[peer] = now
+        self._awaiting_since.pop(peer, None)
+        self._last_probe.pop(peer, None)
+
+    def phi(self, peer, now=None):
+        """Tingkat kecurigaan terhadap peer; 0 jika tidak sedang menunggu jawaban darinya."""
+        awaiting_since = self._awaiting_since.get(peer)
+        if awaiting_since is None:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        elapsed = now - max(self._last_arrival.get(peer, awaiting_since), awaiting_since)
+
+        window = self._windows.get(peer)
+        if window:
+            mean, std = window.mean(), window.std()
+        else:
+            # Belum ada statistik: pakai perkiraan awal (std = mean / 4)
+            mean, std = self.first_heartbeat_estimate, self.first_heartbeat_estimate / 4
+        mean += self.acceptable_pause
+        std = max(std, self.min_std)
+
+        # Aproksimasi logistik CDF distribusi normal; y dibatasi agar exp() tidak overflow
+        y = max((elapsed - mean) / std, -10.0)
+        e = math.exp(-y * (1.5976 + 0.070566 * y * y))
+        if elapsed > mean:
+            return -math.log10(max(e / (1.0 + e), 1e-300))
+        return -math.log10(1.0 - 1.0 / (1.0 + e))
+
+    def is_suspected(self, peer, now=None):
+        return self.phi(peer, now) > self.threshold
+
+    def allow_request(self, peer, now=None):
+        """
+        True jika request ke peer boleh dikirim. Peer yang suspected ditolak
+        langsung, kecuali satu request per probe_interval yang diloloskan sebagai
+        probe agar kecurigaan bisa pulih tanpa ping terpisah.
+        """
+        now = time.monotonic() if now is None else now
+        if not self.is_suspected(peer, now):
+            return True
+        if now - self._last_probe.get(peer, float('-inf')) >= self.probe_interval:
+            self._last_probe[peer] = now
+            return True
+        return False
+
+    def status(self, peers):
+        """Nilai phi dan status suspected per peer_id (untuk endpoint /status)."""
+        return {
+            peer_id: {"phi": round(self.phi(url), 2), "suspected": self.is_suspected(url)}
+            for peer_id, url in peers.items()
+        }
+
+
+# Satu detector per proses, diisi oleh send_rpc dan handler RPC peer di base_node
+detector = FailureDetector()
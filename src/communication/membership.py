@@ -0,0 +1,231 @@
+# src/communication/membership.py
+
+import asyncio
+import logging
+import math
+import random
+import time
+from ..utils.config import (
+    SWIM_PROBE_INTERVAL, SWIM_INDIRECT_PROBES, SWIM_SUSPECT_TIMEOUT,
+    SWIM_RETRANSMIT_MULT, SWIM_MAX_PIGGYBACK,
+)
+from .message_passing import send_rpc, gather_until
+
+ALIVE = "alive"
+SUSPECT = "suspect"
+DEAD = "dead"
+
+
+class SwimMembership:
+    """
+    Membership berbasis gossip ala SWIM (Das dkk.). Setiap periode node mem-ping
+    SATU member (round-robin acak); jika tidak ada ack, SWIM_INDIRECT_PROBES member
+    lain diminta mem-ping target (ping_req) sebelum target dinyatakan suspect.
+    Suspect yang tidak membantah (incarnation lebih tinggi) dalam
+    SWIM_SUSPECT_TIMEOUT menjadi dead. Perubahan status disebarkan dengan
+    menumpang (piggyback) pada ping/ack, sehingga trafik per node konstan dan
+    trafik cluster tumbuh linear terhadap jumlah node.
+
+    'peers' adalah dict {node_id: url} member hidup (alive/suspect) selain diri
+    sendiri; dict yang sama dipakai CacheNode dan QueueNode sehingga ikut
+    berubah. Listener dipanggil sebagai listener(node_id, url, joined).
+    """
+
+    def __init__(self, node_id, url, seeds, probe_interval=SWIM_PROBE_INTERVAL,
+                 indirect_probes=SWIM_INDIRECT_PROBES, suspect_timeout=SWIM_SUSPECT_TIMEOUT):
+        self.node_id = node_id
+        self.url = url
+        self.probe_interval = probe_interval
+        self.indirect_probes = indirect_probes
+        self.suspect_timeout = suspect_timeout
+        # Incarnation berbasis waktu: node yang restart otomatis mengalahkan status dead lamanya
+        self.incarnation = int(time.time() * 1000)
+
+        self.members = {}  # node_id -> {'url', 'state', 'incarnation'}; dead disimpan sebagai tombstone
+        self.peers = {}
+        self.seeds = {seed_id: seed_url for seed_id, seed_url in seeds.items() if seed_id != node_id}
+        for seed_id, seed_url in self.seeds.items():
+            # Seed dianggap hidup sampai terbukti sebaliknya (incarnation 0 kalah dari yang asli)
+            self.members[seed_id] = {'url': seed_url, 'state': ALIVE, 'incarnation': 0}
+            self.peers[seed_id] = seed_url
+
+        self._updates = {}  # node_id -> [update, jumlah kali sudah dikirim]
+        self._suspect_timers = {}
+        self._probe_order = []
+        self._listeners = []
+        self._enqueue(self._self_update())
+
+    def add_listener(self, listener):
+        self._listeners.append(listener)
+
+    # --- Loop protokol ---
+    async def run(self):
+        await self.join()
+        while True:
+            await self._probe_round()
+            await asyncio.sleep(self.probe_interval)
+
+    async def join(self):
+        """Meminta daftar member lengkap dari seed pertama yang menjawab."""
+        for seed_url in self.seeds.values():
+            resp = await send_rpc(seed_url, 'swim/join', {'member': self._self_update()})
+            if resp:
+                self._merge(resp.get('members', []))
+                logging.info(f"[{self.node_id}] Joined cluster via {seed_url}: {len(self.peers)} peer(s)")
+                return True
+        logging.warning(f"[{self.node_id}] No seed reachable, starting with seed list only")
+        return False
+
+    async def leave(self):
+        """Keluar dengan baik: umumkan diri sendiri dead ke beberapa member."""
+        self.incarnation += 1
+        update = dict(self._self_update(), state=DEAD)
+        targets = random.sample(list(self.peers.values()), min(self.indirect_probes, len(self.peers)))
+        await gather_until({url: send_rpc(url, 'swim/ping', {'from': self.node_id, 'updates': [update]})
+                            for url in targets})
+
+    async def _probe_round(self):
+        target = self._next_probe_target()
+        if target is None:
+            return
+        member = self.members[target]
+        if await self._ping(member['url']):
+            return
+        # Ping langsung gagal: minta member lain mem-ping target (menghindari false positive jaringan)
+        helpers = [peer_id for peer_id in self.peers if peer_id != target]
+        helpers = random.sample(helpers, min(self.indirect_probes, len(helpers)))
+        payload = {'from': self.node_id, 'target': member['url'], 'updates': self._piggyback()}
+        responses = await gather_until(
+            {peer_id: send_rpc(self.peers[peer_id], 'swim/ping_req', payload) for peer_id in helpers},
+            predicate=lambda r: any(resp and resp.get('ack') for resp in r.values()),
+        )
+        for resp in responses.values():
+            if resp:
+                self._merge(resp.get('updates', []))
+        if any(resp and resp.get('ack') for resp in responses.values()):
+            return
+        member = self.members.get(target)
+        if member is not None and member['state'] == ALIVE:
+            logging.warning(f"[{self.node_id}] Member {target} did not answer direct or indirect probes, suspecting")
+            self._apply({'id': target, 'url': member['url'], 'state': SUSPECT, 'incarnation': member['incarnation']})
+
+    def _next_probe_target(self):
+        """Round-robin atas urutan acak: setiap member di-probe sekali per putaran."""
+        while self._probe_order:
+            candidate = self._probe_order.pop()
+            if candidate in self.peers:
+                return candidate
+        if not self.peers:
+            return None
+        self._probe_order = list(self.peers)
+        random.shuffle(self._probe_order)
+        return self._probe_order.pop()
+
+    async def _ping(self, url):
+        resp = await send_rpc(url, 'swim/ping', {'from': self.node_id, 'updates': self._piggyback()})
+        if resp:
+            self._merge(resp.get('updates', []))
+        return bool(resp and resp.get('ack'))
+
+    # --- Handler RPC ---
+    async def handle_join(self, data):
+        self._apply(data['member'])
+        members = [self._self_update()] + [
+            {'id': member_id, **member} for member_id, member in self.members.items() if member['state'] != DEAD
+        ]
+        return {'members': members}
+
+    async def handle_ping(self, data):
+        self._merge(data.get('updates', []))
+        return {'ack': True, 'updates': self._piggyback()}
+
+    async def handle_ping_req(self, data):
+        self._merge(data.get('updates', []))
+        return {'ack': await self._ping(data['target']), 'updates': self._piggyback()}
+
+    # --- Penyebaran update ---
+    def _self_update(self):
+        return {'id': self.node_id, 'url': self.url, 'state': ALIVE, 'incarnation': self.incarnation}
+
+    def _enqueue(self, update):
+        self._updates[update['id']] = [update, 0]
+
+    def _piggyback(self):
+        """Update yang paling jarang dikirim; dibuang setelah ~mult * log(n) kali."""
+        limit = SWIM_RETRANSMIT_MULT * math.ceil(math.log2(len(self.members) + 2))
+        selected = sorted(self._updates.values(), key=lambda item: item[1])[:SWIM_MAX_PIGGYBACK]
+        for item in selected:
+            item[1] += 1
+            if item[1] >= limit:
+                self._updates.pop(item[0]['id'], None)
+        return [item[0] for item in selected]
+
+    def _merge(self, updates):
+        for update in updates:
+            self._apply(update)
+
+    def _apply(self, update):
+        member_id, state, incarnation = update['id'], update['state'], update['incarnation']
+        if member_id == self.node_id:
+            if state != ALIVE and incarnation >= self.incarnation:
+                # Bantah kecurigaan tentang diri sendiri dengan incarnation baru
+                self.incarnation = incarnation + 1
+                self._enqueue(self._self_update())
+            return
+
+        current = self.members.get(member_id)
+        if not self._overrides(state, incarnation, current):
+            return
+        self.members[member_id] = {'url': update['url'], 'state': state, 'incarnation': incarnation}
+        self._enqueue(update)
+
+        timer = self._suspect_timers.pop(member_id, None)
+        if timer is not None:
+            timer.cancel()
+        if state == DEAD:
+            if self.peers.pop(member_id, None) is not None:
+                logging.warning(f"[{self.node_id}] Member {member_id} is dead, removed from membership")
+                self._notify(member_id, update['url'], False)
+            return
+        if state == SUSPECT:
+            self._suspect_timers[member_id] = asyncio.create_task(self._expire_suspect(member_id, incarnation))
+        old_url = self.peers.get(member_id)
+        if old_url is not None and old_url != update['url']:
+            # Member rejoin dengan alamat lain: listener melihat leave (URL lama) lalu join (URL baru)
+            del self.peers[member_id]
+            logging.info(f"[{self.node_id}] Member {member_id} moved from {old_url} to {update['url']}")
+            self._notify(member_id, old_url, False)
+        if member_id not in self.peers:
+            self.peers[member_id] = update['url']
+            logging.info(f"[{self.node_id}] Member {member_id} joined at {update['url']}")
+            self._notify(member_id, update['url'], True)
+
+    @staticmethod
+    def _overrides(state, incarnation, current):
+        """Aturan prioritas SWIM: incarnation lebih tinggi menang; suspect > alive, dead > keduanya."""
+        if current is None:
+            return state != DEAD
+        if current['state'] == DEAD:
+            return state == ALIVE and incarnation > current['incarnation']
+        if state == DEAD:
+            return True
+        if state == SUSPECT:
+            if current['state'] == ALIVE:
+                return incarnation >= current['incarnation']
+            return incarnation > current['incarnation']
+        return incarnation > current['incarnation']
+
+    async def _expire_suspect(self, member_id, incarnation):
+        await asyncio.sleep(self.suspect_timeout)
+        member = self.members.get(member_id)
+        if member is not None and member['state'] == SUSPECT and member['incarnation'] == incarnation:
+            self._suspect_timers.pop(member_id, None)
+            self._apply({'id': member_id, 'url': member['url'], 'state': DEAD, 'incarnation': incarnation})
+
+    def _notify(self, member_id, url, joined):
+        for listener in self._listeners:
+            listener(member_id, url, joined)
+
+    def status(self):
+        return {member_id: {'state': member['state'], 'incarnation': member['incarnation']}
+                for member_id, member in self.members.items()}
@@ -3,37 +3,106 @@
 import aiohttp
 import asyncio
 import logging
+import weakref
+from ..utils.config import RPC_POOL_SIZE, RPC_KEEPALIVE_TIMEOUT, RPC_TIMEOUT, RPC_ENDPOINT_TIMEOUTS, RPC_TRANSPORT
+from . import binary_transport
+from .failure_detector import detector
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
+# Satu ClientSession (pool koneksi keep-alive) per peer, hidup selama umur node.
+# Session aiohttp terikat pada event loop pembuatnya, jadi pool dipisah per loop.
+_pools = weakref.WeakKeyDictionary()  # event loop -> {peer_url: ClientSession}
+_background_calls = set()  # Referensi ke RPC straggler yang dibiarkan selesai di background
+
+
+def _get_session(peer_url):
+    sessions = _pools.setdefault(asyncio.get_running_loop(), {})
+    session = sessions.get(peer_url)
+    if session is None or session.closed:
+        connector = aiohttp.TCPConnector(limit=RPC_POOL_SIZE, keepalive_timeout=RPC_KEEPALIVE_TIMEOUT)
+        session = aiohttp.ClientSession(connector=connector)
+        sessions[peer_url] = session
+    return session
+
+
+def rpc_timeout(endpoint):
+    """Timeout (detik) untuk endpoint RPC; heartbeat dan vote jauh lebih pendek dari snapshot."""
+    return RPC_ENDPOINT_TIMEOUTS.get(endpoint, RPC_TIMEOUT)
+
+
+async def close_sessions():
+    """Menutup semua pool koneksi milik event loop saat ini (dipanggil saat shutdown)."""
+    sessions = _pools.pop(asyncio.get_running_loop(), {})
+    for session in sessions.values():
+        await session.close()
+    await binary_transport.close_connections()
+
+
 async def send_rpc(peer_url, endpoint, data):
-    """Mengirim pesan RPC ke node lain dan mengembalikan respons."""
+    """
+    Mengirim pesan RPC ke node lain dan mengembalikan respons. Dengan
+    RPC_TRANSPORT=binary, endpoint internal yang terdaftar dikirim lewat
+    transport biner; endpoint lain (mis. path dengan parameter) tetap lewat HTTP.
+    """
+    # Setiap jawaban peer menjadi bukti hidup untuk failure detector (tanpa ping terpisah)
+    detector.expect(peer_url)
+    if RPC_TRANSPORT == 'binary' and binary_transport.has_handler(endpoint):
+        result = await binary_transport.call(peer_url, endpoint, data, rpc_timeout(endpoint))
+        if result is not None:
+            detector.heartbeat(peer_url)
+        return result
     url = f"{peer_url}/{endpoint}"
-    timeout = aiohttp.ClientTimeout(total=1.0) # Timeout 1 detik
-    async with aiohttp.ClientSession(timeout=timeout) as session:
-        try:
-            async with session.post(url, json=data) as response:
-                if response.status == 200:
-                    return await response.json()
+    timeout = aiohttp.ClientTimeout(total=rpc_timeout(endpoint))
+    session = _get_session(peer_url)
+    try:
+        async with session.post(url, json=data, timeout=timeout) as response:
+            detector.heartbeat(peer_url)
+            if response.status == 200:
+                return await response.json()
+            else:
+                # Jangan cetak error jika hanya timeout, itu normal
+                if response.status != 504:
+                     logging.warning(f"Failed to send RPC to {url}: Status {response.status}")
+                return None
+    except (aiohttp.ClientConnectorError, aiohttp.ServerDisconnectedError, asyncio.TimeoutError):
+        # Ini adalah kegagalan jaringan yang diharapkan, tidak perlu log error
+        return None
+    except Exception as e:
+        logging.error(f"An unexpected error occurred during RPC to {url}: {e}")
+        return None
+
+
+async def gather_until(calls, predicate=None, timeout=None, cancel_pending=True):
+    """
+    Menjalankan coroutine {key: coroutine} bersamaan dan kembali begitu
+    predicate(responses) bernilai True, semua selesai, atau timeout habis.
+    'responses' hanya berisi hasil yang sudah tiba (call yang error = None).
+    Call yang belum selesai dibatalkan, atau dibiarkan selesai di background
+    jika cancel_pending=False (mis. invalidasi yang tetap harus sampai).
+    """
+    loop = asyncio.get_running_loop()
+    tasks = {asyncio.ensure_future(coro): key for key, coro in calls.items()}
+    pending = set(tasks)
+    responses = {}
+    deadline = None if timeout is None else loop.time() + timeout
+    try:
+        while pending and not (predicate is not None and predicate(responses)):
+            remaining = None if deadline is None else deadline - loop.time()
+            if remaining is not None and remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled() or task.exception() is not None:
+                    responses[tasks[task]] = None
                 else:
-                    # Jangan cetak error jika hanya timeout, itu normal
-                    if response.status != 504:
-                         logging.warning(f"Failed to send RPC to {url}: Status {response.status}")
-                    return None
-        except (aiohttp.ClientConnectorError, asyncio.TimeoutError):
-            # Ini adalah kegagalan jaringan yang diharapkan, tidak perlu log error
-            return None
-        except Exception as e:
-            logging.error(f"An unexpected error occurred during RPC to {url}: {e}")
-            return None
-
-
-async def broadcast_rpc(peers, endpoint, data):
-    """Menyiarkan pesan RPC ke semua peer secara paralel."""
-    tasks = []
-    for peer_url in peers.values():
-        task = asyncio.create_task(send_rpc(peer_url, endpoint, data))
-        tasks.append(task)
-    
-    responses = await asyncio.gather(*tasks)
-    return responses
\ No newline at end of file
+                    responses[tasks[task]] = task.result()
+    finally:
+        for task in pending:
+            if cancel_pending:
+                task.cancel()
+            else:
+                _background_calls.add(task)
+                task.add_done_callback(_background_calls.discard)
+    return responses
+
@@ -0,0 +1,174 @@
+# src/consensus/multi_raft.py
+
+import asyncio
+import logging
+import os
+from ..utils.config import HEARTBEAT_COALESCE_WINDOW
+from ..utils.consistent_hash import ConsistentHashRing
+from ..utils.metrics import increment_counter
+from ..communication.message_passing import send_rpc
+from .raft import RaftNode, NodeState
+from .wal import WriteAheadLog
+from .snapshot import SnapshotStore
+
+# Virtual node per grup di ring; lebih banyak = pembagian resource antar grup lebih rata
+GROUP_RING_REPLICAS = 64
+
+
+class HeartbeatBatcher:
+    """
+    Menggabungkan heartbeat dari beberapa grup Raft yang menuju peer yang sama
+    menjadi satu RPC /append_entries_batch. Heartbeat ditahan paling lama
+    'window' detik; entri log tetap dikirim langsung per grup.
+    """
+
+    def __init__(self, window=HEARTBEAT_COALESCE_WINDOW):
+        self.window = window
+        self._pending = {}  # peer_id -> [(payload, future)]
+
+    async def send(self, peer_id, peer_url, payload):
+        future = asyncio.get_running_loop().create_future()
+        batch = self._pending.get(peer_id)
+        if batch is None:
+            batch = self._pending[peer_id] = []
+            asyncio.create_task(self._flush(peer_id, peer_url))
+        batch.append((payload, future))
+        return await future
+
+    async def _flush(self, peer_id, peer_url):
+        batch = self._pending[peer_id]
+        try:
+            await asyncio.sleep(self.window)
+            del self._pending[peer_id]
+            resp = await send_rpc(peer_url, 'append_entries_batch', {'requests': [payload for payload, _ in batch]})
+            responses = (resp.get('responses') if resp else None) or []
+            increment_counter("raft_heartbeat_batches")
+            increment_counter("raft_heartbeats_coalesced", len(batch))
+            for (_, future), response in zip(batch, responses):
+                if not future.done():
+                    future.set_result(response)
+        except Exception as e:
+            logging.warning(f"Heartbeat batch to {peer_id} failed: {e}")
+        finally:
+            if self._pending.get(peer_id) is batch:
+                del self._pending[peer_id]
+            # Error RPC, respons yang lebih pendek dari batch, atau task dibatalkan:
+            # sisa heartbeat dianggap tanpa respons agar replikator grup tidak menggantung
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+
+class MultiRaft:
+    """
+    Membagi namespace lock ke beberapa grup Raft independen. resource_id dipetakan
+    ke grup lewat ConsistentHashRing; setiap grup punya log, WAL, snapshot, dan
+    state machine sendiri, dan leader tiap grup disebar ke node berbeda lewat
+    timeout election yang lebih pendek di node 'preferred'.
+    Dengan num_groups=1 perilakunya sama dengan satu RaftNode biasa.
+    """
+
+    def __init__(self, node_id, peers, num_groups, state_machine_factory, data_dir=None, segment_size=None):
+        self.node_id = node_id
+        self.peers = peers
+        all_nodes = sorted(list(peers) + [node_id])
+        multi = num_groups > 1
+        self.heartbeat_batcher = HeartbeatBatcher() if multi else None
+
+        self.groups = {}
+        for position in range(num_groups):
+            # Grup tunggal tidak diberi id agar payload RPC dan direktori data tetap seperti semula
+            group_id = f"g{position}" if multi else None
+            storage = snapshot_store = None
+            if data_dir is not None:
+                group_dir = os.path.join(data_dir, group_id) if multi else data_dir
+                wal_kwargs = {'segment_size': segment_size} if segment_size else {}
+                storage = WriteAheadLog(group_dir, **wal_kwargs)
+                snapshot_store = SnapshotStore(group_dir)
+            self.groups[group_id] = RaftNode(
+                node_id, peers, state_machine_factory(),
+                storage=storage, snapshot_store=snapshot_store,
+                group_id=group_id,
+                preferred_leader=multi and all_nodes[position % len(all_nodes)] == node_id,
+                heartbeat_batcher=self.heartbeat_batcher,
+            )
+        self._ring = ConsistentHashRing(nodes=list(self.groups), replicas=GROUP_RING_REPLICAS) if multi else None
+        logging.info(f"[{self.node_id}] Multi-Raft initialised with {num_groups} group(s)")
+
+    async def run(self):
+        """Menjalankan semua grup di event loop yang sama."""
+        await asyncio.gather(*(group.run() for group in self.groups.values()))
+
+    async def close(self):
+        """Flush dan tutup WAL semua grup (dipanggil saat server shutdown)."""
+        for group in self.groups.values():
+            if group.storage is not None:
+                await group.storage.close()
+
+    def group(self, group_id):
+        """Grup untuk RPC masuk; None jika group_id tidak dikenal."""
+        return self.groups.get(group_id)
+
+    def group_for(self, resource_id):
+        """Grup Raft yang bertanggung jawab atas resource_id."""
+        if self._ring is None:
+            return next(iter(self.groups.values()))
+        return self.groups[self._ring.get_node(resource_id)]
+
+    def group_for_command(self, command):
+        """Grup tujuan command: 'group_id' eksplisit (command fan-out) atau pemilik resource_id."""
+        if 'group_id' in command:
+            return self.groups.get(command['group_id'])
+        return self.group_for(command['resource_id'])
+
+    async def handle_client_request(self, command, forwarded=False):
+        group = self.group_for_command(command)
+        if group is None:
+            return {"success": False, "message": f"Unknown group {command.get('group_id')}"}
+        return await group.handle_client_request(command, forwarded=forwarded)
+
+    async def handle_client_request_all(self, command, merge_key='released'):
+        """
+        Command yang tidak terikat satu resource (mis. release_all, keepalive) diajukan ke
+        setiap grup, karena resource milik klien bisa tersebar di semua grup; daftar
+        resource di hasil tiap grup (merge_key) digabung.
+        """
+        results = await asyncio.gather(*(group.handle_client_request({**command, 'group_id': group_id})
+                                          for group_id, group in self.groups.items()))
+        failed = [result for result in results if not result.get('success')]
+        resources = sorted(resource for result in results for resource in result.get(merge_key, []))
+        if failed:
+            return {"success": False, merge_key: resources, "failed_groups": failed,
+                    "message": f"{len(failed)} of {len(results)} group(s) failed"}
+        return {"success": True, merge_key: resources, "message": f"{merge_key.capitalize()} {len(resources)} lock(s)"}
+
+    async def read_lock_info(self, resource_id):
+        """Pembacaan linearizable state lock satu resource dari grup pemiliknya."""
+        group = self.group_for(resource_id)
+        return await group.linearizable_read(lambda: group.lock_manager.get_lock_info(resource_id))
+
+    async def handle_append_entries_batch(self, requests):
+        """Memproses heartbeat gabungan: satu respons per grup, urutan sama dengan request."""
+        return await asyncio.gather(*(self._handle_batched_append(data) for data in requests))
+
+    async def _handle_batched_append(self, data):
+        group = self.group(data.get('group_id'))
+        if group is None:
+            return {'term': 0, 'success': False}
+        return await group.handle_append_entries(
+            data['term'], data['leader_id'], data.get('prev_log_index', -1),
+            data.get('prev_log_term', 0), data['entries'], data['leader_commit'],
+        )
+
+    def leader_counts(self):
+        """Jumlah grup yang dipimpin node ini (untuk melihat sebaran leadership)."""
+        return sum(1 for group in self.groups.values() if group.state == NodeState.LEADER)
+
+    def get_locks_status(self):
+        """Gabungan status lock dari semua grup."""
+        active_locks, wait_list = {}, {}
+        for group in self.groups.values():
+            status = group.lock_manager.get_locks_status()
+            active_locks.update(status["active_locks"])
+            wait_list.update(status["wait_list"])
+        return {"active_locks": active_locks, "wait_list": wait_list}
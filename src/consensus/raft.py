@@ -1,36 +1,127 @@
 import asyncio
+import base64
+import heapq
+import itertools
 import random
 import logging
+import time
 from enum import Enum
-from ..utils.config import ELECTION_TIMEOUT_MIN, ELECTION_TIMEOUT_MAX, HEARTBEAT_INTERVAL
-from ..communication.message_passing import broadcast_rpc, send_rpc
+from ..utils.config import (
+    ELECTION_TIMEOUT_MIN, ELECTION_TIMEOUT_MAX, HEARTBEAT_INTERVAL,
+    PROPOSAL_BATCH_WINDOW, MAX_PROPOSAL_BATCH, MAX_INFLIGHT_APPENDS, REPLICATION_CHUNK_SIZE,
+    SNAPSHOT_THRESHOLD, SNAPSHOT_CHUNK_SIZE, LEASE_READS, LEASE_DURATION_RATIO, READ_INDEX_TIMEOUT,
+    LOCK_FORWARD_MODE, LOCK_TICK_INTERVAL,
+)
+from ..communication.message_passing import send_rpc, gather_until
+from ..communication.failure_detector import detector
+from ..utils.metrics import increment_counter, record_latency
+from .snapshot import encode_snapshot, decode_snapshot
 
 class NodeState(Enum):
     FOLLOWER = 1
     CANDIDATE = 2
     LEADER = 3
 
+# Entri kosong yang di-commit leader baru di awal term-nya (dibutuhkan ReadIndex)
+NOOP_COMMAND = {'action': 'noop'}
+
 class RaftNode:
-    def __init__(self, node_id, peers, lock_manager):
+    def __init__(self, node_id, peers, lock_manager, storage=None, snapshot_store=None,
+                 group_id=None, preferred_leader=False, heartbeat_batcher=None):
         self.node_id = node_id
         self.peers = peers
+        self.group_id = group_id  # Multi-Raft: ikut dikirim di setiap RPC agar peer memilih grup yang benar
+        self.preferred_leader = preferred_leader  # Timeout lebih pendek agar leadership tersebar antar node
+        self.heartbeat_batcher = heartbeat_batcher  # Menggabungkan heartbeat beberapa grup per peer
         self.state = NodeState.FOLLOWER
         self.current_term = 0
         self.voted_for = None
+        # Log entries setelah snapshot: self.log[0] adalah index snapshot_index + 1
         self.log = []  # Log entries: { 'term': term, 'command': command }
+        self.snapshot_index = -1
+        self.snapshot_term = 0
         self.commit_index = -1
         self.last_applied = -1
         self.leader_id = None
         self.lock_manager = lock_manager
+        self.storage = storage  # WriteAheadLog (opsional); None = hanya in-memory
+        self.snapshot_store = snapshot_store  # SnapshotStore (opsional)
+        self._snapshot_data = None  # Bytes snapshot terakhir (dikirim lewat InstallSnapshot)
+        self._snapshot_task = None
+        # Snapshot lokal dan InstallSnapshot tidak boleh menulis file snapshot bersamaan
+        self._snapshot_save_lock = asyncio.Lock()
+        self._incoming_snapshot = None  # Buffer chunk InstallSnapshot yang sedang diterima
+        self._apply_waiters = []  # heap (index, seq, future) menunggu last_applied >= index
+        self._waiter_seq = itertools.count()
+
+        if self.snapshot_store is not None:
+            data = self.snapshot_store.load()
+            if data is not None:
+                self._restore_snapshot(data)
+        if self.storage is not None:
+            # Pulihkan hard state dan log dari disk; entri setelah snapshot akan
+            # diterapkan ulang saat commit_index diketahui kembali dari leader.
+            self.current_term, self.voted_for, self.log = self.storage.load(self.snapshot_index)
+
+        # --- State leader (diinisialisasi ulang setiap kali menang election) ---
+        self.next_index = {}        # peer_id -> index entri berikutnya yang akan dikirim
+        self.match_index = {}       # peer_id -> index tertinggi yang diketahui sudah direplikasi
+        self._durable_index = self._last_log_index()  # index tertinggi yang sudah di-fsync lokal
+        self._inflight = {}         # peer_id -> jumlah AppendEntries yang sedang berjalan
+        self._probing = {}          # peer_id -> True jika posisi log follower belum diketahui
+        self._peer_events = {}      # peer_id -> Event untuk membangunkan replicator
+        self._sending_snapshot = {} # peer_id -> True selama InstallSnapshot berjalan
+        self._proposals = []        # [(command, future)] menunggu dimasukkan ke batch
+        self._proposal_event = asyncio.Event()
+        self._proposer_task = None
+        self._client_waiters = {}   # log index -> future hasil state machine untuk klien
+        self._apply_lock = asyncio.Lock()
+        self._last_ack_sent = {}    # peer_id -> waktu kirim heartbeat terakhir yang di-ack (lease)
+        self._confirm_round = None  # Putaran konfirmasi leadership yang sedang dikumpulkan (ReadIndex)
+        self._last_leader_contact = None  # loop.time() terakhir menerima RPC dari leader
+        self._loop = None           # Event loop tempat Raft berjalan
 
         self._reset_election_timeout()
 
+    # --- Akses log (index global, memperhitungkan snapshot) ---
+    def _last_log_index(self):
+        return self.snapshot_index + len(self.log)
+
+    def _last_log_term(self):
+        return self.log[-1]['term'] if self.log else self.snapshot_term
+
+    def _term_at(self, index):
+        """Term entri di 'index'; None jika sudah ter-compact atau belum ada."""
+        if index == self.snapshot_index:
+            return self.snapshot_term
+        if index < 0:
+            return 0
+        position = index - self.snapshot_index - 1
+        if position < 0 or position >= len(self.log):
+            return None
+        return self.log[position]['term']
+
+    def _entry_at(self, index):
+        return self.log[index - self.snapshot_index - 1]
+
+    def _entries_between(self, first_index, last_index):
+        base = self.snapshot_index + 1
+        return self.log[first_index - base:last_index - base + 1]
+
     def _reset_election_timeout(self):
-        self.election_timeout = random.uniform(ELECTION_TIMEOUT_MIN, ELECTION_TIMEOUT_MAX)
-        self.time_since_last_contact = 0.0
+        """Menggeser deadline election; dipanggil setiap ada RPC valid dari leader/candidate."""
+        midpoint = (ELECTION_TIMEOUT_MIN + ELECTION_TIMEOUT_MAX) / 2
+        if self.preferred_leader:
+            self.election_timeout = random.uniform(ELECTION_TIMEOUT_MIN, midpoint)
+        elif self.group_id is not None:
+            self.election_timeout = random.uniform(midpoint, ELECTION_TIMEOUT_MAX)
+        else:
+            self.election_timeout = random.uniform(ELECTION_TIMEOUT_MIN, ELECTION_TIMEOUT_MAX)
+        self._election_deadline = time.monotonic() + self.election_timeout
 
     async def run(self):
         """Main loop untuk node Raft."""
+        self._loop = asyncio.get_running_loop()
         logging.info(f"[{self.node_id}] Starting as {self.state.name} in term {self.current_term}")
         while True:
             if self.state == NodeState.FOLLOWER:
@@ -40,149 +131,850 @@ class RaftNode:
             elif self.state == NodeState.LEADER:
                 await self._run_leader()
 
+    def _with_group(self, payload):
+        if self.group_id is None:
+            return payload
+        return {**payload, 'group_id': self.group_id}
+
+    async def _rpc(self, peer_url, endpoint, payload):
+        return await send_rpc(peer_url, endpoint, self._with_group(payload))
+
+    async def _in_raft_loop(self, handler, *args):
+        """
+        Menjalankan handler di event loop Raft. Server ASGI menjalankan Raft dan handler
+        HTTP di loop yang sama sehingga handler langsung dipanggil; jalur
+        run_coroutine_threadsafe hanya untuk embedding Raft di thread/loop terpisah.
+        """
+        if self._loop is None or asyncio.get_running_loop() is self._loop:
+            return await handler(*args)
+        future = asyncio.run_coroutine_threadsafe(handler(*args), self._loop)
+        return await asyncio.wrap_future(future)
+
     async def _run_follower(self):
-        await asyncio.sleep(0.1)
-        self.time_since_last_contact += 0.1
-        if self.time_since_last_contact > self.election_timeout:
-            logging.info(f"[{self.node_id}] Follower timeout, becoming Candidate.")
-            self.state = NodeState.CANDIDATE
+        # Tidur tepat sampai deadline; RPC yang masuk selama itu menggeser deadline
+        # sehingga setelah bangun cukup dicek ulang (tanpa polling berkala).
+        remaining = self._election_deadline - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+            return
+        logging.info(f"[{self.node_id}] Follower timeout, becoming Candidate.")
+        self.state = NodeState.CANDIDATE
 
     async def _run_candidate(self):
-        self.current_term += 1
-        self.voted_for = self.node_id
         self._reset_election_timeout()
-        
-        votes_received = 1
-        
-        request_vote_payload = {
-            'term': self.current_term,
+        vote_payload = {
+            'term': self.current_term + 1,
             'candidate_id': self.node_id,
-            'last_log_index': len(self.log) - 1,
-            'last_log_term': self.log[-1]['term'] if self.log else 0,
+            'last_log_index': self._last_log_index(),
+            'last_log_term': self._last_log_term(),
         }
 
-        responses = await broadcast_rpc(self.peers, 'request_vote', request_vote_payload)
+        # Pre-vote: jangan menaikkan term (dan mengganggu leader yang sehat) kecuali
+        # mayoritas juga sudah kehilangan kontak dengan leader.
+        if not await self._collect_votes('pre_vote', vote_payload, self.current_term):
+            if self.state == NodeState.CANDIDATE:
+                logging.info(f"[{self.node_id}] Pre-vote for term {vote_payload['term']} failed. Reverting to FOLLOWER.")
+                self.state = NodeState.FOLLOWER
+            return
 
-        for resp in responses:
-            if resp and resp.get('vote_granted'):
-                votes_received += 1
-        
-        if votes_received > (len(self.peers) + 1) / 2:
+        self.current_term += 1
+        self.voted_for = self.node_id
+        self.leader_id = None
+        await self._persist_hard_state()
+        vote_payload['term'] = self.current_term
+
+        if await self._collect_votes('request_vote', vote_payload, self.current_term):
             logging.info(f"[{self.node_id}] Won election for term {self.current_term}. Becoming LEADER.")
-            self.state = NodeState.LEADER
-            self.leader_id = self.node_id
-        else:
+            self._become_leader()
+        elif self.state == NodeState.CANDIDATE:
             logging.info(f"[{self.node_id}] Lost election for term {self.current_term}. Reverting to FOLLOWER.")
             self.state = NodeState.FOLLOWER
 
+    async def _collect_votes(self, endpoint, payload, term):
+        """
+        Mengirim pre_vote/request_vote ke semua peer dan berhenti segera setelah
+        mayoritas memberi suara (peer yang mati tidak ditunggu sampai timeout RPC).
+        True hanya jika menang dan masih candidate di term yang sama.
+        """
+        majority = (len(self.peers) + 1) // 2 + 1
+
+        def granted(responses):
+            return 1 + sum(1 for resp in responses.values() if resp and resp.get('vote_granted'))
+
+        def decided(responses):
+            if self.state != NodeState.CANDIDATE or self.current_term != term:
+                return True
+            if any(resp and resp.get('term', 0) > self.current_term for resp in responses.values()):
+                return True
+            return granted(responses) >= majority
+
+        responses = await gather_until(
+            {peer_id: self._rpc(url, endpoint, payload) for peer_id, url in self.peers.items()},
+            decided, timeout=max(self._election_deadline - time.monotonic(), 0),
+        )
+        if self.state != NodeState.CANDIDATE or self.current_term != term:
+            return False  # Sudah menerima leader/term yang lebih baru selama election
+        higher_term = max((resp.get('term', 0) for resp in responses.values() if resp), default=0)
+        if higher_term > self.current_term:
+            self._step_down(higher_term)
+            await self._persist_hard_state()
+            return False
+        return granted(responses) >= majority
+
+    def _become_leader(self):
+        self.state = NodeState.LEADER
+        self.leader_id = self.node_id
+        self.next_index = {peer_id: self._last_log_index() + 1 for peer_id in self.peers}
+        self.match_index = {peer_id: -1 for peer_id in self.peers}
+        self._inflight = {peer_id: 0 for peer_id in self.peers}
+        self._probing = {peer_id: True for peer_id in self.peers}
+        self._sending_snapshot = {peer_id: False for peer_id in self.peers}
+        self._peer_events = {peer_id: asyncio.Event() for peer_id in self.peers}
+        self._last_ack_sent = {}
+        self._proposer_task = asyncio.create_task(self._run_proposer(self.current_term))
+        for peer_id in self.peers:
+            asyncio.create_task(self._run_replicator(peer_id, self.current_term))
+        # No-op agar entri term ini segera committed; sebelum itu commit_index leader
+        # belum tentu terbaru sehingga ReadIndex harus menunggu.
+        asyncio.create_task(self._propose(NOOP_COMMAND))
+        asyncio.create_task(self._run_lease_ticker(self.current_term))
+
+    def _step_down(self, term=None):
+        """Kembali menjadi follower; future klien yang belum commit digagalkan."""
+        was_leader = self.state == NodeState.LEADER
+        if term is not None and term > self.current_term:
+            self.current_term = term
+            self.voted_for = None
+        self.state = NodeState.FOLLOWER
+        if was_leader:
+            logging.info(f"[{self.node_id}] Stepping down from LEADER in term {self.current_term}.")
+            self._fail_pending_requests("Leadership lost before the command was committed.")
+
+    def _fail_pending_requests(self, message):
+        result = {"success": False, "leader": self.leader_id, "message": message}
+        for _, future in self._proposals:
+            if not future.done():
+                future.set_result(result)
+        self._proposals = []
+        for future in self._client_waiters.values():
+            if not future.done():
+                future.set_result(result)
+        self._client_waiters = {}
+
     async def _run_leader(self):
-        heartbeat_payload = {
-            'term': self.current_term,
-            'leader_id': self.node_id,
-            'leader_commit': self.commit_index,
-            'entries': []
-        }
-        await broadcast_rpc(self.peers, 'append_entries', heartbeat_payload)
+        # Heartbeat dan replikasi dikirim oleh replicator per follower (_run_replicator)
         await asyncio.sleep(HEARTBEAT_INTERVAL)
 
     async def handle_request_vote(self, term, candidate_id, last_log_index, last_log_term):
+        return await self._in_raft_loop(
+            self._handle_request_vote, term, candidate_id, last_log_index, last_log_term
+        )
+
+    async def handle_pre_vote(self, term, candidate_id, last_log_index, last_log_term):
+        """Pre-vote: apakah kita akan memilih candidate di 'term'? Tidak mengubah state apa pun."""
+        return await self._in_raft_loop(
+            self._handle_pre_vote, term, candidate_id, last_log_index, last_log_term
+        )
+
+    async def _handle_pre_vote(self, term, candidate_id, last_log_index, last_log_term):
+        vote_granted = (
+            term > self.current_term
+            and not self._heard_from_leader_recently()
+            and self._log_is_up_to_date(last_log_index, last_log_term)
+        )
+        return {'term': self.current_term, 'vote_granted': vote_granted}
+
+    def _log_is_up_to_date(self, last_log_index, last_log_term):
+        my_last_log_term = self._last_log_term()
+        return last_log_term > my_last_log_term or \
+            (last_log_term == my_last_log_term and last_log_index >= self._last_log_index())
+
+    async def _handle_request_vote(self, term, candidate_id, last_log_index, last_log_term):
         if term < self.current_term:
             return {'term': self.current_term, 'vote_granted': False}
-        
+
+        # Selama masih mendengar leader aktif, abaikan candidate lain: lease leader
+        # bergantung pada jaminan bahwa tidak ada leader baru sebelum ELECTION_TIMEOUT_MIN.
+        if candidate_id != self.leader_id and self._heard_from_leader_recently():
+            logging.info(f"[{self.node_id}] Ignoring vote request from {candidate_id}: current leader is alive.")
+            return {'term': self.current_term, 'vote_granted': False}
+
+        hard_state_changed = False
         if term > self.current_term:
-            self.current_term = term
-            self.state = NodeState.FOLLOWER
-            self.voted_for = None
+            self._step_down(term)
+            hard_state_changed = True
 
         vote_granted = False
         if (self.voted_for is None or self.voted_for == candidate_id):
-            my_last_log_term = self.log[-1]['term'] if self.log else 0
-            my_last_log_index = len(self.log) - 1
-            if last_log_term > my_last_log_term or \
-               (last_log_term == my_last_log_term and last_log_index >= my_last_log_index):
+            if self._log_is_up_to_date(last_log_index, last_log_term):
                 self.voted_for = candidate_id
                 vote_granted = True
+                hard_state_changed = True
                 self._reset_election_timeout()
                 logging.info(f"[{self.node_id}] Voted for {candidate_id} in term {self.current_term}")
 
+        # Vote hanya boleh dikirim setelah term/voted_for durable
+        if hard_state_changed:
+            await self._persist_hard_state()
+
         return {'term': self.current_term, 'vote_granted': vote_granted}
 
-    # <<< PERBAIKI INDENTASI DI SINI
     async def handle_append_entries(self, term, leader_id, prev_log_index, prev_log_term, entries, leader_commit):
         """Menangani heartbeat dan entri log dari leader."""
+        return await self._in_raft_loop(
+            self._handle_append_entries, term, leader_id, prev_log_index, prev_log_term, entries, leader_commit
+        )
+
+    async def _handle_append_entries(self, term, leader_id, prev_log_index, prev_log_term, entries, leader_commit):
         if term < self.current_term:
             return {'term': self.current_term, 'success': False}
 
-        self._reset_election_timeout()
-        if term > self.current_term:
-            self.current_term = term
-            self.voted_for = None
-        self.state = NodeState.FOLLOWER
-        self.leader_id = leader_id
+        await self._accept_leader(term, leader_id)
 
-        if prev_log_index > -1 and (len(self.log) <= prev_log_index or self.log[prev_log_index]['term'] != prev_log_term):
+        # Entri yang sudah tercakup snapshot pasti sudah committed: lewati bagian itu
+        if prev_log_index < self.snapshot_index:
+            skip = self.snapshot_index - prev_log_index
+            entries = entries[skip:]
+            prev_log_index, prev_log_term = self.snapshot_index, self.snapshot_term
+
+        if prev_log_index > -1 and self._term_at(prev_log_index) != prev_log_term:
             logging.warning(f"[{self.node_id}] Log consistency check failed at index {prev_log_index}.")
-            return {'term': self.current_term, 'success': False}
+            return {'term': self.current_term, 'success': False, **self._conflict_hint(prev_log_index)}
 
+        appended = False
         if entries:
-            self.log = self.log[:prev_log_index + 1]
-            self.log.extend(entries)
-            logging.info(f"[{self.node_id}] Follower accepted and appended {len(entries)} entries.")
+            # Batch pipelined bisa tiba tidak berurutan: hanya potong log jika ada
+            # konflik term, entri yang sudah cocok dilewati (tanpa menyalin log).
+            index = prev_log_index + 1
+            for offset, entry in enumerate(entries):
+                existing_term = self._term_at(index + offset)
+                if existing_term is None:
+                    await self._append_to_log(entries[offset:])
+                    appended = True
+                    break
+                if existing_term != entry['term']:
+                    await self._truncate_log(index + offset)
+                    await self._append_to_log(entries[offset:])
+                    appended = True
+                    break
+            logging.info(f"[{self.node_id}] Follower accepted {len(entries)} entries after index {prev_log_index}.")
+
+        # Entri yang cocok bisa saja baru ada di memori (fsync dari handler lain belum
+        # selesai). Ack dihitung leader untuk commit, jadi tunggu sampai WAL durable;
+        # append milik handler ini sudah menunggu semua penulisan sebelumnya (urutan FIFO).
+        if not appended and self.storage is not None:
+            await self.storage.sync()
 
+        # Hanya entri yang sudah diverifikasi cocok dengan leader yang boleh di-commit
+        last_new_index = prev_log_index + len(entries)
         if leader_commit > self.commit_index:
-            self.commit_index = min(leader_commit, len(self.log) - 1)
+            self.commit_index = max(self.commit_index, min(leader_commit, last_new_index))
             await self._apply_log_entries()
 
         return {'term': self.current_term, 'success': True}
 
-    # <<< PERBAIKI INDENTASI DI SINI
-    async def handle_client_request(self, command):
-        """Menangani permintaan dari klien dengan replikasi yang benar."""
+    async def _accept_leader(self, term, leader_id):
+        """RPC valid dari leader: reset timer, ikuti term leader, dan kembali menjadi follower."""
+        self._reset_election_timeout()
+        self._last_leader_contact = asyncio.get_running_loop().time()
+        if term > self.current_term:
+            self._step_down(term)
+            await self._persist_hard_state()
+        elif self.state != NodeState.FOLLOWER:
+            self._step_down()
+        self.leader_id = leader_id
+
+    def _heard_from_leader_recently(self):
+        if self.state == NodeState.LEADER:
+            return self._lease_valid()
+        if self._last_leader_contact is None:
+            return False
+        return asyncio.get_running_loop().time() - self._last_leader_contact < ELECTION_TIMEOUT_MIN
+
+    def _conflict_hint(self, prev_log_index):
+        """
+        Petunjuk agar leader bisa mundur satu term sekaligus, bukan satu index per RPC:
+        - log terlalu pendek -> conflict_index = panjang log, conflict_term = None
+        - term berbeda -> conflict_term = term entri kita, conflict_index = index pertama term itu
+        """
+        if self._last_log_index() < prev_log_index:
+            return {'conflict_index': self._last_log_index() + 1, 'conflict_term': None}
+        conflict_term = self._term_at(prev_log_index)
+        conflict_index = prev_log_index
+        while conflict_index - 1 > self.snapshot_index and self._term_at(conflict_index - 1) == conflict_term:
+            conflict_index -= 1
+        return {'conflict_index': conflict_index, 'conflict_term': conflict_term}
+
+    # --- Leader proposal pipeline ---
+    async def handle_client_request(self, command, forwarded=False):
+        """
+        Menangani permintaan dari klien dengan replikasi yang benar. Di follower,
+        command diteruskan ke leader (LOCK_FORWARD_MODE=proxy); command yang sudah
+        di-forward tidak diteruskan lagi agar tidak terjadi loop saat leader berganti.
+        """
+        return await self._in_raft_loop(self._route_client_request, command, forwarded)
+
+    async def handle_blocking_acquire(self, command, wait):
+        """
+        Acquire yang menunggu sampai lock diberikan atau 'wait' detik habis. Grant dari
+        wait queue diterapkan di setiap replika, jadi node penerima request (leader maupun
+        follower) cukup menunggu state machine lokalnya tanpa polling. Saat timeout klien
+        dikeluarkan dari wait queue lewat command 'cancel_wait'.
+        """
+        start_time = time.time()
+        resource_id, client_id = command['resource_id'], command['client_id']
+        grant = self.lock_manager.watch_grant(resource_id, client_id)
+        try:
+            result = await self.handle_client_request(command)
+            if not result.get('waiting'):
+                return result
+            try:
+                result = await asyncio.wait_for(asyncio.shield(grant), timeout=wait)
+                increment_counter("lock_wait_grants")
+                record_latency("lock_wait_latency", start_time)
+                return result
+            except asyncio.TimeoutError:
+                pass
+
+            cancel = await self.handle_client_request(
+                {'action': 'cancel_wait', 'resource_id': resource_id, 'client_id': client_id})
+            if grant.done():
+                return grant.result()
+            if 'fencing_token' in cancel:
+                # Grant diterapkan di leader sebelum cancel_wait, tetapi belum sampai ke replika ini
+                return {"success": True, "message": "Lock granted", "fencing_token": cancel['fencing_token']}
+            increment_counter("lock_wait_timeouts")
+            if not cancel.get('success'):
+                logging.warning(f"[{self.node_id}] cancel_wait for {client_id} on {resource_id} failed: {cancel.get('message')}")
+                return {"success": False, "waiting": True,
+                        "message": f"Timed out waiting for lock; request may still be in wait list ({cancel.get('message')})"}
+            return {"success": False, "message": "Timed out waiting for lock"}
+        finally:
+            self.lock_manager.unwatch_grant(resource_id, client_id, grant)
+
+    async def _route_client_request(self, command, forwarded):
+        if self.state == NodeState.LEADER or forwarded or LOCK_FORWARD_MODE != 'proxy':
+            return await self._propose(command)
+        leader_url = self.peers.get(self.leader_id)
+        if leader_url is None:
+            return {"success": False, "leader": self.leader_id, "message": "Not a leader"}
+        increment_counter("raft_forwarded_requests")
+        resp = await send_rpc(leader_url, 'client_request', {'command': command})
+        if resp is None:
+            return {"success": False, "leader": self.leader_id, "message": "Failed to forward request to leader"}
+        return resp
+
+    async def _propose(self, command):
+        """
+        Memasukkan command ke antrian proposal dan menunggu hasilnya dari state machine.
+        Command yang datang dalam jendela yang sama dikirim sebagai satu batch AppendEntries.
+        """
         if self.state != NodeState.LEADER:
             return {"success": False, "leader": self.leader_id, "message": "Not a leader"}
 
-        new_entry_index = len(self.log)
-        log_entry = {'term': self.current_term, 'command': command}
-        self.log.append(log_entry)
-        logging.info(f"[{self.node_id}] Leader received command, appended to log at index {new_entry_index}")
+        future = asyncio.get_running_loop().create_future()
+        self._proposals.append((command, future))
+        self._proposal_event.set()
+        return await future
+
+    async def _run_proposer(self, term):
+        """Task leader: mengumpulkan proposal menjadi batch lalu mereplikasikannya secara pipelined."""
+        while self.state == NodeState.LEADER and self.current_term == term:
+            await self._proposal_event.wait()
+            # Beri kesempatan command lain yang datang bersamaan untuk ikut batch ini
+            await asyncio.sleep(PROPOSAL_BATCH_WINDOW)
+            self._proposal_event.clear()
+            if self.state != NodeState.LEADER or self.current_term != term:
+                break
+
+            batch = self._proposals[:MAX_PROPOSAL_BATCH]
+            self._proposals = self._proposals[MAX_PROPOSAL_BATCH:]
+            if self._proposals:
+                self._proposal_event.set()
+            if not batch:
+                continue
+
+            first_index = self._last_log_index() + 1
+            entries = [{'term': self.current_term, 'command': command} for command, _ in batch]
+            for offset, (_, future) in enumerate(batch):
+                self._client_waiters[first_index + offset] = future
+            last_index = first_index + len(entries) - 1
+            logging.info(f"[{self.node_id}] Leader appended batch of {len(entries)} commands at index {first_index}..{last_index}")
+            increment_counter("raft_proposal_batches")
+            increment_counter("raft_proposed_commands", len(entries))
+
+            # fsync lokal dan pengiriman ke follower berjalan paralel
+            self.log.extend(entries)
+            asyncio.create_task(self._persist_leader_entries(first_index, entries))
+            for event in self._peer_events.values():
+                event.set()
+
+    async def _run_lease_ticker(self, term):
+        """
+        Task leader: mengajukan command 'tick' berisi waktu leader selama ada lease aktif.
+        Lease kedaluwarsa saat tick diterapkan, sehingga semua replika melepasnya
+        pada entri log yang sama tanpa bergantung pada jam masing-masing.
+        """
+        while self.state == NodeState.LEADER and self.current_term == term:
+            if self.lock_manager.needs_tick():
+                await self._propose({'action': 'tick', 'now': time.time()})
+            await asyncio.sleep(LOCK_TICK_INTERVAL)
+
+    async def _persist_leader_entries(self, first_index, entries):
+        if self.storage is not None:
+            await self.storage.append(first_index, entries)
+        self._durable_index = max(self._durable_index, first_index + len(entries) - 1)
+        await self._advance_commit_index()
+
+    # --- Replikasi per follower (nextIndex / matchIndex) ---
+    async def _run_replicator(self, peer_id, term):
+        """
+        Task leader per follower. Bangun saat ada entri baru, atau setiap
+        HEARTBEAT_INTERVAL untuk mengirim heartbeat (yang juga membawa
+        prev_log_index sehingga follower yang tertinggal terdeteksi).
+        """
+        event = self._peer_events[peer_id]
+        heartbeat_due = True  # Heartbeat pertama langsung dikirim untuk menegaskan leadership
+        while self.state == NodeState.LEADER and self.current_term == term:
+            self._replicate_to(peer_id, heartbeat_due)
+            try:
+                await asyncio.wait_for(event.wait(), timeout=HEARTBEAT_INTERVAL)
+                heartbeat_due = False
+            except asyncio.TimeoutError:
+                heartbeat_due = True
+            event.clear()
 
-        success_count = 1
-        
-        prev_log_index = new_entry_index - 1
-        prev_log_term = self.log[prev_log_index]['term'] if prev_log_index >= 0 else 0
-        
+    def _replicate_to(self, peer_id, heartbeat_due=False):
+        """
+        Mengirim entri mulai next_index[peer] dalam chunk REPLICATION_CHUNK_SIZE.
+        Mode probe: satu RPC sekaligus sampai posisi follower diketahui.
+        Mode pipeline: next_index dimajukan secara optimis, hingga MAX_INFLIGHT_APPENDS chunk.
+        Jika entri yang dibutuhkan sudah ter-compact, kirim snapshot (InstallSnapshot).
+        Follower yang dicurigai failure detector hanya menerima heartbeat (probe)
+        sampai menjawab lagi, tanpa entri atau snapshot yang pasti menunggu timeout.
+        """
+        if self._sending_snapshot[peer_id]:
+            return
+        if detector.is_suspected(self.peers[peer_id]):
+            if heartbeat_due:
+                first_index = max(self.next_index[peer_id], self.snapshot_index + 1)
+                asyncio.create_task(self._send_append_entries(peer_id, first_index, first_index - 1))
+            return
+        if self.next_index[peer_id] <= self.snapshot_index:
+            self._sending_snapshot[peer_id] = True
+            asyncio.create_task(self._send_snapshot(peer_id))
+            return
+
+        last_index = self._last_log_index()
+        sent = False
+        while self.next_index[peer_id] <= last_index and self._inflight[peer_id] < MAX_INFLIGHT_APPENDS:
+            if self._probing[peer_id] and self._inflight[peer_id] > 0:
+                break
+            start = self.next_index[peer_id]
+            end = min(start + REPLICATION_CHUNK_SIZE - 1, last_index)
+            asyncio.create_task(self._send_append_entries(peer_id, start, end))
+            sent = True
+            if self._probing[peer_id]:
+                break
+            self.next_index[peer_id] = end + 1
+
+        if heartbeat_due and not sent:
+            # Heartbeat kosong tetap membawa prev_log_index agar konsistensi diperiksa
+            asyncio.create_task(self._send_append_entries(peer_id, self.next_index[peer_id], self.next_index[peer_id] - 1))
+
+    async def _send_append_entries(self, peer_id, first_index, last_index):
+        """
+        Mengirim entri [first_index..last_index] (kosong = heartbeat) ke satu follower.
+        Mengembalikan True jika follower mengakui leadership kita di term ini.
+        """
+        term = self.current_term
+        prev_log_index = first_index - 1
+        prev_log_term = self._term_at(prev_log_index)
+        if prev_log_term is None:
+            # Entri sudah ter-compact sejak chunk ini dijadwalkan; replicator akan mengirim snapshot
+            self.next_index[peer_id] = min(self.next_index[peer_id], first_index)
+            self._peer_events[peer_id].set()
+            return False
         payload = {
-            'term': self.current_term,
+            'term': term,
             'leader_id': self.node_id,
             'prev_log_index': prev_log_index,
             'prev_log_term': prev_log_term,
-            'entries': [log_entry],
+            'entries': self._entries_between(first_index, last_index),
             'leader_commit': self.commit_index
         }
-        
-        responses = await broadcast_rpc(self.peers, 'append_entries', payload)
-
-        for resp in responses:
-            if resp and resp.get('success'):
-                success_count += 1
-        
-        if success_count > (len(self.peers) + 1) / 2:
-            self.commit_index = new_entry_index
-            logging.info(f"[{self.node_id}] Leader committed entry at index {self.commit_index} with {success_count} votes.")
-            
-            await self._apply_log_entries()
-            return {"success": True, "message": "Command committed and applied by the cluster."}
+        sent_at = asyncio.get_running_loop().time()
+        self._inflight[peer_id] += 1
+        try:
+            if not payload['entries'] and self.heartbeat_batcher is not None:
+                resp = await self.heartbeat_batcher.send(peer_id, self.peers[peer_id], self._with_group(payload))
+            else:
+                resp = await self._rpc(self.peers[peer_id], 'append_entries', payload)
+        finally:
+            self._inflight[peer_id] -= 1
+
+        if self.state != NodeState.LEADER or self.current_term != term:
+            return False
+        if resp is None:
+            # Follower tidak merespons: kembali ke posisi yang pasti cocok, coba lagi saat heartbeat
+            self._probing[peer_id] = True
+            self.next_index[peer_id] = min(self.next_index[peer_id], self.match_index[peer_id] + 1)
+            return False
+        if resp.get('term', 0) > self.current_term:
+            self._step_down(resp['term'])
+            await self._persist_hard_state()
+            return False
+
+        # Respons di term yang sama = follower mengakui kita sebagai leader saat sent_at
+        self._last_ack_sent[peer_id] = max(self._last_ack_sent.get(peer_id, sent_at), sent_at)
+
+        if resp.get('success'):
+            self._probing[peer_id] = False
+            self.next_index[peer_id] = max(self.next_index[peer_id], last_index + 1)
+            if last_index > self.match_index[peer_id]:
+                self.match_index[peer_id] = last_index
+                await self._advance_commit_index()
+        elif prev_log_index >= self.match_index[peer_id]:
+            self._probing[peer_id] = True
+            self.next_index[peer_id] = self._next_index_from_hint(peer_id, resp)
+            increment_counter("raft_replication_rejections")
+
+        # Masih ada entri yang perlu dikirim (catch-up / pipeline berikutnya)
+        if self.next_index[peer_id] <= self._last_log_index():
+            self._peer_events[peer_id].set()
+        return True
+
+    def _next_index_from_hint(self, peer_id, resp):
+        """Menentukan next_index baru dari conflict_term/conflict_index follower."""
+        conflict_index = resp.get('conflict_index')
+        conflict_term = resp.get('conflict_term')
+        if conflict_index is None:
+            next_index = self.next_index[peer_id] - 1  # Follower lama tanpa hint
+        elif conflict_term is None:
+            next_index = conflict_index
         else:
-            self.log.pop()
-            logging.warning(f"[{self.node_id}] Failed to replicate entry, only received {success_count} confirmations.")
-            return {"success": False, "message": "Failed to achieve consensus for the command."}
+            # Jika leader punya term tersebut, lanjut setelah entri terakhir term itu
+            next_index = conflict_index
+            for index in range(self._last_log_index(), self.snapshot_index, -1):
+                entry_term = self._term_at(index)
+                if entry_term == conflict_term:
+                    next_index = index + 1
+                    break
+                if entry_term < conflict_term:
+                    break
+        return max(self.match_index[peer_id] + 1, min(next_index, self._last_log_index() + 1))
+
+    async def _advance_commit_index(self):
+        """Commit index naik ke N tertinggi yang sudah direplikasi mayoritas (hanya entri term ini)."""
+        if self.state != NodeState.LEADER:
+            return
+        majority = (len(self.peers) + 1) // 2 + 1
+        for n in range(self._last_log_index(), self.commit_index, -1):
+            if self._term_at(n) != self.current_term:
+                break
+            replicas = (1 if self._durable_index >= n else 0) + \
+                sum(1 for index in self.match_index.values() if index >= n)
+            if replicas >= majority:
+                self.commit_index = n
+                logging.info(f"[{self.node_id}] Leader committed up to index {self.commit_index} with {replicas} replicas.")
+                await self._apply_log_entries()
+                break
+
+    # --- Linearizable reads (ReadIndex / leader lease) ---
+    async def linearizable_read(self, reader):
+        """
+        Menjalankan reader() (fungsi sinkron atas state machine) secara linearizable
+        tanpa menulis ke log. Leader memakai lease atau ReadIndex; follower meminta
+        read index ke leader lalu menunggu state machine lokalnya menyusul.
+        """
+        return await self._in_raft_loop(self._linearizable_read, reader)
+
+    async def _linearizable_read(self, reader):
+        if self.state == NodeState.LEADER:
+            read_index = await self._read_index()
+        else:
+            read_index = await self._read_index_from_leader()
+        if read_index is None:
+            return {"success": False, "leader": self.leader_id, "message": "Unable to confirm leadership for read"}
+        if not await self._wait_for_applied(read_index):
+            return {"success": False, "leader": self.leader_id, "message": "Timed out waiting for state machine to catch up"}
+        return {"success": True, **reader()}
+
+    async def handle_read_index(self):
+        """RPC dari follower: minta read index yang sudah dikonfirmasi leader."""
+        read_index = await self._in_raft_loop(self._read_index)
+        if read_index is None:
+            return {'success': False, 'leader': self.leader_id}
+        return {'success': True, 'read_index': read_index}
+
+    async def _read_index_from_leader(self):
+        leader_url = self.peers.get(self.leader_id)
+        if leader_url is None:
+            return None
+        resp = await self._rpc(leader_url, 'read_index', {'from': self.node_id})
+        if not resp or not resp.get('success'):
+            return None
+        increment_counter("raft_reads_follower")
+        return resp['read_index']
+
+    async def _read_index(self):
+        """
+        Mengembalikan commit_index yang aman dibaca, atau None jika bukan leader.
+        Leader harus sudah commit entri di term-nya (no-op); lalu leadership dikonfirmasi
+        lewat lease yang masih berlaku atau satu putaran heartbeat ke mayoritas.
+        """
+        if self.state != NodeState.LEADER:
+            return None
+        term = self.current_term
+        if self._term_at(self.commit_index) != term:
+            deadline = asyncio.get_running_loop().time() + READ_INDEX_TIMEOUT
+            while self._term_at(self.commit_index) != term:
+                if self.state != NodeState.LEADER or self.current_term != term:
+                    return None
+                if asyncio.get_running_loop().time() > deadline:
+                    return None
+                await asyncio.sleep(HEARTBEAT_INTERVAL / 10)
+        read_index = self.commit_index
+
+        if LEASE_READS and self._lease_valid():
+            increment_counter("raft_reads_lease")
+            return read_index
+        if not await self._confirm_leadership():
+            return None
+        increment_counter("raft_reads_read_index")
+        return read_index
+
+    def _lease_valid(self):
+        """
+        Lease berlaku sampai (waktu kirim heartbeat yang di-ack mayoritas) + durasi lease.
+        Durasi lease < ELECTION_TIMEOUT_MIN karena follower menolak vote selama itu.
+        """
+        majority = (len(self.peers) + 1) // 2 + 1
+        needed_from_peers = majority - 1
+        if needed_from_peers == 0:
+            return True
+        ack_times = sorted(self._last_ack_sent.values(), reverse=True)
+        if len(ack_times) < needed_from_peers:
+            return False
+        quorum_time = ack_times[needed_from_peers - 1]
+        lease_duration = ELECTION_TIMEOUT_MIN * LEASE_DURATION_RATIO
+        return asyncio.get_running_loop().time() < quorum_time + lease_duration
+
+    async def _confirm_leadership(self):
+        """Read yang datang bersamaan berbagi satu putaran heartbeat."""
+        if self._confirm_round is None:
+            self._confirm_round = asyncio.create_task(self._run_confirm_round(self.current_term))
+        return await asyncio.shield(self._confirm_round)
+
+    async def _run_confirm_round(self, term):
+        await asyncio.sleep(0)  # Kumpulkan read lain yang masuk di iterasi loop yang sama
+        self._confirm_round = None  # Read setelah titik ini butuh putaran baru
+        majority = (len(self.peers) + 1) // 2 + 1
+
+        def acks(responses):
+            return 1 + sum(1 for acked in responses.values() if acked)
+
+        # Heartbeat yang belum dijawab tetap dibiarkan selesai (memperbarui lease/match_index)
+        responses = await gather_until(
+            {peer_id: self._send_append_entries(peer_id, self.next_index[peer_id], self.next_index[peer_id] - 1)
+             for peer_id in self.peers},
+            lambda responses: acks(responses) >= majority,
+            timeout=READ_INDEX_TIMEOUT, cancel_pending=False,
+        )
+        return acks(responses) >= majority and self.state == NodeState.LEADER and self.current_term == term
+
+    # --- Snapshot & log compaction ---
+    def _maybe_snapshot(self):
+        """Ambil snapshot jika sudah cukup banyak entri diterapkan sejak snapshot terakhir."""
+        if self.last_applied - self.snapshot_index < SNAPSHOT_THRESHOLD:
+            return
+        if self._snapshot_task is not None and not self._snapshot_task.done():
+            return
+        # State disalin sekarang (sinkron) agar konsisten dengan last_applied;
+        # penulisan ke disk dan compaction berjalan di background.
+        index, term = self.last_applied, self._term_at(self.last_applied)
+        data = encode_snapshot(index, term, self.lock_manager.snapshot_state())
+        self._snapshot_task = asyncio.create_task(self._save_snapshot(index, term, data))
+
+    async def _save_snapshot(self, index, term, data):
+        if self.snapshot_store is not None:
+            async with self._snapshot_save_lock:
+                await asyncio.get_running_loop().run_in_executor(None, self.snapshot_store.save, data, index)
+        if index <= self.snapshot_index:
+            return  # Snapshot yang lebih baru sudah dipasang (InstallSnapshot) selama penulisan
+        self._compact_log(index, term, data)
+        if self.storage is not None:
+            await self.storage.compact(index)
+        increment_counter("raft_snapshots")
+        logging.info(f"[{self.node_id}] Snapshot taken at index {index} (term {term}), {len(data)} bytes. Log compacted.")
+
+    def _compact_log(self, index, term, data):
+        """Membuang entri log sampai 'index' dari memori."""
+        del self.log[:index - self.snapshot_index]
+        self.snapshot_index, self.snapshot_term = index, term
+        self._snapshot_data = data
+
+    def _restore_snapshot(self, data):
+        """Memasang snapshot ke state machine (startup atau InstallSnapshot)."""
+        index, term, state = decode_snapshot(data)
+        self.lock_manager.restore_state(state)
+        self.snapshot_index, self.snapshot_term = index, term
+        self._snapshot_data = data
+        self.commit_index = max(self.commit_index, index)
+        self.last_applied = index
+        self._notify_apply_waiters()
+
+    async def _send_snapshot(self, peer_id):
+        """Mengirim snapshot terakhir ke follower dalam chunk SNAPSHOT_CHUNK_SIZE."""
+        term = self.current_term
+        data, index, snapshot_term = self._snapshot_data, self.snapshot_index, self.snapshot_term
+        logging.info(f"[{self.node_id}] Sending snapshot at index {index} ({len(data)} bytes) to {peer_id}")
+        try:
+            offset = 0
+            while True:
+                chunk = data[offset:offset + SNAPSHOT_CHUNK_SIZE]
+                done = offset + len(chunk) >= len(data)
+                payload = {
+                    'term': term,
+                    'leader_id': self.node_id,
+                    'last_included_index': index,
+                    'last_included_term': snapshot_term,
+                    'offset': offset,
+                    'data': base64.b64encode(chunk).decode('ascii'),
+                    'done': done,
+                }
+                resp = await self._rpc(self.peers[peer_id], 'install_snapshot', payload)
+                if self.state != NodeState.LEADER or self.current_term != term or resp is None:
+                    return
+                if resp.get('term', 0) > self.current_term:
+                    self._step_down(resp['term'])
+                    await self._persist_hard_state()
+                    return
+                if not resp.get('success'):
+                    return  # Follower meminta ulang; replicator akan mencoba lagi
+                if done:
+                    break
+                offset += len(chunk)
+
+            self.match_index[peer_id] = max(self.match_index[peer_id], index)
+            self.next_index[peer_id] = index + 1
+            self._probing[peer_id] = False
+            increment_counter("raft_snapshots_sent")
+            await self._advance_commit_index()
+        finally:
+            self._sending_snapshot[peer_id] = False
+            if self.state == NodeState.LEADER and self.current_term == term:
+                self._peer_events[peer_id].set()
+
+    async def handle_install_snapshot(self, term, leader_id, last_included_index, last_included_term, offset, data, done):
+        """Menerima satu chunk snapshot dari leader."""
+        return await self._in_raft_loop(
+            self._handle_install_snapshot, term, leader_id, last_included_index, last_included_term, offset, data, done
+        )
+
+    async def _handle_install_snapshot(self, term, leader_id, last_included_index, last_included_term, offset, data, done):
+        if term < self.current_term:
+            return {'term': self.current_term, 'success': False}
+        await self._accept_leader(term, leader_id)
+
+        if offset == 0:
+            self._incoming_snapshot = {'index': last_included_index, 'buffer': bytearray()}
+        incoming = self._incoming_snapshot
+        if incoming is None or incoming['index'] != last_included_index or len(incoming['buffer']) != offset:
+            # Chunk hilang/tidak berurutan: leader harus mulai lagi dari offset 0
+            self._incoming_snapshot = None
+            return {'term': self.current_term, 'success': False}
+
+        incoming['buffer'].extend(base64.b64decode(data))
+        if not done:
+            return {'term': self.current_term, 'success': True}
+
+        self._incoming_snapshot = None
+        snapshot_data = bytes(incoming['buffer'])
+        if last_included_index <= self.last_applied:
+            return {'term': self.current_term, 'success': True}  # Sudah punya state yang lebih baru
+
+        if self.snapshot_store is not None:
+            # Menunggu penulisan snapshot lokal yang masih berjalan; snapshot lokal yang lebih
+            # lama tidak akan menimpa snapshot terpasang (SnapshotStore.save menolaknya)
+            async with self._snapshot_save_lock:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self.snapshot_store.save, snapshot_data, last_included_index)
+
+        async with self._apply_lock:
+            if last_included_index <= self.last_applied:
+                return {'term': self.current_term, 'success': True}
+            # Log dan snapshot_index diganti bersamaan tanpa await di antaranya: AppendEntries
+            # yang tiba selama WAL ditulis harus sudah melihat posisi log yang baru.
+            # Pertahankan sisa log jika entri di last_included_index cocok; selain itu buang semua
+            conflict = self._term_at(last_included_index) != last_included_term
+            if conflict:
+                self.log = []
+            else:
+                del self.log[:last_included_index - self.snapshot_index]
+            self._restore_snapshot(snapshot_data)
+            if self.storage is not None:
+                # Record WAL masuk antrian saat dipanggil, jadi selalu sebelum append berikutnya
+                if conflict:
+                    await self.storage.truncate(last_included_index + 1)
+                await self.storage.compact(last_included_index)
+
+        increment_counter("raft_snapshots_installed")
+        logging.info(f"[{self.node_id}] Installed snapshot at index {last_included_index} from {leader_id}.")
+        return {'term': self.current_term, 'success': True}
+
+    # --- Persistence helpers ---
+    async def _append_to_log(self, entries):
+        """Menambahkan entri ke log in-memory lalu menunggu sampai durable di WAL."""
+        first_index = self._last_log_index() + 1
+        self.log.extend(entries)
+        if self.storage is not None:
+            await self.storage.append(first_index, entries)
+
+    async def _truncate_log(self, from_index):
+        """Membuang entri mulai 'from_index' di memori dan di WAL."""
+        del self.log[from_index - self.snapshot_index - 1:]
+        if self.storage is not None:
+            await self.storage.truncate(from_index)
+
+    async def _persist_hard_state(self):
+        if self.storage is not None:
+            await self.storage.save_hard_state(self.current_term, self.voted_for)
 
     async def _apply_log_entries(self):
         """Menerapkan entri log yang sudah di-commit ke state machine."""
-        while self.last_applied < self.commit_index:
-            self.last_applied += 1
-            entry = self.log[self.last_applied]
-            command = entry['command']
-            
-            logging.info(f"[{self.node_id}] Applying command to state machine: {command}")
-            await self.lock_manager.apply_command(command)
\ No newline at end of file
+        async with self._apply_lock:
+            while self.last_applied < self.commit_index:
+                self.last_applied += 1
+                entry = self._entry_at(self.last_applied)
+                command = entry['command']
+
+                if command.get('action') == NOOP_COMMAND['action']:
+                    result = {"success": True, "message": "No-op applied"}
+                else:
+                    logging.info(f"[{self.node_id}] Applying command to state machine: {command}")
+                    result = await self.lock_manager.apply_command(command)
+
+                # Balas klien yang menunggu entri ini (hanya ada di leader)
+                future = self._client_waiters.pop(self.last_applied, None)
+                if future is not None and not future.done():
+                    future.set_result(result)
+            self._notify_apply_waiters()
+            self._maybe_snapshot()
+
+    def _notify_apply_waiters(self):
+        while self._apply_waiters and self._apply_waiters[0][0] <= self.last_applied:
+            _, _, future = heapq.heappop(self._apply_waiters)
+            if not future.done():
+                future.set_result(True)
+
+    async def _wait_for_applied(self, index, timeout=READ_INDEX_TIMEOUT):
+        """Menunggu sampai state machine lokal sudah menerapkan entri sampai 'index'."""
+        if self.last_applied >= index:
+            return True
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._apply_waiters, (index, next(self._waiter_seq), future))
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return False
@@ -0,0 +1,68 @@
+# src/consensus/snapshot.py
+
+import json
+import logging
+import os
+import threading
+
+SNAPSHOT_FILE = "snapshot.json"
+
+
+def encode_snapshot(index, term, state):
+    """Serialisasi snapshot state machine menjadi bytes (format file dan format transfer sama)."""
+    return json.dumps({"index": index, "term": term, "state": state}, separators=(",", ":")).encode("utf-8")
+
+
+def decode_snapshot(data):
+    """Kebalikan dari encode_snapshot. Mengembalikan (index, term, state)."""
+    snapshot = json.loads(data)
+    return snapshot["index"], snapshot["term"], snapshot["state"]
+
+
+class SnapshotStore:
+    """
+    Menyimpan snapshot terakhir state machine di disk. Penulisan bersifat atomik
+    (file sementara + fsync + rename) sehingga crash tidak meninggalkan snapshot setengah jadi.
+    Snapshot yang lebih lama dari yang sudah tersimpan tidak pernah menimpanya.
+    """
+
+    def __init__(self, data_dir):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, SNAPSHOT_FILE)
+        self.index = -1  # Index snapshot yang tersimpan di disk
+        self._lock = threading.Lock()  # save() dipanggil dari thread executor
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    def load(self):
+        """Mengembalikan bytes snapshot terakhir, atau None jika belum ada."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, "rb") as f:
+            data = f.read()
+        self.index = decode_snapshot(data)[0]
+        logging.info(f"Loaded Raft snapshot from {self.path} ({len(data)} bytes)")
+        return data
+
+    def save(self, data, index):
+        """
+        Menulis bytes snapshot di 'index' secara atomik. Blocking: panggil lewat executor.
+        Mengembalikan False (tanpa menulis) jika snapshot di disk sudah sama atau lebih baru.
+        """
+        with self._lock:
+            if index <= self.index:
+                logging.info(f"Skipping Raft snapshot at index {index}: {self.path} already at index {self.index}")
+                return False
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+
+            dir_fd = os.open(self.data_dir, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+            self.index = index
+            return True
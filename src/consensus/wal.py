@@ -0,0 +1,280 @@
+# src/consensus/wal.py
+
+import asyncio
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+
+from ..utils.metrics import increment_counter, record_latency
+
+# Header setiap record: (panjang payload, crc32 payload), little-endian
+RECORD_HEADER = struct.Struct("<II")
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".log"
+
+# Tipe record di dalam segmen
+RECORD_ENTRY = "e"       # entri log Raft: {'t', 'i', 'term', 'command'}
+RECORD_TRUNCATE = "x"    # buang semua entri mulai index 'i'
+RECORD_HARD_STATE = "h"  # hard state: {'t', 'term', 'voted_for'}
+COMPACT = "c"            # bukan record di disk: hapus segmen yang sudah tercakup snapshot
+
+
+class WriteAheadLog:
+    """
+    Write-ahead log berbasis file segmen untuk log Raft dan hard state
+    (current_term, voted_for).
+
+    Semua penulisan masuk ke satu antrian dan ditulis oleh satu flusher:
+    append yang datang bersamaan digabung menjadi satu write + satu fsync
+    (group commit). Urutan record di disk sama dengan urutan pemanggilan.
+    """
+
+    def __init__(self, data_dir, segment_size=4 * 1024 * 1024):
+        self.data_dir = data_dir
+        self.segment_size = segment_size
+
+        # [(seq, first_index, path)] terurut menurut seq (urutan penulisan). Nama file
+        # 'wal-<seq>-<first_index>.log': setelah truncate, segmen baru bisa dimulai di
+        # index yang lebih kecil dari segmen sebelumnya, jadi urutan tidak boleh dari index.
+        self._segments = []
+        self._active_file = None
+        self._active_size = 0
+        self._hard_state = {"term": 0, "voted_for": None}
+        self._next_index = 0       # index entri berikutnya yang akan ditulis
+
+        self._pending = []         # [(records, future)] menunggu di-flush
+        self._flush_task = None
+
+        os.makedirs(self.data_dir, exist_ok=True)
+
+    # --------------------------------------------------------------------------
+    # RECOVERY
+    # --------------------------------------------------------------------------
+
+    def load(self, snapshot_index=-1):
+        """
+        Recovery saat startup. Membaca segmen secara berurutan dan mengembalikan
+        (current_term, voted_for, entries) dengan entries = entri setelah 'snapshot_index'.
+        Segmen yang sepenuhnya tercakup snapshot sudah dihapus saat compaction,
+        sehingga replay hanya dimulai dari segmen terakhir sebelum snapshot.
+        Segmen yang sudah ditutup dibaca utuh sekaligus; hanya segmen terakhir
+        yang mungkin berisi record terpotong (crash di tengah write) dan
+        dipotong di record valid terakhir, lalu dibuka kembali untuk append.
+        """
+        self._segments = self._list_segments()
+        entries = []
+
+        for position, (_, _, path) in enumerate(self._segments):
+            is_last = position == len(self._segments) - 1
+            with open(path, "rb") as f:
+                data = f.read()
+
+            valid_length = self._replay(data, entries, snapshot_index)
+            if valid_length < len(data):
+                if not is_last:
+                    raise IOError(f"Corrupted WAL segment {path} at offset {valid_length}")
+                logging.warning(f"Truncating torn tail of WAL segment {path} at offset {valid_length}")
+                with open(path, "r+b") as f:
+                    f.truncate(valid_length)
+                    f.flush()
+                    os.fsync(f.fileno())
+
+        self._next_index = snapshot_index + 1 + len(entries)
+        if self._segments:
+            _, _, last_path = self._segments[-1]
+            self._active_file = open(last_path, "ab")
+            self._active_size = self._active_file.tell()
+
+        logging.info(
+            f"WAL recovered {len(entries)} entries from {len(self._segments)} segment(s), "
+            f"term={self._hard_state['term']}, voted_for={self._hard_state['voted_for']}"
+        )
+        return self._hard_state["term"], self._hard_state["voted_for"], entries
+
+    def _replay(self, data, entries, snapshot_index):
+        """
+        Terapkan record dari buffer ke 'entries' (entries[0] = index snapshot_index + 1).
+        Mengembalikan panjang data yang valid.
+        """
+        base = snapshot_index + 1
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            length, checksum = RECORD_HEADER.unpack_from(data, offset)
+            start = offset + RECORD_HEADER.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+
+            record = json.loads(payload)
+            kind = record["t"]
+            if kind == RECORD_ENTRY:
+                position = record["i"] - base
+                if position > len(entries):
+                    break  # Lubang pada log -> perlakukan sebagai ekor yang rusak
+                if position >= 0:  # Entri <= snapshot_index sudah tercakup snapshot
+                    del entries[position:]
+                    entries.append({"term": record["term"], "command": record["command"]})
+            elif kind == RECORD_TRUNCATE:
+                del entries[max(0, record["i"] - base):]
+            elif kind == RECORD_HARD_STATE:
+                self._hard_state = {"term": record["term"], "voted_for": record["voted_for"]}
+
+            offset = start + length
+        return offset
+
+    def _list_segments(self):
+        segments = []
+        for name in os.listdir(self.data_dir):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                fields = name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)].split("-")
+                # Format lama 'wal-<first_index>.log': seq = first_index (dulu urutannya sama)
+                seq, first_index = (int(fields[0]), int(fields[-1]))
+                segments.append((seq, first_index, os.path.join(self.data_dir, name)))
+        return sorted(segments)
+
+    # --------------------------------------------------------------------------
+    # WRITE PATH (GROUP COMMIT)
+    # --------------------------------------------------------------------------
+
+    async def append(self, first_index, entries):
+        """Menulis entri mulai dari 'first_index' dan menunggu sampai durable."""
+        records = [
+            {"t": RECORD_ENTRY, "i": first_index + offset, "term": entry["term"], "command": entry["command"]}
+            for offset, entry in enumerate(entries)
+        ]
+        await self._submit(records)
+
+    async def truncate(self, from_index):
+        """Membuang entri mulai dari 'from_index' (konflik log pada follower)."""
+        await self._submit([{"t": RECORD_TRUNCATE, "i": from_index}])
+
+    async def save_hard_state(self, term, voted_for):
+        """Menyimpan current_term dan voted_for secara durable."""
+        await self._submit([{"t": RECORD_HARD_STATE, "term": term, "voted_for": voted_for}])
+
+    async def compact(self, snapshot_index):
+        """
+        Menghapus segmen yang seluruh entrinya sudah tercakup snapshot. Sebuah segmen
+        aman dihapus jika segmen sesudahnya dimulai paling lambat di snapshot_index + 1.
+        Harus dipanggil setelah snapshot tersimpan durable.
+        """
+        await self._submit([{"t": COMPACT, "i": snapshot_index}])
+
+    async def sync(self):
+        """
+        Menunggu sampai semua record yang sudah di-submit durable, tanpa menulis
+        record baru. Langsung kembali jika tidak ada penulisan yang tertunda.
+        """
+        if not self._pending and (self._flush_task is None or self._flush_task.done()):
+            return
+        await self._submit([])
+
+    def _submit(self, records):
+        """
+        Memasukkan record ke antrian secara sinkron (urutan terjaga) dan
+        mengembalikan future yang selesai setelah fsync batch-nya.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((records, future))
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = loop.create_task(self._flush_loop())
+        return future
+
+    async def _flush_loop(self):
+        """Menulis semua record yang menunggu sebagai satu batch per fsync."""
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch, self._pending = self._pending, []
+            records = [record for records, _ in batch for record in records]
+            start_time = time.time()
+            try:
+                await loop.run_in_executor(None, self._write_batch, records)
+            except Exception as e:
+                logging.error(f"WAL flush failed: {e}", exc_info=True)
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            increment_counter("raft_wal_fsyncs")
+            increment_counter("raft_wal_records", len(records))
+            record_latency("raft_wal_flush_latency", start_time)
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    def _write_batch(self, records):
+        """Dijalankan di executor: encode, tulis, rotasi segmen bila perlu, lalu fsync."""
+        for record in records:
+            if record["t"] == COMPACT:
+                self._delete_compacted_segments(record["i"])
+                continue
+            if record["t"] == RECORD_ENTRY:
+                if self._active_file is None or self._active_size >= self.segment_size:
+                    self._roll_segment(record["i"])
+                self._next_index = record["i"] + 1
+            elif record["t"] == RECORD_TRUNCATE:
+                self._next_index = min(self._next_index, record["i"])
+            elif record["t"] == RECORD_HARD_STATE:
+                self._hard_state = {"term": record["term"], "voted_for": record["voted_for"]}
+
+            if self._active_file is None:
+                self._roll_segment(self._next_index)
+            self._write_record(record)
+
+        if self._active_file is not None:
+            self._active_file.flush()
+            os.fsync(self._active_file.fileno())
+
+    def _write_record(self, record):
+        payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+        data = RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+        self._active_file.write(data)
+        self._active_size += len(data)
+
+    def _roll_segment(self, first_index):
+        """
+        Menutup segmen aktif dan membuka segmen baru (seq berikutnya) yang dimulai dari
+        'first_index'. Semua entri live dengan index >= first_index ditulis di segmen ini
+        atau sesudahnya, karena entri lama di atas index itu sudah di-truncate.
+        """
+        if self._active_file is not None:
+            self._active_file.flush()
+            os.fsync(self._active_file.fileno())
+            self._active_file.close()
+
+        seq = self._segments[-1][0] + 1 if self._segments else 0
+        path = os.path.join(self.data_dir, f"{SEGMENT_PREFIX}{seq:020d}-{first_index:020d}{SEGMENT_SUFFIX}")
+        self._active_file = open(path, "ab")
+        self._active_size = self._active_file.tell()
+        self._segments.append((seq, first_index, path))
+        self._fsync_dir()
+
+        # Setiap segmen baru membawa hard state terkini agar segmen lama bisa dihapus
+        self._write_record({"t": RECORD_HARD_STATE, **self._hard_state})
+
+    def _delete_compacted_segments(self, snapshot_index):
+        while len(self._segments) > 1 and self._segments[1][1] <= snapshot_index + 1:
+            _, _, path = self._segments.pop(0)
+            os.remove(path)
+            logging.info(f"WAL compaction removed segment {path}")
+        self._fsync_dir()
+
+    def _fsync_dir(self):
+        dir_fd = os.open(self.data_dir, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+    async def close(self):
+        """Menunggu flush terakhir lalu menutup segmen aktif."""
+        if self._flush_task is not None:
+            await self._flush_task
+        if self._active_file is not None:
+            self._active_file.close()
+            self._active_file = None
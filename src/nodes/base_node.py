@@ -1,55 +1,137 @@
 import asyncio
-from flask import Flask, jsonify, request
-from threading import Thread
+from quart import Quart, jsonify, request, redirect
 import logging
-from asgiref.wsgi import WsgiToAsgi
 
 # Perbaiki impor config agar lebih eksplisit
-from ..utils.config import NODE_ID, PEERS, FLASK_PORT, REDIS_HOST, REDIS_PORT 
-from ..consensus.raft import RaftNode
+from ..utils.config import (
+    NODE_ID, NODE_HOST, PEERS, FLASK_PORT, REDIS_HOST, REDIS_PORT, RAFT_DATA_DIR, WAL_SEGMENT_SIZE,
+    LOCK_FORWARD_MODE, CLIENT_URLS, RAFT_GROUPS, RPC_TRANSPORT, RPC_BINARY_PORT_OFFSET, NODE_URL, SEED_NODES,
+    RAFT_VOTER, CACHE_RING_REPLICAS, CACHE_LOADER, CACHE_LOADER_TIMEOUT, CACHE_SNAPSHOT_PATH,
+    LOCK_DEFAULT_TTL, LOCK_MAX_WAIT,
+)
+from ..consensus.raft import NodeState
+from ..consensus.multi_raft import MultiRaft
 from ..nodes.lock_manager import LockManager
 from ..utils.metrics import get_metrics
 from ..nodes.cache_node import CacheNode
-# Hapus import broadcast_rpc yang tidak digunakan langsung di sini
-# from ..communication.message_passing import broadcast_rpc 
+from ..nodes.cache_loader import make_loader
+from ..nodes.cache_snapshot import CacheSnapshotter
+from ..communication.message_passing import close_sessions
+from ..communication.binary_transport import BinaryRpcServer, register_handler
+from ..communication.failure_detector import detector
+from ..communication.membership import SwimMembership
 import redis.asyncio as aioredis
 from ..utils.consistent_hash import ConsistentHashRing
 from ..nodes.queue_node import QueueNode
 
 # --- Inisialisasi Aplikasi ---
-flask_app = Flask(__name__)
+# Aplikasi ASGI native: handler HTTP, Raft, dan monitor queue berjalan di satu event loop
+app = Quart(__name__)
 # Pastikan NODE_ID tersedia saat konfigurasi logging
 logging.basicConfig(level=logging.INFO, format=f'{NODE_ID} - %(asctime)s - %(levelname)s - %(message)s')
 
 # --- Inisialisasi Komponen Sistem Terdistribusi ---
-lock_manager = LockManager()
-raft_node = RaftNode(node_id=NODE_ID, peers=PEERS, lock_manager=lock_manager)
-cache_node = CacheNode(node_id=NODE_ID, peers=PEERS)
+# Satu grup Raft (+ LockManager) per shard namespace lock; RAFT_GROUPS=1 setara satu RaftNode
+multi_raft = MultiRaft(node_id=NODE_ID, peers=PEERS, num_groups=RAFT_GROUPS, state_machine_factory=LockManager,
+                       data_dir=RAFT_DATA_DIR, segment_size=WAL_SEGMENT_SIZE)
+# Cache dan queue memakai view membership gossip (membership.peers berubah saat node join/mati)
+membership = SwimMembership(NODE_ID, NODE_URL, SEED_NODES)
+# Mode partitioned: owner key cache ditentukan ring tersendiri (virtual node lebih banyak dari ring queue)
+cache_ring = ConsistentHashRing(nodes=list(membership.peers.keys()) + [NODE_ID], replicas=CACHE_RING_REPLICAS)
+cache_loader = make_loader(CACHE_LOADER, CACHE_LOADER_TIMEOUT)
+cache_node = CacheNode(node_id=NODE_ID, peers=membership.peers, ring=cache_ring, loader=cache_loader)
+cache_snapshotter = CacheSnapshotter(cache_node, CACHE_SNAPSHOT_PATH) if CACHE_SNAPSHOT_PATH else None
 
 redis_client = aioredis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=False)
-hash_ring = ConsistentHashRing(nodes=list(PEERS.keys()) + [NODE_ID])
-queue_node = QueueNode(NODE_ID, PEERS, hash_ring, redis_client)
+hash_ring = ConsistentHashRing(nodes=list(membership.peers.keys()) + [NODE_ID])
+queue_node = QueueNode(NODE_ID, membership.peers, hash_ring, redis_client)
 
-def run_raft_loop():
-    """Wrapper function to run the Raft event loop in a new thread."""
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(raft_node.run())
-    loop.close()
+def on_membership_change(member_id, url, joined):
+    """Topik queue dan key cache (mode partitioned) dipetakan ulang ke node yang hidup."""
+    if joined:
+        hash_ring.add_node(member_id)
+        cache_ring.add_node(member_id)
+    else:
+        hash_ring.remove_node(member_id)
+        cache_ring.remove_node(member_id)
+    cache_node.rebalance()
+
+membership.add_listener(on_membership_change)
+binary_server = BinaryRpcServer(NODE_HOST, FLASK_PORT + RPC_BINARY_PORT_OFFSET) if RPC_TRANSPORT == 'binary' else None
+
+# --- Background Tasks (di event loop server) ---
+background_tasks = []
+
+@app.before_serving
+async def start_background_tasks():
+    if binary_server is not None:
+        await binary_server.start()
+    if cache_snapshotter is not None:
+        # Sebelum membership berjalan: peer yang diminta jurnalnya adalah seed + peer dari snapshot
+        await cache_snapshotter.restore()
+        cache_snapshotter.start()
+    if RAFT_VOTER:
+        background_tasks.append(asyncio.create_task(multi_raft.run()))
+    background_tasks.append(asyncio.create_task(membership.run()))
+    queue_node.start_processing_monitor()
+    cache_node.start_expiry_monitor()
+    logging.info(f"[{NODE_ID}] Raft, membership, queue monitor and cache expiry started on the server event loop.")
+
+@app.after_serving
+async def stop_background_tasks():
+    queue_node.stop_processing_monitor()
+    cache_node.stop_expiry_monitor()
+    if cache_snapshotter is not None:
+        await cache_snapshotter.stop()
+    await membership.leave()
+    if cache_loader is not None:
+        await cache_loader.close()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    if binary_server is not None:
+        await binary_server.close()
+    await multi_raft.close()
+    await close_sessions()
+    await redis_client.aclose()
+
+# --- Registry RPC Internal (HTTP + transport biner) ---
+def peer_rpc(endpoint):
+    """
+    Mendaftarkan handler RPC internal handler(data) -> dict. Handler yang sama dilayani
+    sebagai route HTTP POST /<endpoint> dan, dengan RPC_TRANSPORT=binary, lewat transport biner.
+    """
+    def decorator(handler):
+        async def traced(data):
+            note_peer_alive(data)
+            return await handler(data)
+        register_handler(endpoint, traced)
+
+        async def http_view():
+            result = await traced(await request.get_json())
+            if result is None:
+                return jsonify({"success": False, "message": "Not found"}), 404
+            return jsonify(result)
 
-# --- Mulai Background Tasks ---
-raft_thread = Thread(target=run_raft_loop, daemon=True)
-raft_thread.start()
-logging.info(f"[{NODE_ID}] Raft background thread started.")
+        app.add_url_rule(f'/{endpoint}', endpoint=f'rpc:{endpoint}', view_func=http_view, methods=['POST'])
+        return handler
+    return decorator
+
+def note_peer_alive(data):
+    """RPC Raft yang masuk adalah bukti hidup pengirimnya bagi failure detector."""
+    if data.get('requests'):
+        data = data['requests'][0]
+    sender = data.get('leader_id') or data.get('candidate_id')
+    if sender in PEERS:
+        detector.heartbeat(PEERS[sender])
 
 # --- API Endpoints ---
 
 # --- Queue API Endpoints ---
-@flask_app.route('/queue/push', methods=['POST'])
+@app.route('/queue/push', methods=['POST'])
 async def queue_push():
     """Endpoint eksternal untuk mendorong pesan."""
-    # PERBAIKAN: Hapus await
-    data = request.get_json() 
+    data = await request.get_json() 
     topic = data.get('topic')
     message = data.get('message')
     if not all([topic, message]):
@@ -59,7 +141,7 @@ async def queue_push():
     result = await queue_node.push_message(topic, message) 
     return jsonify(result)
 
-@flask_app.route('/queue/pop/<topic>/<consumer_id>', methods=['GET']) # Tambahkan consumer_id ke path
+@app.route('/queue/pop/<topic>/<consumer_id>', methods=['GET']) # Tambahkan consumer_id ke path
 async def queue_pop(topic, consumer_id):
     """Endpoint eksternal untuk mengambil pesan."""
     if not consumer_id:
@@ -67,10 +149,10 @@ async def queue_pop(topic, consumer_id):
     result = await queue_node.pop_message(topic, consumer_id)
     return jsonify(result)
 
-@flask_app.route('/queue/ack/<topic>', methods=['POST'])
+@app.route('/queue/ack/<topic>', methods=['POST'])
 async def queue_ack(topic):
     """Endpoint eksternal untuk acknowledge pesan."""
-    data = request.get_json() # Hapus await
+    data = await request.get_json()
     consumer_id = data.get('consumer_id')
     message_id = data.get('message_id')
     if not all([consumer_id, message_id]):
@@ -79,35 +161,32 @@ async def queue_ack(topic):
     result = await queue_node.acknowledge_message(topic, consumer_id, message_id)
     return jsonify(result)
 
-@flask_app.route('/queue/internal/pop/<topic>/<consumer_id>', methods=['POST'])
+@app.route('/queue/internal/pop/<topic>/<consumer_id>', methods=['POST'])
 async def queue_internal_pop(topic, consumer_id):
      """Endpoint internal untuk menerima pop yang di-forward."""
      # Tidak perlu data dari request body
      result = await queue_node.internal_pop(topic, consumer_id)
      return jsonify(result)
 
-@flask_app.route('/queue/internal/ack/<topic>', methods=['POST'])
+@app.route('/queue/internal/ack/<topic>', methods=['POST'])
 async def queue_internal_ack(topic):
      """Endpoint internal untuk menerima ack yang di-forward."""
-     data = request.get_json() # Hapus await
+     data = await request.get_json()
      consumer_id = data.get('consumer_id')
      message_id = data.get('message_id')
      result = await queue_node.internal_ack(topic, consumer_id, message_id)
      return jsonify(result)
 
-@flask_app.route('/queue/internal/push', methods=['POST'])
-async def queue_internal_push():
+@peer_rpc('queue/internal/push')
+async def queue_internal_push(data):
     """Endpoint internal untuk menerima pesan yang di-forward."""
-    # PERBAIKAN: Hapus await
-    data = request.get_json() 
     topic = data.get('topic')
     message = data.get('message')
     # Tetap gunakan await di sini karena internal_push adalah async
-    result = await queue_node.internal_push(topic, message) 
-    return jsonify(result)
+    return await queue_node.internal_push(topic, message)
 
 # --- Cache API Endpoints (External) ---
-@flask_app.route('/cache/<key>', methods=['GET'])
+@app.route('/cache/<key>', methods=['GET'])
 async def get_cache(key):
     """Mendapatkan nilai dari cache."""
     # Tetap gunakan await di sini karena get adalah async
@@ -117,61 +196,103 @@ async def get_cache(key):
     else:
         return jsonify({"success": False, "message": "Cache miss"}), 404
 
-@flask_app.route('/cache/set', methods=['POST'])
+@app.route('/cache/set', methods=['POST'])
 async def set_cache():
     """Menetapkan nilai baru di cache dan menginvalidasi cache lain."""
-    # SUDAH BENAR: await dihapus
-    data = request.get_json() 
+    data = await request.get_json() 
     key = data.get('key')
     value = data.get('value')
+    ttl = data.get('ttl')  # Opsional, detik
     if not all([key, value]):
         return jsonify({"success": False, "message": "Missing key or value"}), 400
+    if ttl is not None and (not isinstance(ttl, (int, float)) or ttl < 0):
+        return jsonify({"success": False, "message": "ttl must be a non-negative number of seconds"}), 400
     
     # Tetap gunakan await di sini karena set adalah async
-    result = await cache_node.set(key, value) 
+    result = await cache_node.set(key, value, ttl) 
     return jsonify(result)
 
 # --- Cache API Endpoints (Internal) ---
-@flask_app.route('/cache/invalidate', methods=['POST'])
-async def invalidate_cache():
+@peer_rpc('cache/invalidate')
+async def invalidate_cache(data):
     """Endpoint internal untuk menerima sinyal invalidasi dari peer."""
-    # PERBAIKAN: Hapus await
-    data = request.get_json() 
     key = data.get('key')
     if not key:
-        return jsonify({"success": False, "message": "Missing key"}), 400
-    
+        return {"success": False, "message": "Missing key"}
+
     # Tetap gunakan await di sini karena handle_invalidation adalah async
-    result = await cache_node.handle_invalidation(key) 
-    return jsonify(result)
+    return await cache_node.handle_invalidation(key)
+
+@peer_rpc('cache/invalidate_batch')
+async def invalidate_cache_batch(data):
+    """Endpoint internal: invalidasi yang digabung oleh outbox peer."""
+    return await cache_node.handle_invalidation_batch(data.get('keys', []))
+
+@peer_rpc('cache/journal')
+async def cache_journal(data):
+    """Endpoint internal: key yang ditulis node ini sejak 'since', untuk peer yang memulihkan snapshot."""
+    return await cache_node.handle_journal(data.get('since', 0))
+
+@peer_rpc('cache/owner_get')
+async def owner_get_cache(data):
+    """Endpoint internal (mode partitioned): get yang diteruskan non-owner, opsional dengan lease near-cache."""
+    key = data.get('key')
+    if not key:
+        return {"success": False, "message": "Missing key"}
+    return await cache_node.handle_owner_get(key, data.get('from'), data.get('lease', False))
+
+@peer_rpc('cache/owner_set')
+async def owner_set_cache(data):
+    """Endpoint internal (mode partitioned): set yang diteruskan non-owner."""
+    key = data.get('key')
+    if not key:
+        return {"success": False, "message": "Missing key"}
+    return await cache_node.handle_owner_set(key, data.get('value'), data.get('ttl'))
 
 # --- Lock API Endpoints (External - Client) ---
-@flask_app.route('/lock/acquire', methods=['POST'])
+async def submit_lock_command(command, wait=0):
+    """
+    Follower meneruskan command ke leader (proxy) atau mengarahkan klien ke leader (redirect).
+    wait > 0: acquire blocking, respons baru dikirim saat lock diberikan atau timeout.
+    """
+    raft_node = multi_raft.group_for_command(command)
+    if LOCK_FORWARD_MODE == 'redirect' and raft_node.state != NodeState.LEADER and raft_node.leader_id in PEERS:
+        # 307 mempertahankan method dan body POST; tujuannya alamat leader yang bisa dijangkau klien
+        return redirect(f"{CLIENT_URLS[raft_node.leader_id]}{request.path}", code=307)
+    if wait:
+        result = await raft_node.handle_blocking_acquire(command, wait)
+    else:
+        result = await raft_node.handle_client_request(command)
+    return jsonify(result)
+
+@app.route('/lock/acquire', methods=['POST'])
 async def acquire_lock():
-    # PERBAIKAN: Hapus await
-    data = request.get_json() 
+    data = await request.get_json() 
     resource_id = data.get('resource_id')
     lock_type = data.get('lock_type', 'exclusive')
     client_id = data.get('client_id')
+    ttl = data.get('ttl', LOCK_DEFAULT_TTL)  # Detik; 0 = tanpa lease (dipegang sampai release)
+    wait = data.get('wait', 0)  # Detik menunggu grant dari wait queue; 0 = langsung kembali
 
     if not all([resource_id, lock_type, client_id]):
         return jsonify({"success": False, "message": "Missing parameters"}), 400
+    for name, value in (('ttl', ttl), ('wait', wait)):
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+            return jsonify({"success": False, "message": f"{name} must be a non-negative number"}), 400
 
     command = {
         "action": "acquire",
         "resource_id": resource_id,
         "lock_type": lock_type,
-        "client_id": client_id
+        "client_id": client_id,
+        "ttl": ttl
     }
     
-    # Tetap gunakan await di sini karena handle_client_request adalah async
-    result = await raft_node.handle_client_request(command) 
-    return jsonify(result)
+    return await submit_lock_command(command, wait=min(wait, LOCK_MAX_WAIT))
 
-@flask_app.route('/lock/release', methods=['POST'])
+@app.route('/lock/release', methods=['POST'])
 async def release_lock():
-    # PERBAIKAN: Hapus await
-    data = request.get_json() 
+    data = await request.get_json() 
     resource_id = data.get('resource_id')
     client_id = data.get('client_id')
     
@@ -184,30 +305,90 @@ async def release_lock():
         "client_id": client_id
     }
     
-    # Tetap gunakan await di sini karena handle_client_request adalah async
-    result = await raft_node.handle_client_request(command) 
+    return await submit_lock_command(command)
+
+@app.route('/lock/release_all', methods=['POST'])
+async def release_all_locks():
+    """Melepas semua lock milik client_id dan keluar dari semua wait list (mis. saat klien terputus)."""
+    data = await request.get_json()
+    client_id = data.get('client_id')
+    if not client_id:
+        return jsonify({"success": False, "message": "Missing parameters"}), 400
+
+    command = {"action": "release_all", "client_id": client_id}
+    if len(multi_raft.groups) == 1:
+        # Satu grup: jalur yang sama dengan acquire/release (termasuk redirect ke leader)
+        return await submit_lock_command({**command, "group_id": next(iter(multi_raft.groups))})
+    # Multi-Raft: diajukan ke semua grup (follower meneruskan ke leader tiap grup)
+    return jsonify(await multi_raft.handle_client_request_all(command))
+
+@app.route('/lock/keepalive', methods=['POST'])
+async def keepalive_lock():
+    """Memperpanjang lease satu lock (resource_id) atau semua lock milik client_id."""
+    data = await request.get_json()
+    client_id = data.get('client_id')
+    resource_id = data.get('resource_id')
+    if not client_id:
+        return jsonify({"success": False, "message": "Missing parameters"}), 400
+
+    command = {"action": "keepalive", "client_id": client_id}
+    if resource_id:
+        return await submit_lock_command({**command, "resource_id": resource_id})
+    if len(multi_raft.groups) == 1:
+        return await submit_lock_command({**command, "group_id": next(iter(multi_raft.groups))})
+    return jsonify(await multi_raft.handle_client_request_all(command, merge_key='renewed'))
+
+@app.route('/lock/status/<resource_id>', methods=['GET'])
+async def lock_status(resource_id):
+    """Pembacaan linearizable: state lock yang mencerminkan semua acquire/release yang sudah dikonfirmasi."""
+    result = await multi_raft.read_lock_info(resource_id)
+    if not result["success"]:
+        return jsonify(result), 503
     return jsonify(result)
 
+@peer_rpc('client_request')
+async def forwarded_client_request(data):
+    """Endpoint internal: command klien yang diteruskan follower ke leader."""
+    return await multi_raft.handle_client_request(data['command'], forwarded=True)
+
 # --- Raft API Endpoints (Internal - Peers) ---
-@flask_app.route('/request_vote', methods=['POST'])
-async def rpc_request_vote():
-    # PERBAIKAN: Hapus await
-    data = request.get_json() 
+# Handler mengembalikan None untuk group_id yang tidak dikenal (HTTP 404 / respons kosong)
+def raft_group(data):
+    """Grup Raft tujuan RPC (payload tanpa group_id = grup tunggal)."""
+    return multi_raft.group(data.get('group_id'))
+
+@peer_rpc('request_vote')
+async def rpc_request_vote(data):
+    raft_node = raft_group(data)
+    if raft_node is None:
+        return None
     # Tetap gunakan await di sini karena handle_request_vote adalah async
-    response = await raft_node.handle_request_vote( 
+    return await raft_node.handle_request_vote(
+        term=data['term'],
+        candidate_id=data['candidate_id'],
+        last_log_index=data['last_log_index'],
+        last_log_term=data['last_log_term']
+    )
+
+@peer_rpc('pre_vote')
+async def rpc_pre_vote(data):
+    raft_node = raft_group(data)
+    if raft_node is None:
+        return None
+    return await raft_node.handle_pre_vote(
         term=data['term'],
         candidate_id=data['candidate_id'],
         last_log_index=data['last_log_index'],
         last_log_term=data['last_log_term']
     )
-    return jsonify(response)
 
-@flask_app.route('/append_entries', methods=['POST'])
-async def rpc_append_entries():
-    # PERBAIKAN: Hapus await
-    data = request.get_json() 
+@peer_rpc('append_entries')
+async def rpc_append_entries(data):
+    raft_node = raft_group(data)
+    if raft_node is None:
+        return None
     # Tetap gunakan await di sini karena handle_append_entries adalah async
-    response = await raft_node.handle_append_entries( 
+    return await raft_node.handle_append_entries(
         term=data['term'],
         leader_id=data['leader_id'],
         prev_log_index=data.get('prev_log_index', -1),
@@ -215,33 +396,72 @@ async def rpc_append_entries():
         entries=data['entries'],
         leader_commit=data['leader_commit']
     )
-    return jsonify(response)
 
-# --- Status & Metrics Endpoints (Sinkron) ---
-@flask_app.route('/status', methods=['GET'])
-def get_status(): # Fungsi ini sinkron (def, bukan async def)
+@peer_rpc('install_snapshot')
+async def rpc_install_snapshot(data):
+    raft_node = raft_group(data)
+    if raft_node is None:
+        return None
+    return await raft_node.handle_install_snapshot(
+        term=data['term'],
+        leader_id=data['leader_id'],
+        last_included_index=data['last_included_index'],
+        last_included_term=data['last_included_term'],
+        offset=data['offset'],
+        data=data['data'],
+        done=data['done']
+    )
+
+@peer_rpc('read_index')
+async def rpc_read_index(data):
+    raft_node = raft_group(data)
+    if raft_node is None:
+        return None
+    return await raft_node.handle_read_index()
+
+@peer_rpc('append_entries_batch')
+async def rpc_append_entries_batch(data):
+    """Heartbeat beberapa grup Raft yang digabung menjadi satu RPC."""
+    return {"responses": await multi_raft.handle_append_entries_batch(data['requests'])}
+
+@peer_rpc('swim/join')
+async def rpc_swim_join(data):
+    return await membership.handle_join(data)
+
+@peer_rpc('swim/ping')
+async def rpc_swim_ping(data):
+    return await membership.handle_ping(data)
+
+@peer_rpc('swim/ping_req')
+async def rpc_swim_ping_req(data):
+    return await membership.handle_ping_req(data)
+
+# --- Status & Metrics Endpoints ---
+@app.route('/status', methods=['GET'])
+async def get_status():
+    # Field tingkat atas menggambarkan grup pertama (satu-satunya grup jika RAFT_GROUPS=1)
+    raft_node = next(iter(multi_raft.groups.values()))
     status = {
         "node_id": raft_node.node_id,
         "state": raft_node.state.name,
         "term": raft_node.current_term,
         "leader": raft_node.leader_id,
         "log_length": len(raft_node.log),
+        "snapshot_index": raft_node.snapshot_index,
         "commit_index": raft_node.commit_index,
-        "locks": lock_manager.get_locks_status() # get_locks_status adalah sinkron
+        "locks": multi_raft.get_locks_status(), # get_locks_status adalah sinkron
+        "failure_detector": detector.status({**PEERS, **membership.peers}),
+        "members": membership.status(),
     }
+    if len(multi_raft.groups) > 1:
+        status["leading_groups"] = multi_raft.leader_counts()
+        status["groups"] = {
+            group_id: {"state": group.state.name, "term": group.current_term, "leader": group.leader_id,
+                       "commit_index": group.commit_index}
+            for group_id, group in multi_raft.groups.items()
+        }
     return jsonify(status)
 
-@flask_app.route('/metrics', methods=['GET'])
-def metrics(): # Fungsi ini sinkron
-    # get_metrics() juga sinkron
-    return jsonify(get_metrics()) 
-
-# --- Menjalankan Raft di background thread ---
-def run_raft_loop():
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop.run_until_complete(raft_node.run())
-    loop.close()
-    
-# Bungkus aplikasi Flask HANYA SETELAH semua route didefinisikan.
-app = WsgiToAsgi(flask_app)
\ No newline at end of file
+@app.route('/metrics', methods=['GET'])
+async def metrics():
+    return jsonify(get_metrics())
@@ -0,0 +1,71 @@
+# src/nodes/cache_loader.py
+
+import aiohttp
+import importlib
+import inspect
+import logging
+from urllib.parse import quote
+
+
+class HttpLoader:
+    """
+    Loader read-through ke backend HTTP: GET {base_url}/{key}.
+    200 -> body JSON (field 'value' jika ada, selain itu seluruh body),
+    404 -> None (key tidak ada di backend). Status lain dianggap error.
+    """
+
+    def __init__(self, base_url, timeout=1.0):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = None
+
+    async def __call__(self, key):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=self.timeout)
+        async with self._session.get(f"{self.base_url}/{quote(key, safe='')}") as resp:
+            if resp.status == 404:
+                return None
+            resp.raise_for_status()
+            body = await resp.json()
+        if isinstance(body, dict) and 'value' in body:
+            return body['value']
+        return body
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class CallableLoader:
+    """Membungkus fungsi Python (sync atau async) 'key -> value | None' sebagai loader."""
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    async def __call__(self, key):
+        result = self.fn(key)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    async def close(self):
+        pass
+
+
+def make_loader(spec, timeout=1.0):
+    """
+    Membuat loader dari konfigurasi CACHE_LOADER:
+    '' -> None (tanpa read-through), 'http(s)://...' -> HttpLoader,
+    'paket.modul:fungsi' -> CallableLoader.
+    """
+    if not spec:
+        return None
+    if spec.startswith(('http://', 'https://')):
+        return HttpLoader(spec, timeout)
+    module_name, _, attr = spec.partition(':')
+    if not attr:
+        raise ValueError(f"CACHE_LOADER must be a URL or 'module:function', got {spec!r}")
+    fn = getattr(importlib.import_module(module_name), attr)
+    logging.info(f"Cache loader: {module_name}.{attr}")
+    return CallableLoader(fn)
@@ -1,30 +1,345 @@
 # src/nodes/cache_node.py
 
+import json
 import logging
 import asyncio
 import time
-from collections import OrderedDict
+from collections import OrderedDict, deque
 
-from ..communication.message_passing import broadcast_rpc
+from ..communication.message_passing import send_rpc, gather_until
+from ..communication.failure_detector import detector
+from ..utils.config import (
+    CACHE_INVALIDATION_TIMEOUT, CACHE_INVALIDATION_WINDOW, CACHE_INVALIDATION_BATCH_SIZE, CACHE_CONSISTENCY,
+    CACHE_SHARDS, CACHE_READ_BUFFER_SIZE, CACHE_DEFAULT_TTL, CACHE_TTL_TICK, CACHE_TTL_WHEEL_SLOTS,
+    CACHE_TTL_WHEEL_LEVELS, CACHE_CAPACITY_BYTES, CACHE_WINDOW_RATIO, CACHE_PROTECTED_RATIO, CACHE_SKETCH_WIDTH,
+    CACHE_MODE, CACHE_NEAR_CACHE_BYTES, CACHE_NEAR_CACHE_LEASE, CACHE_REFRESH_AHEAD, CACHE_JOURNAL_SIZE,
+)
 from ..utils.metrics import record_latency, increment_counter
+from ..utils.timing_wheel import TimingWheel
+from ..utils.frequency_sketch import CountMinSketch
+
+
+class InvalidationOutbox:
+    """
+    Menampung invalidasi per peer dan mengirimnya sebagai satu RPC
+    /cache/invalidate_batch setiap 'window' detik atau begitu 'batch_size'
+    key terkumpul. Key yang sama dalam satu batch digabung (coalesce).
+    enqueue() mengembalikan future yang selesai dengan True saat peer meng-ack.
+    """
+
+    def __init__(self, window=CACHE_INVALIDATION_WINDOW, batch_size=CACHE_INVALIDATION_BATCH_SIZE):
+        self.window = window
+        self.batch_size = batch_size
+        self._pending = {}  # peer_url -> {'keys': dict, 'futures': [], 'timer': task}
+
+    def enqueue(self, peer_url, key):
+        batch = self._pending.get(peer_url)
+        if batch is None:
+            batch = self._pending[peer_url] = {'keys': {}, 'futures': []}
+            batch['timer'] = asyncio.create_task(self._flush_later(peer_url))
+        batch['keys'][key] = None
+        future = asyncio.get_running_loop().create_future()
+        batch['futures'].append(future)
+        if len(batch['keys']) >= self.batch_size:
+            batch['timer'].cancel()
+            self._flush(peer_url)
+        return future
+
+    async def _flush_later(self, peer_url):
+        await asyncio.sleep(self.window)
+        self._flush(peer_url)
+
+    def _flush(self, peer_url):
+        batch = self._pending.pop(peer_url, None)
+        if batch is not None:
+            asyncio.create_task(self._send(peer_url, batch))
+
+    async def _send(self, peer_url, batch):
+        resp = await send_rpc(peer_url, 'cache/invalidate_batch', {'keys': list(batch['keys'])})
+        increment_counter("cache_invalidation_batches")
+        increment_counter("cache_invalidations_coalesced", len(batch['futures']))
+        acked = bool(resp and resp.get('success'))
+        for future in batch['futures']:
+            if not future.done():
+                future.set_result(acked)
+
+
+# Perkiraan overhead struktur data per entri (dict, OrderedDict, metadata) di luar key dan value
+ENTRY_OVERHEAD_BYTES = 128
+
+
+def entry_size(key, value):
+    """Ukuran entri dalam byte: key + value terserialisasi JSON + overhead tetap."""
+    if type(value) is MappedValue:
+        return len(str(key).encode('utf-8')) + len(value.raw) + ENTRY_OVERHEAD_BYTES
+    encoded = json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+    return len(str(key).encode('utf-8')) + len(encoded) + ENTRY_OVERHEAD_BYTES
+
+
+class MappedValue:
+    """
+    Value dari snapshot yang belum di-decode: view zero-copy (memoryview) ke
+    JSON di file snapshot yang di-mmap. Di-decode saat pertama kali dibaca.
+    """
+
+    __slots__ = ('raw',)
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def decode(self):
+        return json.loads(bytes(self.raw))
+
+
+class _Segment:
+    """Urutan LRU satu segmen (window/probation/protected) beserta total byte-nya."""
+
+    def __init__(self):
+        self.order = OrderedDict()
+        self.bytes = 0
+
+    def add(self, key, size):
+        self.order[key] = None
+        self.bytes += size
+
+    def discard(self, key, size):
+        del self.order[key]
+        self.bytes -= size
+
+    def lru(self, skip=None):
+        for key in self.order:
+            if key != skip:
+                return key
+        return None
+
+
+class CacheShard:
+    """
+    Satu segmen cache berbatas byte dengan kebijakan W-TinyLFU. Entri baru masuk
+    window LRU kecil; entri yang keluar dari window hanya diterima ke main
+    (SLRU probation/protected) jika frekuensinya menurut count-min sketch lebih
+    tinggi dari korban yang akan digusur, sehingga scan key dingin tidak
+    menggusur hot set. Pembacaan tidak mengambil lock: hit dicatat di read
+    buffer dan recency diperbarui per batch. Lock hanya melindungi write.
+    """
+
+    def __init__(self, capacity_bytes, sketch, read_buffer_size=CACHE_READ_BUFFER_SIZE,
+                 window_ratio=CACHE_WINDOW_RATIO, protected_ratio=CACHE_PROTECTED_RATIO):
+        self.capacity_bytes = capacity_bytes
+        self.window_capacity = max(1, int(capacity_bytes * window_ratio))
+        self.main_capacity = capacity_bytes - self.window_capacity
+        self.protected_capacity = int(self.main_capacity * protected_ratio)
+        self.sketch = sketch
+        self.read_buffer_size = read_buffer_size
+        self.entries = {}  # key -> value (lookup tanpa lock)
+        self.sizes = {}    # key -> byte
+        self.expires = {}  # key -> deadline time.monotonic (hanya key dengan TTL)
+        self.refresh_at = {}  # key -> waktu setelah itu hit memicu refresh-ahead (hanya key hasil loader)
+        self.window, self.probation, self.protected = _Segment(), _Segment(), _Segment()
+        self._location = {}  # key -> segmen tempat key berada
+        self.lock = asyncio.Lock()
+        self._read_buffer = []
+
+    @property
+    def bytes_used(self):
+        return self.window.bytes + self.probation.bytes + self.protected.bytes
+
+    def is_expired(self, key, now):
+        deadline = self.expires.get(key)
+        return deadline is not None and deadline <= now
+
+    def remove(self, key):
+        """Menghapus key; True jika key ada."""
+        if key not in self.entries:
+            return False
+        self._location.pop(key).discard(key, self.sizes.pop(key))
+        del self.entries[key]
+        self.expires.pop(key, None)
+        self.refresh_at.pop(key, None)
+        return True
+
+    def materialize(self, key):
+        """Nilai key; MappedValue dari snapshot di-decode sekali lalu menggantikan view-nya."""
+        value = self.entries[key]
+        if type(value) is MappedValue:
+            value = self.entries[key] = value.decode()
+        return value
+
+    def restore(self, key, value, size, deadline, segment):
+        """
+        Menaruh entri snapshot langsung di segmen asalnya ('window'/'probation'/'protected')
+        tanpa admission, sehingga urutan LRU terjaga. False jika segmen sudah penuh.
+        """
+        target = getattr(self, segment)
+        limit = self.window_capacity if target is self.window else self.main_capacity
+        used = target.bytes if target is self.window else self.probation.bytes + self.protected.bytes
+        if key in self.entries or used + size > limit:
+            return False
+        target.add(key, size)
+        self._location[key] = target
+        self.entries[key] = value
+        self.sizes[key] = size
+        if deadline is not None:
+            self.expires[key] = deadline
+        return True
+
+    def segment_of(self, key):
+        segment = self._location[key]
+        return 'window' if segment is self.window else 'probation' if segment is self.probation else 'protected'
+
+    def record_hit(self, key):
+        self._read_buffer.append(key)
+        if len(self._read_buffer) >= self.read_buffer_size:
+            self.drain_reads()
+
+    def drain_reads(self):
+        """Menerapkan hit yang tertunda: perbarui recency, promosikan probation ke protected."""
+        buffer, self._read_buffer = self._read_buffer, []
+        for key in buffer:
+            segment = self._location.get(key)
+            if segment is self.probation:
+                self._move(key, self.protected)
+            elif segment is not None:
+                segment.order.move_to_end(key)
+        # Protected penuh: entri tertua turun kembali ke probation
+        while self.protected.bytes > self.protected_capacity and self.protected.order:
+            self._move(self.protected.lru(), self.probation)
+
+    def put(self, key, value, size, deadline=None, refresh_at=None):
+        """Menyimpan key (deadline None = tanpa TTL); mengembalikan daftar key yang di-evict."""
+        self.drain_reads()
+        if key in self.entries:
+            segment = self._location[key]
+            segment.bytes += size - self.sizes[key]
+            segment.order.move_to_end(key)
+        else:
+            self.window.add(key, size)
+            self._location[key] = self.window
+        self.entries[key] = value
+        self.sizes[key] = size
+        if deadline is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = deadline
+        if refresh_at is None:
+            self.refresh_at.pop(key, None)
+        else:
+            self.refresh_at[key] = refresh_at
+        return self._evict()
+
+    def _move(self, key, target):
+        size = self.sizes[key]
+        self._location[key].discard(key, size)
+        target.add(key, size)
+        self._location[key] = target
+
+    def _evict(self):
+        """Menjaga batas byte window dan main; admission TinyLFU untuk kandidat dari window."""
+        evicted = []
+        while self.window.bytes > self.window_capacity:
+            candidate = self.window.lru()
+            self._move(candidate, self.probation)
+            increment_counter("cache_admission_candidates")
+            while self.probation.bytes + self.protected.bytes > self.main_capacity:
+                victim = self.probation.lru(skip=candidate)
+                if victim is None:
+                    victim = self.protected.lru()
+                if victim is None or self.sketch.estimate(candidate) <= self.sketch.estimate(victim):
+                    # Kandidat tidak lebih sering diakses dari korban: kandidat yang dibuang
+                    increment_counter("cache_admission_rejections")
+                    victim = candidate
+                self.remove(victim)
+                evicted.append(victim)
+                if victim == candidate:
+                    break
+        # Entri di main yang membesar (update value) juga bisa melewati batas
+        while self.probation.bytes + self.protected.bytes > self.main_capacity:
+            victim = self.probation.lru()
+            if victim is None:
+                victim = self.protected.lru()
+            self.remove(victim)
+            evicted.append(victim)
+        return evicted
+
+
+# Jumlah key dengan lease near-cache sebelum lease kedaluwarsa disapu
+LEASE_SWEEP_THRESHOLD = 10000
 
 
 class CacheNode:
     """
     Mengimplementasikan cache node terdistribusi dengan protokol koherensi sederhana
-    (invalidation) dan kebijakan penggantian LRU (Least Recently Used).
+    (invalidation). Kapasitas diukur dalam byte dan penggantian memakai W-TinyLFU.
+    Cache dibagi menjadi CACHE_SHARDS segmen independen berdasarkan hash key,
+    sehingga write ke satu shard tidak menahan operasi di shard lain.
+
+    Mode 'replicated': setiap node menyimpan salinan sendiri dan write
+    menginvalidasi semua peer. Mode 'partitioned': setiap key punya satu owner
+    menurut 'ring' (ConsistentHashRing), get/set dari node lain diteruskan ke
+    owner, sehingga kapasitas total tumbuh dengan jumlah node. Node non-owner
+    boleh menyimpan salinan kecil (near-cache) selama lease dari owner; owner
+    mencatat pemegang lease dan hanya menginvalidasi mereka saat write.
+
+    Dengan 'loader', miss di owner dibaca dari backend (read-through). Miss
+    bersamaan untuk key yang sama berbagi satu load (singleflight), dan key
+    ber-TTL yang masih dibaca dimuat ulang sebelum kedaluwarsa (refresh-ahead).
     """
 
-    def __init__(self, node_id, peers, capacity=100):
+    def __init__(self, node_id, peers, capacity_bytes=CACHE_CAPACITY_BYTES, consistency=CACHE_CONSISTENCY,
+                 num_shards=CACHE_SHARDS, mode=CACHE_MODE, ring=None, near_cache_bytes=CACHE_NEAR_CACHE_BYTES,
+                 loader=None, refresh_ahead=CACHE_REFRESH_AHEAD):
         self.node_id = node_id
         self.peers = peers
-        self.capacity = capacity
+        self.capacity_bytes = capacity_bytes
+        self.mode = mode
+        self.ring = ring
+        # sync: set menunggu ack invalidasi (maks. CACHE_INVALIDATION_TIMEOUT); async: kembali segera
+        self.consistency = consistency
+        self.outbox = InvalidationOutbox()
+
+        # Kapasitas dibagi rata per shard; satu sketch frekuensi dipakai bersama semua shard
+        self.sketch = CountMinSketch(width=CACHE_SKETCH_WIDTH)
+        num_shards = max(1, num_shards)
+        self.shards = [CacheShard(capacity_bytes // num_shards, self.sketch) for _ in range(num_shards)]
+        # TTL: timing wheel menghapus key kedaluwarsa di background; get juga memeriksa secara lazy
+        self.ttl_wheel = TimingWheel(tick=CACHE_TTL_TICK, slots=CACHE_TTL_WHEEL_SLOTS, levels=CACHE_TTL_WHEEL_LEVELS)
+        self._expiry_task = None
 
-        # OrderedDict cocok untuk implementasi LRU karena mempertahankan urutan penggunaan.
-        self.cache = OrderedDict()
-        self.lock = asyncio.Lock()  # Melindungi akses ke cache (concurrency-safe)
+        # Near-cache (mode partitioned): deadline entri = akhir lease dari owner
+        self.near_cache = None
+        if mode == 'partitioned' and near_cache_bytes > 0:
+            self.near_cache = CacheShard(near_cache_bytes, CountMinSketch(width=1024))
+        self._lease_holders = {}  # key -> {peer_id: deadline lease} (di owner)
+        self._invalidation_seq = 0  # Naik setiap invalidasi diterima; mencegah near-cache menyimpan respons basi
 
-        logging.info(f"[{self.node_id}] CacheNode initialized with capacity {self.capacity}")
+        # Read-through: satu task load per key (singleflight); key yang ditulis/diinvalidasi
+        # selama load berjalan masuk _stale_loads agar hasil load tidak menimpa nilai baru
+        self.loader = loader
+        self.refresh_ahead = refresh_ahead  # Porsi TTL sebelum hit memicu reload; 0 = nonaktif
+        self._loads = {}
+        self._stale_loads = set()
+
+        # Jurnal write yang diterapkan node ini sebagai penulis (owner), untuk node lain yang
+        # memulihkan snapshot: key yang berubah selama mereka mati. _journal_floor = batas
+        # waktu paling awal yang masih tercakup jurnal (awal proses atau entri terlama yang dibuang).
+        self.journal = deque(maxlen=CACHE_JOURNAL_SIZE)
+        self._journal_floor = time.time()
+        self.snapshotter = None  # CacheSnapshotter (opsional) mencatat key yang berubah sejak snapshot terakhir
+
+        logging.info(f"[{self.node_id}] CacheNode initialized in {mode} mode with {self.capacity_bytes} bytes "
+                     f"in {num_shards} shard(s)")
+
+    def _shard_index(self, key):
+        return hash(key) % len(self.shards)
+
+    def _shard(self, key):
+        return self.shards[self._shard_index(key)]
+
+    def owner_of(self, key):
+        """Node pemilik key; di mode replicated selalu node ini."""
+        if self.mode != 'partitioned' or self.ring is None:
+            return self.node_id
+        return self.ring.get_node(key) or self.node_id
 
     # --------------------------------------------------------------------------
     # 🧠 CACHE OPERATIONS
@@ -32,70 +347,362 @@ class CacheNode:
 
     async def get(self, key):
         """
-        Mendapatkan nilai dari cache berdasarkan kunci.
-        Menghitung latensi, menghitung hit/miss, dan memperbarui urutan LRU.
+        Mendapatkan nilai dari cache berdasarkan kunci (diteruskan ke owner di mode partitioned).
+        Menghitung latensi dan hit/miss; tanpa lock, recency dicatat di read buffer shard.
         """
         start_time = time.time()
         increment_counter("cache_get_requests")
 
-        async with self.lock:
-            if key not in self.cache:
-                logging.info(f"[{self.node_id}] Cache MISS for key: {key}")
-                increment_counter("cache_misses")
-                record_latency("cache_get_miss_latency", start_time)
-                return None
+        owner = self.owner_of(key)
+        if owner == self.node_id:
+            value = self._get_local(key)
+        else:
+            value = await self._get_remote(owner, key)
+
+        if value is None:
+            logging.debug(f"[{self.node_id}] Cache MISS for key: {key}")
+            increment_counter("cache_misses")
+            record_latency("cache_get_miss_latency", start_time)
+            if owner == self.node_id and self.loader is not None:
+                return await self.load(key)
+            return None
+
+        logging.debug(f"[{self.node_id}] Cache HIT for key: {key}")
+        increment_counter("cache_hits")
+        record_latency("cache_get_hit_latency", start_time)
+        return value
+
+    def _get_local(self, key):
+        shard = self._shard(key)
+        now = time.monotonic()
+        self.sketch.increment(key)  # Frekuensi dicatat untuk hit maupun miss (TinyLFU)
+        if key in shard.entries and shard.is_expired(key, now):
+            self._expire(shard, key)
+        if key not in shard.entries:
+            return None
+        shard.record_hit(key)
+        refresh_at = shard.refresh_at.get(key)
+        if refresh_at is not None and refresh_at <= now and key not in self._loads:
+            # Key masih dibaca mendekati TTL: muat ulang di background, pembaca tetap dapat nilai lama
+            del shard.refresh_at[key]
+            increment_counter("cache_refresh_ahead")
+            self._start_load(key)
+        return shard.materialize(key)
+
+    # --------------------------------------------------------------------------
+    # 📥 READ-THROUGH LOADER
+    # --------------------------------------------------------------------------
+
+    async def load(self, key):
+        """Memuat key dari loader dan menyimpannya; miss bersamaan untuk key yang sama berbagi satu load."""
+        task = self._loads.get(key)
+        if task is None:
+            task = self._start_load(key)
+        else:
+            increment_counter("cache_load_coalesced")
+        # shield: pembatalan satu pemanggil tidak membatalkan load milik pemanggil lain
+        return await asyncio.shield(task)
 
-            # Pindahkan kunci ke akhir untuk menunjukkan penggunaan terbaru
-            self.cache.move_to_end(key)
-            logging.info(f"[{self.node_id}] Cache HIT for key: {key}")
+    def _start_load(self, key):
+        task = asyncio.get_running_loop().create_task(self._load(key))
+        self._loads[key] = task
+        task.add_done_callback(lambda done: self._loads.pop(key) if self._loads.get(key) is done else None)
+        return task
 
-            increment_counter("cache_hits")
-            record_latency("cache_get_hit_latency", start_time)
-            return self.cache[key]
+    async def _load(self, key):
+        start_time = time.time()
+        increment_counter("cache_loads")
+        self._stale_loads.discard(key)
+        try:
+            value = await self.loader(key)
+        except Exception as e:
+            increment_counter("cache_load_errors")
+            logging.warning(f"[{self.node_id}] Loader failed for key '{key}': {e}")
+            return None
+        finally:
+            record_latency("cache_load_latency", start_time)
+
+        if value is None:
+            return None
+        if key in self._stale_loads:
+            # Key ditulis/diinvalidasi selama load: nilai dikembalikan ke pemanggil, tetapi tidak di-cache
+            self._stale_loads.discard(key)
+            return value
+        await self.store_local(key, value, CACHE_DEFAULT_TTL, loaded=True)
+        return value
+
+    async def _get_remote(self, owner, key):
+        """Near-cache dulu (selama lease berlaku), lalu minta ke owner."""
+        now = time.monotonic()
+        if self.near_cache is not None and key in self.near_cache.entries:
+            if not self.near_cache.is_expired(key, now):
+                self.near_cache.record_hit(key)
+                increment_counter("cache_near_hits")
+                return self.near_cache.entries[key]
+            self.near_cache.remove(key)
+
+        owner_url = self.peers.get(owner)
+        if owner_url is None or not detector.allow_request(owner_url):
+            return None
+        if self.near_cache is not None:
+            self.near_cache.sketch.increment(key)  # Admission near-cache mengikuti frekuensi lokal
+        seq = self._invalidation_seq
+        increment_counter("cache_forwarded_gets")
+        resp = await send_rpc(owner_url, 'cache/owner_get', {'key': key, 'from': self.node_id,
+                                                             'lease': self.near_cache is not None})
+        if not resp or not resp.get('found'):
+            return None
+        if self.near_cache is not None and resp.get('lease') and seq == self._invalidation_seq:
+            # Lease dihitung dari waktu request dikirim, jadi selalu berakhir sebelum catatan di owner
+            self.near_cache.put(key, resp['value'], entry_size(key, resp['value']), now + resp['lease'])
+        return resp['value']
+
+    def peek(self, key):
+        """Nilai lokal tanpa memengaruhi recency atau metrik (None jika tidak ada/kedaluwarsa)."""
+        shard = self._shard(key)
+        if key not in shard.entries or shard.is_expired(key, time.monotonic()):
+            return None
+        return shard.materialize(key)
+
+    async def store_local(self, key, value, ttl=None, loaded=False):
+        """
+        Menyimpan key di shard-nya tanpa invalidasi ke peer; ttl dalam detik
+        (None/0 = tanpa TTL). Key hasil loader ('loaded') dengan TTL dijadwalkan
+        untuk refresh-ahead. Mengembalikan True jika key tersimpan (False jika
+        terlalu besar untuk shard atau ditolak admission W-TinyLFU).
+        """
+        shard = self._shard(key)
+        size = entry_size(key, value)
+        self.sketch.increment(key)
+        if size > shard.capacity_bytes:
+            # Value lebih besar dari satu shard tidak pernah di-cache; salinan lama dibuang
+            async with shard.lock:
+                shard.remove(key)
+            self.ttl_wheel.cancel(key)
+            increment_counter("cache_oversize_rejections")
+            logging.warning(f"[{self.node_id}] Value for '{key}' ({size} bytes) exceeds shard capacity, not cached")
+            return False
+
+        now = time.monotonic()
+        deadline = now + ttl if ttl else None
+        refresh_at = now + ttl * self.refresh_ahead if loaded and ttl and self.refresh_ahead > 0 else None
+        async with shard.lock:
+            evicted = shard.put(key, value, size, deadline, refresh_at)
+        if deadline is None:
+            self.ttl_wheel.cancel(key)
+        else:
+            self.ttl_wheel.schedule(key, deadline)
+        for evicted_key in evicted:
+            self.ttl_wheel.cancel(evicted_key)
+            logging.debug(f"[{self.node_id}] Cache shard full. Evicted key: {evicted_key}")
+        if evicted:
+            increment_counter("cache_evictions", len(evicted))
+        return key in shard.entries
 
-    async def set(self, key, value):
+    async def set(self, key, value, ttl=None):
         """
-        Menetapkan nilai di cache.
-        Jika penuh, item LRU akan dihapus.
-        Setelah itu, broadcast invalidation ke semua peer.
+        Menetapkan nilai di cache, opsional dengan TTL (detik; default CACHE_DEFAULT_TTL).
+        Jika shard penuh, entri digusur menurut W-TinyLFU. Di mode partitioned,
+        write dari non-owner diteruskan ke owner.
         """
         start_time = time.time()
         increment_counter("cache_set_requests")
+        ttl = CACHE_DEFAULT_TTL if ttl is None else ttl
 
-        async with self.lock:
-            evicted = False
+        owner = self.owner_of(key)
+        if owner == self.node_id:
+            result = await self._set_owned(key, value, ttl)
+        else:
+            result = await self._set_remote(owner, key, value, ttl)
 
-            # Jika cache penuh dan key baru → hapus yang paling lama
-            if len(self.cache) >= self.capacity and key not in self.cache:
-                oldest_key, _ = self.cache.popitem(last=False)
-                logging.info(f"[{self.node_id}] Cache full. Evicted key: {oldest_key}")
-                increment_counter("cache_evictions")
-                evicted = True
+        record_latency("cache_set_latency", start_time)
+        return result
 
-            self.cache[key] = value
-            self.cache.move_to_end(key)
-            logging.info(f"[{self.node_id}] Set key '{key}' locally (evicted={evicted}).")
+    async def _set_owned(self, key, value, ttl):
+        self._note_invalidation([key])
+        if len(self.journal) == self.journal.maxlen:
+            self._journal_floor = self.journal[0][0]
+        self.journal.append((time.time(), key))
+        stored = await self.store_local(key, value, ttl)
+        logging.debug(f"[{self.node_id}] Set key '{key}' locally (stored={stored}).")
 
-        # Siarkan pesan invalidasi ke semua peer lain
-        logging.info(f"[{self.node_id}] Broadcasting invalidation for key: {key}")
-        await broadcast_rpc(self.peers, 'cache/invalidate', {'key': key})
+        # Replicated: semua peer punya salinan. Partitioned: hanya pemegang lease near-cache.
+        targets = self.peers if self.mode != 'partitioned' else self._take_lease_holders(key)
+
+        # Invalidasi lewat outbox (digabung per peer dalam satu batch).
+        # Mode sync menunggu ack paling lama CACHE_INVALIDATION_TIMEOUT; peer yang
+        # dicurigai mati tetap dikirimi, tetapi tidak ditunggu.
+        acks = {peer_id: self.outbox.enqueue(url, key) for peer_id, url in targets.items()}
+        if self.consistency == 'sync' and acks:
+            awaited = [peer_id for peer_id, url in targets.items() if not detector.is_suspected(url)]
+            acked = await gather_until(acks, predicate=lambda responses: all(peer_id in responses for peer_id in awaited),
+                                       timeout=CACHE_INVALIDATION_TIMEOUT, cancel_pending=False)
+            missing = [peer_id for peer_id in acks if not acked.get(peer_id)]
+            if missing:
+                logging.warning(f"[{self.node_id}] Invalidation for '{key}' not yet acknowledged by {missing}")
 
-        record_latency("cache_set_latency", start_time)
         return {"success": True, "message": f"Key '{key}' set and invalidated across peers."}
 
+    async def _set_remote(self, owner, key, value, ttl):
+        if self.near_cache is not None:
+            self.near_cache.remove(key)
+        self._invalidation_seq += 1  # Respons get yang sedang berjalan tidak boleh masuk near-cache
+        owner_url = self.peers.get(owner)
+        if owner_url is None or not detector.allow_request(owner_url):
+            return {"success": False, "message": f"Owner {owner} of key '{key}' is unavailable"}
+        increment_counter("cache_forwarded_sets")
+        resp = await send_rpc(owner_url, 'cache/owner_set', {'key': key, 'value': value, 'ttl': ttl})
+        if resp is None:
+            return {"success": False, "message": f"Failed to forward set to owner {owner}"}
+        return resp
+
+    # --------------------------------------------------------------------------
+    # 🧭 OWNER ENDPOINTS & LEASES (mode partitioned)
+    # --------------------------------------------------------------------------
+
+    async def handle_owner_get(self, key, requester, want_lease):
+        """Get dari non-owner; memberi lease near-cache jika diminta. Miss dibaca lewat loader."""
+        value = self._get_local(key)
+        if value is None and self.loader is not None:
+            value = await self.load(key)
+        if value is None:
+            return {"success": True, "found": False}
+        lease = 0
+        if want_lease and requester in self.peers:
+            lease = CACHE_NEAR_CACHE_LEASE
+            self._grant_lease(key, requester, time.monotonic() + lease)
+        return {"success": True, "found": True, "value": value, "lease": lease}
+
+    async def handle_owner_set(self, key, value, ttl):
+        # Tidak diteruskan lagi walau view ring berbeda, agar tidak terjadi ping-pong
+        return await self._set_owned(key, value, ttl)
+
+    def _grant_lease(self, key, peer_id, deadline):
+        if len(self._lease_holders) > LEASE_SWEEP_THRESHOLD:
+            now = time.monotonic()
+            for holder_key in list(self._lease_holders):
+                holders = {p: d for p, d in self._lease_holders[holder_key].items() if d > now}
+                if holders:
+                    self._lease_holders[holder_key] = holders
+                else:
+                    del self._lease_holders[holder_key]
+        self._lease_holders.setdefault(key, {})[peer_id] = deadline
+
+    def _take_lease_holders(self, key):
+        """Pemegang lease yang masih berlaku untuk key (dan hapus catatannya)."""
+        now = time.monotonic()
+        holders = self._lease_holders.pop(key, {})
+        return {peer_id: self.peers[peer_id] for peer_id, deadline in holders.items()
+                if deadline > now and peer_id in self.peers}
+
+    def rebalance(self):
+        """
+        Dipanggil saat membership berubah: buang key yang tidak lagi dimiliki node ini
+        agar salinan lama tidak terbaca jika kepemilikan kembali, dan kosongkan near-cache.
+        """
+        if self.mode != 'partitioned':
+            return
+        dropped = 0
+        for shard in self.shards:
+            for key in [key for key in shard.entries if self.owner_of(key) != self.node_id]:
+                shard.remove(key)
+                self.ttl_wheel.cancel(key)
+                dropped += 1
+        if self.near_cache is not None:
+            for key in list(self.near_cache.entries):
+                self.near_cache.remove(key)
+        self._invalidation_seq += 1
+        if dropped:
+            logging.info(f"[{self.node_id}] Ownership changed: dropped {dropped} key(s) now owned by other nodes")
+
     async def handle_invalidation(self, key):
         """
         Menangani permintaan invalidasi dari peer lain.
         Menghapus entri cache jika ada.
         """
-        async with self.lock:
-            if key in self.cache:
-                del self.cache[key]
+        self._note_invalidation([key])
+        shard = self._shard(key)
+        async with shard.lock:
+            if shard.remove(key):
+                self.ttl_wheel.cancel(key)
                 logging.info(f"[{self.node_id}] Invalidated key '{key}' from local cache.")
                 return {"success": True, "message": "Key invalidated"}
 
         return {"success": True, "message": "Key not in cache"}
 
+    async def handle_invalidation_batch(self, keys):
+        """Menangani batch invalidasi dari peer; key dikelompokkan per shard agar tiap lock diambil sekali."""
+        self._note_invalidation(keys)
+        by_shard = {}
+        for key in keys:
+            by_shard.setdefault(self._shard_index(key), []).append(key)
+        invalidated = 0
+        for index, shard_keys in by_shard.items():
+            shard = self.shards[index]
+            async with shard.lock:
+                for key in shard_keys:
+                    if shard.remove(key):
+                        self.ttl_wheel.cancel(key)
+                        invalidated += 1
+        if invalidated:
+            logging.info(f"[{self.node_id}] Invalidated {invalidated} of {len(keys)} key(s) from local cache.")
+        return {"success": True, "invalidated": invalidated}
+
+    def _note_invalidation(self, keys):
+        """Buang salinan near-cache dan tandai load yang sedang berjalan untuk key ini sebagai basi."""
+        self._invalidation_seq += 1
+        for key in keys:
+            if self.near_cache is not None:
+                self.near_cache.remove(key)
+            if key in self._loads:
+                self._stale_loads.add(key)
+        if self.snapshotter is not None:
+            self.snapshotter.record(keys)
+
+    async def handle_journal(self, since):
+        """
+        Key yang ditulis di node ini sejak 'since' (time.time()). complete=False jika
+        jurnal tidak menjangkau sejauh itu (node baru start atau jurnal sudah terpotong).
+        """
+        keys = []
+        for written_at, key in reversed(self.journal):
+            if written_at < since:
+                break
+            keys.append(key)
+        return {"success": True, "complete": since >= self._journal_floor, "keys": keys}
+
+    # --------------------------------------------------------------------------
+    # ⏱️ TTL EXPIRATION
+    # --------------------------------------------------------------------------
+
+    def _expire(self, shard, key):
+        shard.remove(key)
+        self.ttl_wheel.cancel(key)
+        increment_counter("cache_expirations")
+        logging.debug(f"[{self.node_id}] Expired key: {key}")
+
+    def expire_due(self, now=None):
+        """Menghapus key yang deadline-nya lewat; hanya key dari slot wheel yang jatuh tempo yang disentuh."""
+        now = time.monotonic() if now is None else now
+        for key in self.ttl_wheel.advance(now):
+            shard = self._shard(key)
+            if shard.is_expired(key, now):
+                self._expire(shard, key)
+
+    def start_expiry_monitor(self):
+        if self._expiry_task is None:
+            self._expiry_task = asyncio.create_task(self._run_expiry())
+
+    def stop_expiry_monitor(self):
+        if self._expiry_task is not None:
+            self._expiry_task.cancel()
+            self._expiry_task = None
+
+    async def _run_expiry(self):
+        while True:
+            await asyncio.sleep(self.ttl_wheel.tick)
+            self.expire_due()
+
     # --------------------------------------------------------------------------
     # 📊 STATUS & DIAGNOSTIC
     # --------------------------------------------------------------------------
@@ -104,7 +711,15 @@ class CacheNode:
         """Mengembalikan status cache saat ini."""
         return {
             "node_id": self.node_id,
-            "size": len(self.cache),
-            "capacity": self.capacity,
-            "keys": list(self.cache.keys())
+            "mode": self.mode,
+            "near_cache_size": len(self.near_cache.entries) if self.near_cache is not None else 0,
+            "size": sum(len(shard.entries) for shard in self.shards),
+            "bytes_used": sum(shard.bytes_used for shard in self.shards),
+            "capacity_bytes": self.capacity_bytes,
+            "policy": "w-tinylfu",
+            "shards": len(self.shards),
+            "ttl_keys": len(self.ttl_wheel),
+            "loader": self.loader is not None,
+            "loads_in_flight": len(self._loads),
+            "keys": [key for shard in self.shards for key in shard.entries]
         }
@@ -0,0 +1,254 @@
+# src/nodes/cache_snapshot.py
+
+import asyncio
+import glob
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+from ..communication.message_passing import send_rpc
+from ..utils.config import CACHE_SNAPSHOT_INTERVAL, CACHE_SNAPSHOT_CLOCK_SKEW
+from ..utils.metrics import increment_counter, record_latency
+from .cache_node import MappedValue, entry_size
+
+# Format file: preamble | header JSON | jumlah record | record...
+# Record: segmen, expires (time.time(), 0 = tanpa TTL), panjang key, panjang value, key, value JSON
+MAGIC = b'CSNP'
+VERSION = 1
+_PREAMBLE = struct.Struct('<4sBI')
+_COUNT = struct.Struct('<I')
+_RECORD = struct.Struct('<BdII')
+SEGMENTS = ('window', 'probation', 'protected')
+
+
+class CacheSnapshotter:
+    """
+    Snapshot periodik isi cache (beserta segmen dan urutan LRU) untuk warm restart.
+
+    Saat start, file snapshot di-mmap dan value dipasang sebagai MappedValue
+    (view zero-copy) yang baru di-decode saat dibaca. Key yang mungkin berubah
+    setelah snapshot dibuang sebelum dipasang:
+      * jurnal lokal '<path>.journal.<generasi>': key yang ditulis/diinvalidasi
+        di node ini sejak snapshot (append per write, bertahan jika proses crash);
+      * jurnal peer ('cache/journal'): key yang ditulis node lain sejak waktu
+        snapshot, termasuk selama node ini mati. Jika ada peer yang tidak
+        menjawab atau jurnalnya tidak menjangkau waktu snapshot, snapshot dibuang.
+    """
+
+    def __init__(self, cache, path, interval=CACHE_SNAPSHOT_INTERVAL):
+        self.cache = cache
+        self.path = path
+        self.interval = interval
+        self.generation = 0  # Generasi jurnal lokal yang sedang ditulis
+        self._journal_fd = None
+        self._map = None  # mmap snapshot yang dipulihkan; tetap terbuka selama ada MappedValue
+        self._task = None
+        cache.snapshotter = self
+
+    # --------------------------------------------------------------------------
+    # 📝 JURNAL LOKAL
+    # --------------------------------------------------------------------------
+
+    def _journal_path(self, generation):
+        return f"{self.path}.journal.{generation}"
+
+    def _journal_generations(self):
+        generations = []
+        for journal in glob.glob(f"{glob.escape(self.path)}.journal.*"):
+            suffix = journal.rsplit('.', 1)[1]
+            if suffix.isdigit():
+                generations.append(int(suffix))
+        return sorted(generations)
+
+    def _open_journal(self, generation):
+        old_fd = self._journal_fd
+        self.generation = generation
+        self._journal_fd = os.open(self._journal_path(generation), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        if old_fd is not None:
+            os.close(old_fd)
+
+    def record(self, keys):
+        """Mencatat key yang berubah sejak snapshot terakhir (satu write() tanpa buffer, aman jika proses crash)."""
+        if self._journal_fd is not None:
+            os.write(self._journal_fd, ''.join(json.dumps(key) + '\n' for key in keys).encode('utf-8'))
+
+    def _local_journal_keys(self, since_generation):
+        keys = set()
+        for generation in self._journal_generations():
+            if generation < since_generation:
+                continue
+            with open(self._journal_path(generation), 'rb') as f:
+                for line in f:
+                    try:
+                        keys.add(json.loads(line))
+                    except ValueError:
+                        pass  # Baris terakhir terpotong saat crash
+        return keys
+
+    # --------------------------------------------------------------------------
+    # 💾 SNAPSHOT
+    # --------------------------------------------------------------------------
+
+    async def snapshot(self):
+        """Mengambil snapshot tanpa menahan event loop: salinan referensi per shard, serialisasi di thread."""
+        start_time = time.time()
+        # Rotasi jurnal dulu: write sejak titik ini tercatat di generasi baru dan dibuang saat restore
+        self._open_journal(self.generation + 1)
+        generation = self.generation
+        snapshot_time, now = time.time(), time.monotonic()
+        records = []
+        for shard in self.cache.shards:
+            for code, segment in enumerate((shard.window, shard.probation, shard.protected)):
+                for key in segment.order:
+                    deadline = shard.expires.get(key)
+                    expires = 0.0 if deadline is None else snapshot_time + (deadline - now)
+                    records.append((code, expires, key, shard.entries[key]))
+            await asyncio.sleep(0)  # Beri giliran ke request lain di antara shard
+
+        header = {"generation": generation, "snapshot_time": snapshot_time, "node_id": self.cache.node_id,
+                  "peers": dict(self.cache.peers)}
+        await asyncio.to_thread(self._write, header, records)
+        increment_counter("cache_snapshots")
+        record_latency("cache_snapshot_latency", start_time)
+        logging.info(f"[{self.cache.node_id}] Cache snapshot written: {len(records)} entries (generation {generation})")
+        return len(records)
+
+    def _write(self, header, records):
+        tmp_path = f"{self.path}.tmp"
+        encoded_header = json.dumps(header).encode('utf-8')
+        with open(tmp_path, 'wb') as f:
+            f.write(_PREAMBLE.pack(MAGIC, VERSION, len(encoded_header)))
+            f.write(encoded_header)
+            f.write(_COUNT.pack(len(records)))
+            for code, expires, key, value in records:
+                encoded_key = str(key).encode('utf-8')
+                if type(value) is MappedValue:
+                    raw = value.raw  # Belum pernah dibaca: salin byte apa adanya tanpa decode
+                else:
+                    raw = json.dumps(value, separators=(',', ':'), default=str).encode('utf-8')
+                f.write(_RECORD.pack(code, expires, len(encoded_key), len(raw)))
+                f.write(encoded_key)
+                f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        # mmap snapshot lama tetap valid setelah replace (inode lama hidup selama masih di-map)
+        os.replace(tmp_path, self.path)
+        for generation in self._journal_generations():
+            if generation < header["generation"]:
+                os.remove(self._journal_path(generation))
+
+    # --------------------------------------------------------------------------
+    # ♻️ RESTORE
+    # --------------------------------------------------------------------------
+
+    def _read(self):
+        """Memetakan file snapshot; mengembalikan (header, record) dengan value berupa memoryview."""
+        with open(self.path, 'rb') as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = _PREAMBLE.unpack_from(mapped, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"unsupported snapshot format {magic!r} v{version}")
+        offset = _PREAMBLE.size
+        header = json.loads(mapped[offset:offset + header_len])
+        offset += header_len
+        (count,) = _COUNT.unpack_from(mapped, offset)
+        offset += _COUNT.size
+        view = memoryview(mapped)
+        records = []
+        for _ in range(count):
+            code, expires, key_len, value_len = _RECORD.unpack_from(mapped, offset)
+            offset += _RECORD.size
+            key = str(view[offset:offset + key_len], 'utf-8')
+            offset += key_len
+            records.append((code, expires, key, view[offset:offset + value_len]))
+            offset += value_len
+        return mapped, header, records
+
+    async def _peer_journal_keys(self, header):
+        """Key yang ditulis peer sejak snapshot; None jika ada peer yang jurnalnya tidak bisa dipakai."""
+        since = header["snapshot_time"] - CACHE_SNAPSHOT_CLOCK_SKEW
+        peers = {**header.get("peers", {}), **self.cache.peers}
+        peers.pop(self.cache.node_id, None)
+        responses = await asyncio.gather(*(send_rpc(url, 'cache/journal', {'since': since})
+                                           for url in peers.values()))
+        keys = set()
+        for peer_id, resp in zip(peers, responses):
+            if not resp or not resp.get('complete'):
+                logging.warning(f"[{self.cache.node_id}] Journal from {peer_id} does not cover the snapshot")
+                return None
+            keys.update(resp.get('keys', []))
+        return keys
+
+    async def restore(self):
+        """Memulihkan snapshot (jika ada) ke cache yang masih kosong; mengembalikan jumlah entri yang dipasang."""
+        start_time = time.time()
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        header, records = None, []
+        if os.path.exists(self.path):
+            try:
+                self._map, header, records = self._read()
+            except (OSError, ValueError, struct.error) as e:
+                logging.warning(f"[{self.cache.node_id}] Ignoring unreadable cache snapshot {self.path}: {e}")
+
+        snapshot_generation = header["generation"] if header else 0
+        stale = self._local_journal_keys(snapshot_generation) if header else set()
+        # Jurnal baru dibuka sebelum RPC ke peer agar write yang masuk selama restore ikut tercatat
+        self._open_journal(max(self._journal_generations() + [snapshot_generation]) + 1)
+        if header is None:
+            return 0
+
+        peer_keys = await self._peer_journal_keys(header)
+        if peer_keys is None:
+            logging.warning(f"[{self.cache.node_id}] Discarding cache snapshot: invalidations while down are unknown")
+            return 0
+        stale |= peer_keys
+
+        now_wall, now = time.time(), time.monotonic()
+        restored = 0
+        for code, expires, key, raw in records:
+            if key in stale or (expires and expires <= now_wall) or self.cache.owner_of(key) != self.cache.node_id:
+                continue
+            value = MappedValue(raw)
+            deadline = now + (expires - now_wall) if expires else None
+            if self.cache._shard(key).restore(key, value, entry_size(key, value), deadline, SEGMENTS[code]):
+                if deadline is not None:
+                    self.cache.ttl_wheel.schedule(key, deadline)
+                restored += 1
+
+        increment_counter("cache_snapshot_restored_keys", restored)
+        record_latency("cache_snapshot_restore_latency", start_time)
+        logging.info(f"[{self.cache.node_id}] Restored {restored} of {len(records)} cached entries from snapshot "
+                     f"({len(stale)} key(s) changed since snapshot)")
+        return restored
+
+    # --------------------------------------------------------------------------
+    # 🔁 LIFECYCLE
+    # --------------------------------------------------------------------------
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.snapshot()
+            except Exception as e:
+                logging.error(f"[{self.cache.node_id}] Cache snapshot failed: {e}")
+
+    async def stop(self):
+        """Menghentikan snapshot periodik dan menulis snapshot terakhir (shutdown terencana)."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await self.snapshot()
+        except Exception as e:
+            logging.error(f"[{self.cache.node_id}] Final cache snapshot failed: {e}")
+        if self._journal_fd is not None:
+            os.close(self._journal_fd)
+            self._journal_fd = None
@@ -2,9 +2,12 @@
 
 import asyncio # Gunakan asyncio.Lock
 import logging
+import math
 import threading
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 from datetime import datetime # Untuk audit log timestamp
+from ..utils.config import LOCK_TICK_INTERVAL, LOCK_LEASE_WHEEL_SLOTS, LOCK_LEASE_WHEEL_LEVELS
+from ..utils.timing_wheel import TimingWheel
 
 # Setup logger khusus untuk audit
 audit_logger = logging.getLogger('audit')
@@ -12,42 +15,82 @@ audit_logger.setLevel(logging.INFO)
 # (Tambahkan handler file/lainnya di sini jika ingin log audit terpisah)
 
 class LockManager:
-    """State machine untuk mengelola locks dengan asyncio.Lock, deteksi deadlock, dan audit log."""
+    """
+    State machine untuk mengelola locks dengan asyncio.Lock, deteksi deadlock, dan audit log.
+
+    Lease: acquire dengan 'ttl' > 0 hanya berlaku sampai clock + ttl, diperpanjang
+    dengan command 'keepalive'. Clock adalah waktu logis dari command 'tick' yang
+    diajukan leader lewat Raft, sehingga semua replika mengakhiri lease yang sama
+    pada entri log yang sama. Setiap grant mendapat fencing token yang naik monoton.
+
+    Wait queue: saat lock dilepas, waiter terdepan yang kompatibel langsung diberi
+    lock (FIFO; waiter shared yang berurutan diberikan sekaligus). Setiap replika
+    membangunkan request acquire blocking lokal lewat future di watch_grant().
+    """
     def __init__(self):
         self._locks = {}  # resource_id -> {'type': 'shared'/'exclusive', 'owners': set()}
-        self._wait_list = defaultdict(list) # resource_id -> [client_id_1, ...]
+        self._wait_list = defaultdict(OrderedDict) # resource_id -> {client_id: (lock_type, ttl)} (urutan FIFO, cek O(1))
+        self._held = defaultdict(set) # client_id -> resource yang dipegang (index balik dari _locks)
+        # Wait-For Graph dipelihara inkremental saat grant/wait/release (tidak dibangun ulang per konflik):
+        # waiter -> {owner: jumlah resource tempat waiter menunggu owner tersebut}
+        self._wait_for = defaultdict(dict)
+        self._waiting_on = defaultdict(set) # client_id -> resource yang sedang ditunggu
+        # Grant aktif: (resource_id, client_id) -> {'token', 'ttl', 'deadline'}; deadline None = tanpa lease
+        self._grants = {}
+        self._fencing_token = 0 # Token terakhir yang diberikan (naik monoton, ikut snapshot)
+        self._clock = 0.0 # Waktu logis = 'now' terbesar dari command tick yang sudah diterapkan
+        # Lease yang sedang berjalan (grant dengan deadline). Set ini, bukan wheel, yang menentukan apakah
+        # tick sedang berjalan: isinya diturunkan dari state yang direplikasi sehingga sama di semua replika
+        self._running_leases = set()
+        self._pending_leases = set() # Lease yang baru mulai dihitung pada tick berikutnya
+        self._lease_wheel = None # TimingWheel: hanya index kandidat expiry untuk _running_leases
+        # Request acquire blocking yang menunggu grant di replika ini: (resource_id, client_id) -> [future]
+        # (bukan bagian state machine: tidak direplikasi dan tidak ikut snapshot)
+        self._grant_watchers = defaultdict(list)
         self._lock_obj = asyncio.Lock() # Gunakan asyncio.Lock
 
     async def apply_command(self, command):
         """Terapkan command dari log Raft ke state machine (sekarang async)."""
         async with self._lock_obj: # Gunakan async with
             action = command['action']
-            resource_id = command['resource_id']
+            if action == 'tick':
+                return self._internal_handle_tick(command['now'])
+
+            resource_id = command.get('resource_id')
             client_id = command['client_id']
 
             if action == 'acquire':
                 lock_type = command.get('lock_type', 'exclusive') # Default ke exclusive jika tidak ada
+                # Entri log lama tanpa 'ttl' tetap tanpa lease agar replay menghasilkan state yang sama
+                ttl = command.get('ttl', 0)
                 # Panggil versi internal sinkron
-                return self._internal_handle_acquire(resource_id, lock_type, client_id)
+                return self._internal_handle_acquire(resource_id, lock_type, client_id, ttl)
             elif action == 'release':
                 # Panggil versi internal sinkron
                 return self._internal_handle_release(resource_id, client_id)
+            elif action == 'release_all':
+                return self._internal_handle_release_all(client_id)
+            elif action == 'keepalive':
+                return self._internal_handle_keepalive(client_id, resource_id)
+            elif action == 'cancel_wait':
+                return self._internal_handle_cancel_wait(resource_id, client_id)
 
         return {"success": False, "message": "Unknown command"}
 
     # --- Fungsi Internal (dijalankan di dalam 'async with self._lock_obj') ---
 
-    def _internal_handle_acquire(self, resource_id, lock_type, client_id):
+    def _internal_handle_acquire(self, resource_id, lock_type, client_id, ttl=0):
         """Logika inti sinkron untuk acquire, termasuk audit log."""
         lock_info = self._locks.get(resource_id)
 
         # Kasus 1: Belum ada lock
         if lock_info is None:
-            self._locks[resource_id] = {"type": lock_type, "owners": {client_id}}
             self._remove_client_from_all_wait_lists(client_id)
+            self._locks[resource_id] = {"type": lock_type, "owners": set()}
+            token = self._add_owner(resource_id, client_id, ttl)
             logging.info(f"Lock GRANTED (new) for {client_id} on {resource_id} ({lock_type})")
-            audit_logger.info(f"LOCK_ACQUIRED; client={client_id}; resource={resource_id}; type={lock_type}; result=GRANTED_NEW; timestamp={datetime.utcnow().isoformat()}Z")
-            return {"success": True, "message": "Lock granted"}
+            audit_logger.info(f"LOCK_ACQUIRED; client={client_id}; resource={resource_id}; type={lock_type}; result=GRANTED_NEW; token={token}; timestamp={datetime.utcnow().isoformat()}Z")
+            return {"success": True, "message": "Lock granted", "fencing_token": token}
 
         # Kasus 2: Lock sudah ada
         current_owners = lock_info['owners']
@@ -56,9 +99,13 @@ class LockManager:
         # 2a. Re-entrant check
         if client_id in current_owners:
             if current_lock_type == 'exclusive' or lock_type == 'shared':
+                 # Acquire ulang memperbarui lease dan mengembalikan token yang sama
+                 grant = self._grants[(resource_id, client_id)]
+                 grant['ttl'] = ttl
+                 self._renew_lease((resource_id, client_id))
                  logging.info(f"Lock already held (re-entrant) by {client_id} on {resource_id}")
                  audit_logger.info(f"LOCK_ACQUIRED; client={client_id}; resource={resource_id}; type={lock_type}; result=GRANTED_REENTRANT; timestamp={datetime.utcnow().isoformat()}Z")
-                 return {"success": True, "message": "Lock already held (re-entrant)"}
+                 return {"success": True, "message": "Lock already held (re-entrant)", "fencing_token": grant['token']}
             # else: Holds shared, requests exclusive -> KONFLIK
 
         # 2b. Cek KONFLIK
@@ -70,23 +117,23 @@ class LockManager:
 
         # 2c. TIDAK ADA KONFLIK (shared on shared)
         if not is_conflict:
-             lock_info['owners'].add(client_id)
              self._remove_client_from_all_wait_lists(client_id)
+             token = self._add_owner(resource_id, client_id, ttl)
              logging.info(f"Lock GRANTED (shared, joining) for {client_id} on {resource_id}")
-             audit_logger.info(f"LOCK_ACQUIRED; client={client_id}; resource={resource_id}; type=shared; result=GRANTED_JOINED; timestamp={datetime.utcnow().isoformat()}Z")
-             return {"success": True, "message": "Shared lock granted"}
+             audit_logger.info(f"LOCK_ACQUIRED; client={client_id}; resource={resource_id}; type=shared; result=GRANTED_JOINED; token={token}; timestamp={datetime.utcnow().isoformat()}Z")
+             return {"success": True, "message": "Shared lock granted", "fencing_token": token}
 
         # --- Kasus 3: KONFLIK TERJADI ---
         logging.info(f"Lock conflict for {client_id} on {resource_id}. Checking deadlock.")
 
         # 3a. Cek jika sudah menunggu
-        if client_id in self._wait_list.get(resource_id, []):
+        if client_id in self._wait_list.get(resource_id, ()):
             logging.info(f"{client_id} is already waiting for {resource_id}")
             # Tidak perlu audit log di sini karena state tidak berubah
-            return {"success": False, "message": "Resource locked, request already in wait list."}
+            return {"success": False, "waiting": True, "message": "Resource locked, request already in wait list."}
 
         # 3b. Tambahkan ke wait list SEBELUM cek deadlock
-        self._wait_list[resource_id].append(client_id)
+        self._add_waiter(resource_id, client_id, lock_type, ttl)
         logging.debug(f"Temporarily added {client_id} to waitlist for {resource_id} for deadlock check")
 
         # 3c. Cek deadlock
@@ -102,8 +149,7 @@ class LockManager:
         # 3d. Proses hasil
         if deadlock_detected:
             # Hapus dari wait list jika deadlock
-            if client_id in self._wait_list.get(resource_id, []): # Perlu cek lagi karena bisa dihapus oleh thread lain (meski kecil kemungkinannya di sini)
-                self._wait_list[resource_id].remove(client_id)
+            self._remove_waiter(resource_id, client_id)
             logging.warning(f"DEADLOCK DETECTED involving {client_id}! Request aborted.")
             audit_logger.warning(f"LOCK_ACQUIRE_FAILED; client={client_id}; resource={resource_id}; type={lock_type}; result=REJECTED_DEADLOCK; timestamp={datetime.utcnow().isoformat()}Z")
             return {"success": False, "message": "Deadlock detected! Request aborted"}
@@ -111,94 +157,370 @@ class LockManager:
             # Tidak ada deadlock, biarkan di wait list
             logging.info(f"{client_id} added permanently to wait list for {resource_id}")
             audit_logger.info(f"LOCK_ACQUIRE_WAITING; client={client_id}; resource={resource_id}; type={lock_type}; timestamp={datetime.utcnow().isoformat()}Z")
-            return {"success": False, "message": "Resource locked, request added to wait list."}
+            return {"success": False, "waiting": True, "message": "Resource locked, request added to wait list."}
 
     def _internal_handle_release(self, resource_id, client_id):
         """Logika inti sinkron untuk release, termasuk audit log."""
         lock_info = self._locks.get(resource_id)
 
         if lock_info and client_id in lock_info['owners']:
-            lock_info['owners'].remove(client_id)
+            self._remove_owner(resource_id, client_id)
             result_detail = "RELEASED_PARTIAL"
 
             if not lock_info['owners']:
                 del self._locks[resource_id]
                 logging.info(f"Lock RELEASED and REMOVED for {client_id} on {resource_id}")
                 result_detail = "RELEASED_FINAL"
-                # Hapus waitlist untuk resource ini jika sudah bebas
-                if resource_id in self._wait_list:
-                     del self._wait_list[resource_id] # Hapus semua waiter untuk resource ini
             else:
                 logging.info(f"Lock RELEASED for {client_id} on {resource_id}, still held by others")
 
             # Hapus klien dari SEMUA waitlist lain tempat ia mungkin menunggu (seharusnya tidak perlu jika _remove_client... dipanggil saat acquire)
             # self._remove_client_from_all_wait_lists(client_id) # Mungkin redundan?
             audit_logger.info(f"LOCK_RELEASED; client={client_id}; resource={resource_id}; result={result_detail}; timestamp={datetime.utcnow().isoformat()}Z")
+            granted = self._grant_waiters(resource_id)
+            if granted:
+                return {"success": True, "message": "Lock released", "granted": granted}
             return {"success": True, "message": "Lock released"}
         else:
             audit_logger.warning(f"LOCK_RELEASE_FAILED; client={client_id}; resource={resource_id}; reason=NOT_OWNER; timestamp={datetime.utcnow().isoformat()}Z")
             return {"success": False, "message": "You do not hold this lock"}
 
-    # --- Deadlock Detection (Versi Iteratif yang Disempurnakan) ---
-    def _detect_deadlock(self, start_client):
-        """Deteksi siklus pada Wait-For Graph (WFG) - Versi Iteratif Final."""
-        
-        # Build the current dependency graph: client -> set(clients they depend on/wait for lock held by)
-        # Ini perlu dibangun SETIAP KALI agar akurat dengan state saat ini
-        dependency_graph = defaultdict(set)
-        for resource, waiters in self._wait_list.items():
-            # Hanya proses resource yang saat ini terkunci
-            if resource in self._locks:
-                 owners = self._locks[resource].get('owners', set())
-                 # Jika resource terkunci (ada owner), tambahkan dependensi
-                 if owners:
-                      for waiter in waiters:
-                           dependency_graph[waiter].update(owners)
-
-        # Iterative DFS using explicit stack and visited set for current path tracking
-        # `visiting` melacak node di path DFS saat ini untuk deteksi siklus
-        # `visited_nodes` melacak semua node yang pernah dikunjungi untuk efisiensi
-        
-        visiting = set()
-        visited_nodes = set()
-        stack = [start_client] # Mulai DFS dari klien yang meminta
+    def _internal_handle_release_all(self, client_id):
+        """Melepas semua lock milik client_id dan mengeluarkannya dari semua wait list (mis. klien terputus)."""
+        released = sorted(self._held.get(client_id, ()))
+        for resource_id in released:
+            self._internal_handle_release(resource_id, client_id)
+        self._remove_client_from_all_wait_lists(client_id)
+        logging.info(f"Released {len(released)} lock(s) held by {client_id}")
+        return {"success": True, "released": released, "message": f"Released {len(released)} lock(s)"}
+
+    def _internal_handle_cancel_wait(self, resource_id, client_id):
+        """
+        Mengeluarkan client_id dari wait list resource_id (acquire blocking yang timeout).
+        Jika lock sudah diberikan sebelum command ini diterapkan, grant dikembalikan
+        agar klien tahu ia memegang lock (bukan dibiarkan sampai lease habis).
+        """
+        lock_info = self._locks.get(resource_id)
+        if lock_info and client_id in lock_info['owners']:
+            token = self._grants[(resource_id, client_id)]['token']
+            return {"success": True, "message": "Lock already granted", "fencing_token": token}
+        if client_id not in self._wait_list.get(resource_id, ()):
+            return {"success": True, "message": "Not in wait list"}
+        self._remove_waiter(resource_id, client_id)
+        audit_logger.info(f"LOCK_WAIT_CANCELLED; client={client_id}; resource={resource_id}; timestamp={datetime.utcnow().isoformat()}Z")
+        return {"success": True, "message": "Removed from wait list"}
+
+    def _grant_waiters(self, resource_id):
+        """
+        Memberikan lock ke waiter terdepan resource_id selama kompatibel dengan lock saat ini
+        (FIFO: exclusive hanya jika lock bebas; shared yang berurutan diberikan bersama dan
+        berhenti di waiter exclusive pertama). Mengembalikan [[client_id, fencing_token], ...].
+        """
+        granted = []
+        waiters = self._wait_list.get(resource_id)
+        while waiters:
+            client_id, (lock_type, ttl) = next(iter(waiters.items()))
+            lock_info = self._locks.get(resource_id)
+            if lock_info is not None and not (lock_info['type'] == 'shared' and lock_type == 'shared'):
+                break
+            self._remove_waiter(resource_id, client_id)
+            if lock_info is None:
+                self._locks[resource_id] = {"type": lock_type, "owners": set()}
+            token = self._add_owner(resource_id, client_id, ttl)
+            granted.append([client_id, token])
+            logging.info(f"Lock GRANTED (from wait list) for {client_id} on {resource_id} ({lock_type})")
+            audit_logger.info(f"LOCK_ACQUIRED; client={client_id}; resource={resource_id}; type={lock_type}; result=GRANTED_FROM_WAIT; token={token}; timestamp={datetime.utcnow().isoformat()}Z")
+            waiters = self._wait_list.get(resource_id)
+        return granted
+
+    def _internal_handle_keepalive(self, client_id, resource_id=None):
+        """
+        Memperpanjang lease client_id (satu resource, atau semua yang dipegang) sebesar ttl masing-masing.
+        Tanpa resource_id hasilnya selalu sukses; klien membandingkan 'renewed' dengan lock yang ia kira dipegang.
+        """
+        resources = [resource_id] if resource_id is not None else sorted(self._held.get(client_id, ()))
+        renewed = []
+        for res_id in resources:
+            if (res_id, client_id) in self._grants:
+                self._renew_lease((res_id, client_id))
+                renewed.append(res_id)
+        if resource_id is not None and not renewed:
+            # Lease sudah kedaluwarsa (atau tidak pernah ada): klien harus acquire ulang
+            return {"success": False, "renewed": [], "message": "You do not hold this lock"}
+        return {"success": True, "renewed": renewed, "message": f"Renewed {len(renewed)} lease(s)"}
 
+    def _internal_handle_tick(self, now):
+        """
+        Memajukan clock logis dan melepas lease yang deadline-nya sudah lewat. Wheel
+        dimajukan satu tick ke depan untuk mengambil kandidat, lalu setiap kandidat
+        dibandingkan dengan deadline persisnya; hasilnya tidak bergantung pada
+        resolusi wheel atau kapan wheel dibuat, sehingga sama di semua replika.
+        """
+        self._clock = max(self._clock, now)
+        # Lease yang diberikan saat tick belum berjalan mulai dihitung dari tick ini
+        pending, self._pending_leases = sorted(self._pending_leases), set()
+        for key in pending:
+            self._start_lease(key)
+
+        expired = []
+        if self._lease_wheel is not None:
+            for key in sorted(self._lease_wheel.advance(self._clock + self._lease_wheel.tick)):
+                grant = self._grants.get(key)
+                if grant is None or grant['deadline'] is None:
+                    continue
+                if grant['deadline'] > self._clock:
+                    self._schedule_lease(key, grant['deadline'])
+                    continue
+                resource_id, client_id = key
+                self._internal_handle_release(resource_id, client_id)
+                expired.append([resource_id, client_id])
+                logging.info(f"Lease EXPIRED for {client_id} on {resource_id}")
+                audit_logger.info(f"LOCK_LEASE_EXPIRED; client={client_id}; resource={resource_id}; timestamp={datetime.utcnow().isoformat()}Z")
+            if not self._running_leases:
+                self._lease_wheel = None
+        return {"success": True, "expired": expired}
+
+    def needs_tick(self):
+        """Leader perlu mengajukan tick selama ada lease aktif (termasuk yang menunggu tick pertama)."""
+        return bool(self._pending_leases or self._running_leases)
+
+    # --- Lease & Fencing Token ---
+    def _renew_lease(self, key):
+        """
+        Deadline baru = clock + ttl. Leader hanya mengajukan tick selama ada lease yang
+        berjalan, jadi tanpa lease lain yang berjalan clock bisa sudah basi: lease ditunda
+        sampai tick berikutnya.
+        """
+        grant = self._grants[key]
+        running = bool(self._running_leases)  # Tick sedang berjalan: clock masih segar
+        self._stop_lease(key)
+        if not grant['ttl']:
+            return
+        if running:
+            self._start_lease(key)
+        else:
+            self._pending_leases.add(key)
+
+    def _start_lease(self, key):
+        grant = self._grants[key]
+        grant['deadline'] = self._clock + grant['ttl']
+        self._running_leases.add(key)
+        self._schedule_lease(key, grant['deadline'])
+
+    def _stop_lease(self, key):
+        grant = self._grants.get(key)
+        if grant is not None:
+            grant['deadline'] = None
+        self._running_leases.discard(key)
+        self._pending_leases.discard(key)
+        if self._lease_wheel is not None:
+            self._lease_wheel.cancel(key)
+
+    def _schedule_lease(self, key, deadline):
+        if self._lease_wheel is None:
+            # Awal wheel diratakan ke kelipatan tick (kandidat expiry tetap dicek terhadap deadline persis)
+            start = math.floor(self._clock / LOCK_TICK_INTERVAL) * LOCK_TICK_INTERVAL
+            self._lease_wheel = TimingWheel(tick=LOCK_TICK_INTERVAL, slots=LOCK_LEASE_WHEEL_SLOTS,
+                                            levels=LOCK_LEASE_WHEEL_LEVELS, start=start)
+        self._lease_wheel.schedule(key, deadline)
+
+    # --- Deadlock Detection (Wait-For Graph inkremental) ---
+    def _detect_deadlock(self, start_client):
+        """
+        Deteksi siklus pada Wait-For Graph yang melewati start_client. Hanya edge
+        dari start_client yang baru ditambahkan, jadi siklus baru pasti melewatinya:
+        cukup cek apakah start_client terjangkau lagi dari tetangganya. DFS hanya
+        menyentuh subgraph yang terjangkau dari start_client, bukan seluruh tabel lock.
+        """
+        visited = set()
+        stack = list(self._wait_for.get(start_client, ()))
         while stack:
-            client = stack[-1] # Lihat node teratas (peek)
-
-            if client not in visited_nodes:
-                visited_nodes.add(client)
-                visiting.add(client)
-            
-            # Cari tetangga (node yang ditunggu oleh 'client') yang belum dikunjungi
-            pushed_neighbor = False
-            if client in dependency_graph:
-                for neighbor in dependency_graph[client]:
-                    if neighbor in visiting: # Jika tetangga ada di path saat ini -> SIKLUS!
-                        logging.debug(f"Cycle detected: {neighbor} revisited in path {visiting}")
-                        return True
-                    if neighbor not in visited_nodes:
-                        stack.append(neighbor)
-                        pushed_neighbor = True
-                        break # Telusuri lebih dalam
-
-            # Jika tidak ada tetangga baru atau semua tetangga sudah dikunjungi (dari path ini)
-            if not pushed_neighbor:
-                last_node = stack.pop() # Backtrack
-                visiting.remove(last_node) # Hapus dari path saat ini
-
-        return False # Tidak ada siklus ditemukan
+            client = stack.pop()
+            if client == start_client:
+                logging.debug(f"Cycle detected: {start_client} reachable from its own wait-for edges")
+                return True
+            if client in visited:
+                continue
+            visited.add(client)
+            stack.extend(owner for owner in self._wait_for.get(client, ()) if owner not in visited)
+        return False
+
+    # --- Pemeliharaan Wait-For Graph ---
+    def _add_edges(self, waiter, owners):
+        edges = self._wait_for[waiter]
+        for owner in owners:
+            edges[owner] = edges.get(owner, 0) + 1
+
+    def _remove_edges(self, waiter, owners):
+        edges = self._wait_for.get(waiter)
+        if edges is None:
+            return
+        for owner in owners:
+            count = edges.get(owner, 0) - 1
+            if count > 0:
+                edges[owner] = count
+            else:
+                edges.pop(owner, None)
+        if not edges:
+            del self._wait_for[waiter]
+
+    def _add_waiter(self, resource_id, client_id, lock_type, ttl=0):
+        self._wait_list[resource_id][client_id] = (lock_type, ttl)
+        self._waiting_on[client_id].add(resource_id)
+        self._add_edges(client_id, self._locks[resource_id]['owners'])
+
+    def _remove_waiter(self, resource_id, client_id):
+        waiters = self._wait_list.get(resource_id)
+        if not waiters or client_id not in waiters:
+            return
+        del waiters[client_id]
+        if not waiters:
+            del self._wait_list[resource_id]
+        self._discard_waiting_on(client_id, resource_id)
+        lock_info = self._locks.get(resource_id)
+        if lock_info:
+            self._remove_edges(client_id, lock_info['owners'])
+
+    def _discard_waiting_on(self, client_id, resource_id):
+        resources = self._waiting_on.get(client_id)
+        if resources is not None:
+            resources.discard(resource_id)
+            if not resources:
+                del self._waiting_on[client_id]
+
+    def _add_owner(self, resource_id, client_id, ttl=0):
+        """Menjadikan client_id owner resource_id; mengembalikan fencing token grant ini."""
+        self._locks[resource_id]['owners'].add(client_id)
+        self._held[client_id].add(resource_id)
+        self._fencing_token += 1
+        self._grants[(resource_id, client_id)] = {'token': self._fencing_token, 'ttl': ttl, 'deadline': None}
+        self._renew_lease((resource_id, client_id))
+        for waiter in self._wait_list.get(resource_id, ()):
+            self._add_edges(waiter, (client_id,))
+        self._notify_grant(resource_id, client_id)
+        return self._fencing_token
+
+    def _remove_owner(self, resource_id, client_id):
+        self._locks[resource_id]['owners'].discard(client_id)
+        self._stop_lease((resource_id, client_id))
+        self._grants.pop((resource_id, client_id), None)
+        resources = self._held.get(client_id)
+        if resources is not None:
+            resources.discard(resource_id)
+            if not resources:
+                del self._held[client_id]
+        for waiter in self._wait_list.get(resource_id, ()):
+            self._remove_edges(waiter, (client_id,))
+
+    def _rebuild_indexes(self):
+        """Membangun ulang index client dan graph dari _locks/_wait_list (hanya setelah restore snapshot)."""
+        self._wait_for = defaultdict(dict)
+        self._waiting_on = defaultdict(set)
+        self._held = defaultdict(set)
+        for resource_id, info in self._locks.items():
+            for owner in info['owners']:
+                self._held[owner].add(resource_id)
+        for resource_id, waiters in self._wait_list.items():
+            owners = self._locks.get(resource_id, {}).get('owners', set())
+            for waiter in waiters:
+                self._waiting_on[waiter].add(resource_id)
+                self._add_edges(waiter, owners)
 
     # --- Helpers ---
     def _remove_client_from_all_wait_lists(self, client_id):
-        """Hapus klien dari SEMUA daftar tunggu."""
-        # Iterasi melalui salinan keys karena kita mungkin memodifikasi dict
-        for res_id in list(self._wait_list.keys()):
-            if client_id in self._wait_list[res_id]:
-                self._wait_list[res_id].remove(client_id)
-                # Hapus entri resource dari wait_list jika list-nya menjadi kosong
-                if not self._wait_list[res_id]:
-                    del self._wait_list[res_id]
+        """Hapus klien dari semua daftar tunggu yang ia tempati (lewat index client -> resource)."""
+        for res_id in list(self._waiting_on.get(client_id, ())):
+            self._remove_waiter(res_id, client_id)
+
+    # --- Acquire Blocking (lokal per replika) ---
+    def watch_grant(self, resource_id, client_id):
+        """
+        Future yang selesai saat replika ini menerapkan grant resource_id untuk client_id.
+        Didaftarkan SEBELUM command acquire diajukan agar grant yang cepat tidak terlewat.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._grant_watchers[(resource_id, client_id)].append(future)
+        return future
+
+    def unwatch_grant(self, resource_id, client_id, future):
+        key = (resource_id, client_id)
+        watchers = self._grant_watchers.get(key)
+        if watchers and future in watchers:
+            watchers.remove(future)
+            if not watchers:
+                del self._grant_watchers[key]
+
+    def _notify_grant(self, resource_id, client_id):
+        watchers = self._grant_watchers.pop((resource_id, client_id), None)
+        if not watchers:
+            return
+        token = self._grants[(resource_id, client_id)]['token']
+        for future in watchers:
+            if not future.done():
+                future.set_result({"success": True, "message": "Lock granted", "fencing_token": token})
+
+    # --- Snapshot (untuk log compaction Raft) ---
+    def snapshot_state(self):
+        """Mengembalikan salinan state yang bisa diserialisasi ke JSON."""
+        return {
+            "locks": {
+                res: {"type": info["type"], "owners": sorted(info["owners"])}
+                for res, info in self._locks.items()
+            },
+            "wait_list": {r: [[c, t, ttl] for c, (t, ttl) in w.items()] for r, w in self._wait_list.items() if w},
+            "grants": [[r, c, g['token'], g['ttl'], g['deadline']] for (r, c), g in sorted(self._grants.items())],
+            "fencing_token": self._fencing_token,
+            "clock": self._clock,
+        }
+
+    def restore_state(self, state):
+        """Mengganti seluruh state dengan isi snapshot (InstallSnapshot / restart)."""
+        self._locks = {
+            res: {"type": info["type"], "owners": set(info["owners"])}
+            for res, info in state.get("locks", {}).items()
+        }
+        # Snapshot lama menyimpan waiter sebagai client_id saja (exclusive) atau [client_id, tipe] (tanpa lease)
+        self._wait_list = defaultdict(OrderedDict, {
+            r: OrderedDict((w, ('exclusive', 0)) if isinstance(w, str) else (w[0], (w[1], w[2] if len(w) > 2 else 0))
+                           for w in waiters)
+            for r, waiters in state.get("wait_list", {}).items()
+        })
+        self._fencing_token = state.get("fencing_token", 0)
+        self._clock = state.get("clock", 0.0)
+        # Snapshot lama tanpa 'grants': owner dianggap memegang lock tanpa lease dengan token 0
+        grants = state.get("grants") or [[r, c, 0, 0, None] for r, info in self._locks.items() for c in info["owners"]]
+        self._grants = {(r, c): {'token': token, 'ttl': ttl, 'deadline': deadline}
+                        for r, c, token, ttl, deadline in grants}
+        self._lease_wheel = None
+        self._pending_leases = {key for key, grant in self._grants.items() if grant['ttl'] and grant['deadline'] is None}
+        self._running_leases = {key for key, grant in self._grants.items() if grant['deadline'] is not None}
+        for key in sorted(self._running_leases):
+            self._schedule_lease(key, self._grants[key]['deadline'])  # Deadline persis dari snapshot, bukan dihitung ulang
+        self._rebuild_indexes()
+        # Grant yang datang lewat InstallSnapshot juga membangunkan request yang menunggu
+        for resource_id, client_id in list(self._grant_watchers):
+            if (resource_id, client_id) in self._grants:
+                self._notify_grant(resource_id, client_id)
+        logging.info(f"LockManager state restored from snapshot ({len(self._locks)} locks)")
+
+    # --- Query per resource (dipanggil lewat RaftNode.linearizable_read) ---
+    def get_lock_info(self, resource_id):
+        """Siapa yang memegang resource_id dan siapa yang menunggu. Sinkron: tidak ada await di antara pembacaan."""
+        lock_info = self._locks.get(resource_id)
+        return {
+            "resource_id": resource_id,
+            "locked": lock_info is not None,
+            "type": lock_info["type"] if lock_info else None,
+            "owners": sorted(lock_info["owners"]) if lock_info else [],
+            "waiters": list(self._wait_list.get(resource_id, [])),
+            "fencing_tokens": {c: self._grants[(resource_id, c)]['token'] for c in sorted(lock_info["owners"])} if lock_info else {},
+            # Sisa lease menurut clock logis (None = tanpa lease)
+            "lease_remaining": {
+                c: (None if self._grants[(resource_id, c)]['deadline'] is None
+                    else max(self._grants[(resource_id, c)]['deadline'] - self._clock, 0))
+                for c in sorted(lock_info["owners"])
+            } if lock_info else {},
+        }
 
     # --- Get Status (Sinkron untuk kompatibilitas Flask) ---
     def get_locks_status(self):
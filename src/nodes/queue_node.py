@@ -5,6 +5,7 @@ import asyncio
 import time
 import redis.asyncio as aioredis
 from ..communication.message_passing import send_rpc
+from ..communication.failure_detector import detector
 
 # Konstanta Timeout (dalam detik)
 PROCESSING_TIMEOUT = 30  # Anggap gagal jika pesan diproses > 30 detik
@@ -23,8 +24,15 @@ class QueueNode:
         self.redis = redis_client
         self._monitor_task = None
 
+        # Monitor dimulai oleh server (start_processing_monitor) setelah event loop berjalan
         logging.info(f"[{self.node_id}] QueueNode initialized.")
-        self.start_processing_monitor()
+
+    async def _forward(self, target_node_id, peer_url, endpoint, payload):
+        """Meneruskan request ke node pemilik topik; gagal cepat jika node itu dicurigai mati."""
+        if not detector.allow_request(peer_url):
+            logging.warning(f"[{self.node_id}] Not forwarding {endpoint}: peer {target_node_id} is suspected down")
+            return {"success": False, "message": f"Peer {target_node_id} is suspected down"}
+        return await send_rpc(peer_url, endpoint, payload)
 
     # --------------------------------------------------------------------------
     # PUSH MESSAGE
@@ -50,7 +58,7 @@ class QueueNode:
 
         logging.info(f"[{self.node_id}] Forwarding message for topic {topic} to {target_node_id}")
         payload = {"topic": topic, "message": message}
-        return await send_rpc(peer_url, "queue/internal/push", payload)
+        return await self._forward(target_node_id, peer_url, "queue/internal/push", payload)
 
     # --------------------------------------------------------------------------
     # POP MESSAGE
@@ -65,7 +73,7 @@ class QueueNode:
                 return {"success": False, "message": f"Peer {target_node_id} not found"}
 
             logging.info(f"[{self.node_id}] Forwarding pop request for {topic} to {target_node_id}")
-            return await send_rpc(peer_url, f"queue/internal/pop/{topic}/{consumer_id}", {})
+            return await self._forward(target_node_id, peer_url, f"queue/internal/pop/{topic}/{consumer_id}", {})
 
         # Node ini bertanggung jawab
         main_queue_key = f"queue:{topic}"
@@ -106,7 +114,7 @@ class QueueNode:
                 return {"success": False, "message": "Peer not found"}
 
             payload = {"consumer_id": consumer_id, "message_id": message_id}
-            return await send_rpc(peer_url, f"queue/internal/ack/{topic}", payload)
+            return await self._forward(target_node_id, peer_url, f"queue/internal/ack/{topic}", payload)
 
         processing_list_key = f"processing:{topic}:{consumer_id}"
         timestamp_hash_key = f"timestamps:{topic}:{consumer_id}"
@@ -141,6 +149,12 @@ class QueueNode:
         else:
             logging.warning(f"[{self.node_id}] Monitor task already running.")
 
+    def stop_processing_monitor(self):
+        """Menghentikan task monitor (dipanggil saat server shutdown)."""
+        if self._monitor_task is not None:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+
     async def _monitor_timeouts(self):
         """Secara periodik memeriksa pesan yang timeout di list processing."""
         while True:
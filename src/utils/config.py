@@ -21,11 +21,148 @@ PEERS = {
     "node3": "http://node3:5003",
 }
 
+# Node di luar daftar ini hanya melayani cache/queue dan tidak menjalankan Raft
+RAFT_VOTER = NODE_ID in PEERS
+
 # Hapus node saat ini dari daftar peer
 if NODE_ID in PEERS:
     del PEERS[NODE_ID]
+# PEERS di atas adalah anggota voting Raft. Node cache/queue ditemukan lewat gossip
+# (SWIM) mulai dari SEED_NODES, format "node_id=http://hostname:port,..."
+NODE_URL = os.getenv("NODE_URL", f"http://{NODE_ID}:{FLASK_PORT}")  # Alamat yang diumumkan ke member lain
+SEED_NODES = dict(
+    item.strip().split("=", 1) for item in os.getenv("SEED_NODES", "").split(",") if item.strip()
+) or dict(PEERS)
+# Alamat lock API yang bisa dijangkau klien, dipakai sebagai tujuan redirect 307
+# (LOCK_FORWARD_MODE=redirect). Format sama dengan SEED_NODES; node yang tidak
+# disebut memakai URL internal di PEERS (hanya bisa di-resolve di jaringan cluster).
+CLIENT_URLS = {**PEERS, **dict(
+    item.strip().split("=", 1) for item in os.getenv("CLIENT_URLS", "").split(",") if item.strip()
+)}
 
 # Pengaturan Raft
-ELECTION_TIMEOUT_MIN = 1.5  # Detik
-ELECTION_TIMEOUT_MAX = 3.0   # Detik
-HEARTBEAT_INTERVAL = 0.5   # Detik
\ No newline at end of file
+ELECTION_TIMEOUT_MIN = float(os.getenv("ELECTION_TIMEOUT_MIN", 0.3))  # Detik
+ELECTION_TIMEOUT_MAX = float(os.getenv("ELECTION_TIMEOUT_MAX", 0.6))  # Detik
+HEARTBEAT_INTERVAL = float(os.getenv("HEARTBEAT_INTERVAL", 0.075))  # Detik, jauh di bawah ELECTION_TIMEOUT_MIN
+
+# Pipeline proposal leader: command yang datang dalam satu jendela digabung
+# menjadi satu AppendEntries, dan beberapa batch boleh berjalan per follower.
+PROPOSAL_BATCH_WINDOW = float(os.getenv("PROPOSAL_BATCH_WINDOW", 0.002))  # Detik
+MAX_PROPOSAL_BATCH = int(os.getenv("MAX_PROPOSAL_BATCH", 256))  # Command per batch
+MAX_INFLIGHT_APPENDS = int(os.getenv("MAX_INFLIGHT_APPENDS", 4))  # Batch in-flight per follower
+REPLICATION_CHUNK_SIZE = int(os.getenv("REPLICATION_CHUNK_SIZE", 512))  # Entri per AppendEntries saat catch-up
+
+# Multi-Raft: jumlah grup Raft independen untuk namespace lock (1 = satu grup seperti semula)
+RAFT_GROUPS = int(os.getenv("RAFT_GROUPS", 1))
+HEARTBEAT_COALESCE_WINDOW = float(os.getenv("HEARTBEAT_COALESCE_WINDOW", 0.01))  # Detik, heartbeat antar grup digabung per peer
+
+# Command lock yang masuk ke follower: "proxy" (diteruskan ke leader), "redirect" (HTTP 307), atau "off"
+LOCK_FORWARD_MODE = os.getenv("LOCK_FORWARD_MODE", "proxy").lower()
+# Lease lock: acquire tanpa 'ttl' memakai LOCK_DEFAULT_TTL (0 = lock dipegang sampai release)
+LOCK_DEFAULT_TTL = float(os.getenv("LOCK_DEFAULT_TTL", 30.0))  # Detik
+# Leader mengajukan command 'tick' lewat Raft setiap interval ini selama ada lease aktif
+LOCK_TICK_INTERVAL = float(os.getenv("LOCK_TICK_INTERVAL", 1.0))  # Detik (juga resolusi timing wheel lease)
+LOCK_LEASE_WHEEL_SLOTS = int(os.getenv("LOCK_LEASE_WHEEL_SLOTS", 64))
+LOCK_LEASE_WHEEL_LEVELS = int(os.getenv("LOCK_LEASE_WHEEL_LEVELS", 4))
+# Batas atas 'wait' pada acquire blocking (request yang meminta lebih lama dipotong ke nilai ini)
+LOCK_MAX_WAIT = float(os.getenv("LOCK_MAX_WAIT", 30.0))  # Detik
+FORWARD_TIMEOUT = float(os.getenv("FORWARD_TIMEOUT", 3.0))  # Detik, mencakup waktu commit di leader
+
+# Linearizable read: lease leader (tanpa RPC) dengan fallback ReadIndex (satu putaran heartbeat)
+LEASE_READS = os.getenv("LEASE_READS", "true").lower() == "true"
+LEASE_DURATION_RATIO = float(os.getenv("LEASE_DURATION_RATIO", 0.8))  # Fraksi ELECTION_TIMEOUT_MIN (margin clock drift)
+READ_INDEX_TIMEOUT = float(os.getenv("READ_INDEX_TIMEOUT", 1.0))  # Detik
+
+# Penyimpanan durable Raft (write-ahead log + hard state)
+RAFT_DATA_DIR = os.getenv("RAFT_DATA_DIR", os.path.join("data", NODE_ID, "raft"))
+WAL_SEGMENT_SIZE = int(os.getenv("WAL_SEGMENT_SIZE", 4 * 1024 * 1024))  # Byte per segmen
+
+# Snapshot & log compaction
+SNAPSHOT_THRESHOLD = int(os.getenv("SNAPSHOT_THRESHOLD", 10000))  # Entri diterapkan sebelum snapshot baru
+SNAPSHOT_CHUNK_SIZE = int(os.getenv("SNAPSHOT_CHUNK_SIZE", 256 * 1024))  # Byte per chunk InstallSnapshot
+
+# Membership gossip (SWIM): satu ping per periode per node, probe tidak langsung saat gagal
+SWIM_PROBE_INTERVAL = float(os.getenv("SWIM_PROBE_INTERVAL", 0.5))  # Detik per periode protokol
+SWIM_PING_TIMEOUT = float(os.getenv("SWIM_PING_TIMEOUT", 0.2))  # Detik menunggu ack ping langsung
+SWIM_INDIRECT_PROBES = int(os.getenv("SWIM_INDIRECT_PROBES", 3))  # Member yang diminta ping_req
+SWIM_SUSPECT_TIMEOUT = float(os.getenv("SWIM_SUSPECT_TIMEOUT", 3.0))  # Detik suspect sebelum dead
+SWIM_RETRANSMIT_MULT = int(os.getenv("SWIM_RETRANSMIT_MULT", 3))  # Update disebar mult * log2(n) kali
+SWIM_MAX_PIGGYBACK = int(os.getenv("SWIM_MAX_PIGGYBACK", 8))  # Update maksimum per pesan
+
+# Koneksi RPC antar node: satu pool keep-alive per peer selama umur node
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", 32))  # Koneksi maksimum per peer
+RPC_KEEPALIVE_TIMEOUT = float(os.getenv("RPC_KEEPALIVE_TIMEOUT", 60.0))  # Detik koneksi idle dipertahankan
+RPC_TIMEOUT = float(os.getenv("RPC_TIMEOUT", 1.0))  # Detik, default untuk endpoint yang tidak diatur di bawah
+RPC_ENDPOINT_TIMEOUTS = {
+    "request_vote": ELECTION_TIMEOUT_MIN,
+    "pre_vote": ELECTION_TIMEOUT_MIN,
+    "append_entries": 0.5,
+    "append_entries_batch": 0.5,
+    "read_index": READ_INDEX_TIMEOUT,
+    "install_snapshot": 5.0,
+    "client_request": FORWARD_TIMEOUT,
+    "cache/invalidate": 0.5,
+    "cache/invalidate_batch": 0.5,
+    "cache/owner_get": 0.5,
+    "cache/owner_set": 1.0,
+    "cache/journal": 1.0,
+    "swim/ping": SWIM_PING_TIMEOUT,
+    "swim/ping_req": 2 * SWIM_PING_TIMEOUT + 0.1,
+}
+# Override lewat env, contoh: RPC_ENDPOINT_TIMEOUTS="install_snapshot=10,append_entries=0.3"
+for _item in filter(None, os.getenv("RPC_ENDPOINT_TIMEOUTS", "").split(",")):
+    _endpoint, _timeout = _item.split("=")
+    RPC_ENDPOINT_TIMEOUTS[_endpoint.strip()] = float(_timeout)
+
+# Transport RPC antar node: "http" (JSON over HTTP) atau "binary" (msgpack over TCP multiplexed).
+# Semua node dalam cluster harus memakai transport yang sama.
+RPC_TRANSPORT = os.getenv("RPC_TRANSPORT", "http").lower()
+RPC_BINARY_PORT_OFFSET = int(os.getenv("RPC_BINARY_PORT_OFFSET", 1000))  # Port biner = port HTTP + offset
+
+# Cache: batas waktu menunggu ack invalidasi sebelum set kembali ke klien
+CACHE_INVALIDATION_TIMEOUT = float(os.getenv("CACHE_INVALIDATION_TIMEOUT", 0.2))  # Detik
+# Outbox invalidasi: key per peer digabung selama window atau sampai batch size, lalu satu RPC
+CACHE_INVALIDATION_WINDOW = float(os.getenv("CACHE_INVALIDATION_WINDOW", 0.002))  # Detik
+CACHE_INVALIDATION_BATCH_SIZE = int(os.getenv("CACHE_INVALIDATION_BATCH_SIZE", 256))  # Key per batch
+# sync: /cache/set menunggu ack invalidasi; async: ack ke penulis segera, invalidasi menyusul
+CACHE_CONSISTENCY = os.getenv("CACHE_CONSISTENCY", "sync").lower()
+# Kapasitas cache dalam byte (key + value JSON + overhead per entri), dibagi rata per shard
+CACHE_CAPACITY_BYTES = int(os.getenv("CACHE_CAPACITY_BYTES", 64 * 1024 * 1024))
+# W-TinyLFU: window LRU kecil + main SLRU; admission ke main memakai count-min sketch
+CACHE_WINDOW_RATIO = float(os.getenv("CACHE_WINDOW_RATIO", 0.01))  # Porsi kapasitas untuk window
+CACHE_PROTECTED_RATIO = float(os.getenv("CACHE_PROTECTED_RATIO", 0.8))  # Porsi main untuk segmen protected
+CACHE_SKETCH_WIDTH = int(os.getenv("CACHE_SKETCH_WIDTH", 16384))  # Counter per baris sketch
+# Cache tersegmentasi: shard independen; hit dicatat di read buffer lalu diterapkan per batch
+CACHE_SHARDS = int(os.getenv("CACHE_SHARDS", 16))
+CACHE_READ_BUFFER_SIZE = int(os.getenv("CACHE_READ_BUFFER_SIZE", 64))  # Hit per shard sebelum urutan LRU diperbarui
+# TTL per key: hierarchical timing wheel (tick x slots^levels = horizon sebelum timer didaur ulang)
+CACHE_DEFAULT_TTL = float(os.getenv("CACHE_DEFAULT_TTL", 0))  # Detik; 0 = tanpa TTL
+CACHE_TTL_TICK = float(os.getenv("CACHE_TTL_TICK", 0.1))  # Detik per tick (resolusi expiry background)
+CACHE_TTL_WHEEL_SLOTS = int(os.getenv("CACHE_TTL_WHEEL_SLOTS", 64))
+CACHE_TTL_WHEEL_LEVELS = int(os.getenv("CACHE_TTL_WHEEL_LEVELS", 4))
+# replicated: setiap node menyimpan salinan; partitioned: satu owner per key (consistent hashing),
+# node lain meneruskan get/set ke owner sehingga kapasitas total = jumlah kapasitas node
+CACHE_MODE = os.getenv("CACHE_MODE", "replicated").lower()
+CACHE_RING_REPLICAS = int(os.getenv("CACHE_RING_REPLICAS", 64))  # Virtual node per node di ring cache
+# Near-cache (mode partitioned): salinan kecil di non-owner, valid selama lease dari owner
+CACHE_NEAR_CACHE_BYTES = int(os.getenv("CACHE_NEAR_CACHE_BYTES", 1024 * 1024))  # 0 = nonaktif
+CACHE_NEAR_CACHE_LEASE = float(os.getenv("CACHE_NEAR_CACHE_LEASE", 1.0))  # Detik
+# Read-through: '' = nonaktif, 'http(s)://backend' (GET backend/<key>) atau 'paket.modul:fungsi'
+CACHE_LOADER = os.getenv("CACHE_LOADER", "")
+CACHE_LOADER_TIMEOUT = float(os.getenv("CACHE_LOADER_TIMEOUT", 1.0))  # Detik per load HTTP
+# Refresh-ahead: hit setelah porsi TTL ini berlalu memuat ulang key di background (0 = nonaktif)
+CACHE_REFRESH_AHEAD = float(os.getenv("CACHE_REFRESH_AHEAD", 0))
+# Warm restart: snapshot cache berkala ke file (di-mmap saat start); '' = nonaktif
+CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "")
+CACHE_SNAPSHOT_INTERVAL = float(os.getenv("CACHE_SNAPSHOT_INTERVAL", 30.0))  # Detik
+# Toleransi beda jam antar node saat meminta jurnal write peer sejak waktu snapshot
+CACHE_SNAPSHOT_CLOCK_SKEW = float(os.getenv("CACHE_SNAPSHOT_CLOCK_SKEW", 1.0))  # Detik
+CACHE_JOURNAL_SIZE = int(os.getenv("CACHE_JOURNAL_SIZE", 100000))  # Write terakhir yang diingat untuk peer
+
+# Phi-accrual failure detector (bukti hidup dari respons RPC dan heartbeat Raft, tanpa ping terpisah)
+PHI_THRESHOLD = float(os.getenv("PHI_THRESHOLD", 8.0))  # Peer suspected jika phi melewati nilai ini
+PHI_WINDOW_SIZE = int(os.getenv("PHI_WINDOW_SIZE", 100))  # Jumlah interval antar-bukti yang disimpan per peer
+PHI_MIN_STD = float(os.getenv("PHI_MIN_STD", 0.05))  # Detik, batas bawah standar deviasi interval
+PHI_ACCEPTABLE_PAUSE = float(os.getenv("PHI_ACCEPTABLE_PAUSE", 0.2))  # Detik jeda (GC, jitter) yang ditoleransi
+PHI_FIRST_HEARTBEAT_ESTIMATE = float(os.getenv("PHI_FIRST_HEARTBEAT_ESTIMATE", 0.5))  # Detik, sebelum ada statistik
+PHI_PROBE_INTERVAL = float(os.getenv("PHI_PROBE_INTERVAL", 1.0))  # Detik antar request probe ke peer suspected
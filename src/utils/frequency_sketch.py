@@ -0,0 +1,47 @@
+# src/utils/frequency_sketch.py
+
+import mmh3
+
+# Tabel translate untuk membagi dua semua counter sekaligus (aging)
+_HALVE = bytes(value >> 1 for value in range(256))
+
+
+class CountMinSketch:
+    """
+    Estimator frekuensi akses berukuran tetap (count-min sketch) untuk TinyLFU.
+    Setiap key menaikkan satu counter per baris; estimasi = counter terkecil.
+    Counter dibatasi max_count dan semua counter dibagi dua setiap sample_size
+    penambahan, sehingga frekuensi lama memudar dan key yang dulu populer tidak
+    menempati cache selamanya.
+    """
+
+    def __init__(self, width=16384, depth=4, max_count=15, sample_size=None):
+        self.width = 1 << max(width - 1, 1).bit_length()  # Dibulatkan ke pangkat dua
+        self.depth = depth
+        self.max_count = max_count
+        self.sample_size = sample_size or 10 * self.width
+        self.additions = 0
+        self._rows = [bytearray(self.width) for _ in range(depth)]
+
+    def _indexes(self, key):
+        # Double hashing: satu hash 128-bit menghasilkan indeks untuk semua baris
+        h1, h2 = mmh3.hash64(str(key), signed=False)
+        mask = self.width - 1
+        return [(h1 + row * h2) & mask for row in range(self.depth)]
+
+    def increment(self, key):
+        for row, index in zip(self._rows, self._indexes(key)):
+            if row[index] < self.max_count:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.reset()
+
+    def estimate(self, key):
+        return min(row[index] for row, index in zip(self._rows, self._indexes(key)))
+
+    def reset(self):
+        """Aging: semua counter dibagi dua."""
+        for row in self._rows:
+            row[:] = row.translate(_HALVE)
+        self.additions //= 2
@@ -39,4 +39,10 @@ def get_metrics():
     else:
          report["cache_hit_rate_percent"] = 0
 
+    # W-TinyLFU: persentase kandidat dari window yang diterima ke main cache
+    candidates = metrics_data["cache_admission_candidates"]["value"]
+    if candidates > 0:
+         rejected = metrics_data["cache_admission_rejections"]["value"]
+         report["cache_admission_rate_percent"] = round((candidates - rejected) / candidates * 100, 2)
+
     return report
\ No newline at end of file
@@ -0,0 +1,74 @@
+# src/utils/timing_wheel.py
+
+import math
+import time
+
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel (Varghese & Lauck). Level 0 punya 'slots' slot
+    selebar satu tick; setiap level berikutnya 'slots' kali lebih lebar. Timer
+    dimasukkan ke level terendah yang mencakup jarak ke deadline-nya dan turun
+    level (cascade) saat wheel di bawahnya berputar penuh, sehingga schedule,
+    cancel, dan expiry per timer amortized O(1) tanpa memindai semua timer.
+    Timer diidentifikasi dengan key; schedule ulang key yang sama menggantikan
+    deadline lamanya.
+    """
+
+    def __init__(self, tick=0.1, slots=64, levels=4, start=None):
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._start = time.monotonic() if start is None else start
+        self._current = 0  # Tick terakhir yang sudah diproses
+        self._wheels = [[set() for _ in range(slots)] for _ in range(levels)]
+        self._timers = {}  # key -> (target tick, level, slot)
+
+    def __len__(self):
+        return len(self._timers)
+
+    def __contains__(self, key):
+        return key in self._timers
+
+    def schedule(self, key, deadline):
+        """Menjadwalkan key kedaluwarsa pada 'deadline' (detik, time.monotonic)."""
+        self.cancel(key)
+        target = max(math.ceil((deadline - self._start) / self.tick), self._current + 1)
+        self._place(key, target)
+
+    def cancel(self, key):
+        entry = self._timers.pop(key, None)
+        if entry is not None:
+            _, level, slot = entry
+            self._wheels[level][slot].discard(key)
+
+    def advance(self, now=None):
+        """Memajukan wheel sampai 'now' dan mengembalikan key yang kedaluwarsa."""
+        now = time.monotonic() if now is None else now
+        target = math.floor((now - self._start) / self.tick)
+        expired = []
+        while self._current < target:
+            self._current += 1
+            # Cascade dari level tertinggi agar timer bisa turun beberapa level sekaligus
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if self._current % span == 0:
+                    slot = (self._current // span) % self.slots
+                    bucket, self._wheels[level][slot] = self._wheels[level][slot], set()
+                    for key in bucket:
+                        self._place(key, self._timers.pop(key)[0])
+            slot = self._current % self.slots
+            bucket, self._wheels[0][slot] = self._wheels[0][slot], set()
+            for key in bucket:
+                del self._timers[key]
+                expired.append(key)
+        return expired
+
+    def _place(self, key, target):
+        delta = target - self._current
+        level = 0
+        while level < self.levels - 1 and delta >= self.slots ** (level + 1):
+            level += 1
+        slot = (target // self.slots ** level) % self.slots
+        self._wheels[level][slot].add(key)
+        self._timers[key] = (target, level, slot)
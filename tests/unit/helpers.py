@@ -0,0 +1,62 @@
+# tests/unit/helpers.py
+#
+# Helper bersama untuk tes cluster in-process (Raft, Multi-Raft, SWIM): send_rpc
+# diganti dengan pemanggilan langsung handler node tujuan.
+# Dipakai lewat: from tests.unit.helpers import wait_for, install_fake_rpc, ...
+
+import asyncio
+
+
+def cluster_urls(size):
+    """node_id -> url untuk cluster in-process n0..n{size-1}."""
+    return {f"n{i}": f"http://n{i}" for i in range(size)}
+
+
+def peers_of(urls, node_id):
+    """Semua node lain di cluster, dilihat dari node_id."""
+    return {pid: url for pid, url in urls.items() if pid != node_id}
+
+
+def install_fake_rpc(monkeypatch, modules, by_url, dispatch, calls=None):
+    """
+    Mengganti send_rpc di setiap modul pada 'modules' dengan dispatch(node, endpoint, data)
+    ke node tujuan (by_url: url -> node). Setiap call dicatat di 'calls' jika diberikan.
+    """
+    async def fake_send_rpc(peer_url, endpoint, data):
+        if calls is not None:
+            calls.append((peer_url, endpoint, data))
+        return await dispatch(by_url[peer_url], endpoint, data)
+
+    for module in modules:
+        monkeypatch.setattr(module, "send_rpc", fake_send_rpc)
+    return fake_send_rpc
+
+
+async def dispatch_raft_rpc(node, endpoint, data):
+    """Meneruskan RPC Raft ke handler RaftNode (atau satu grup MultiRaft) tujuan."""
+    if endpoint == "append_entries":
+        return await node.handle_append_entries(
+            data["term"], data["leader_id"], data.get("prev_log_index", -1),
+            data.get("prev_log_term", 0), data["entries"], data["leader_commit"],
+        )
+    if endpoint == "install_snapshot":
+        return await node.handle_install_snapshot(
+            data["term"], data["leader_id"], data["last_included_index"], data["last_included_term"],
+            data["offset"], data["data"], data["done"],
+        )
+    if endpoint in ("request_vote", "pre_vote"):
+        handler = node.handle_request_vote if endpoint == "request_vote" else node.handle_pre_vote
+        return await handler(data["term"], data["candidate_id"], data["last_log_index"], data["last_log_term"])
+    if endpoint == "read_index":
+        return await node.handle_read_index()
+    if endpoint == "client_request":
+        return await node.handle_client_request(data["command"], forwarded=True)
+    return None
+
+
+async def wait_for(predicate, timeout=3.0):
+    """Menunggu sampai predicate() bernilai True; gagal jika timeout habis."""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timeout waiting for condition"
+        await asyncio.sleep(0.01)
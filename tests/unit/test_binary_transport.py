@@ -0,0 +1,61 @@
+# tests/unit/test_binary_transport.py
+
+import asyncio
+import pytest
+from src.communication import binary_transport
+from src.communication.binary_transport import BinaryRpcServer, register_handler, call, close_connections
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _start_server(monkeypatch):
+    monkeypatch.setattr(binary_transport, "RPC_BINARY_PORT_OFFSET", 0)
+    monkeypatch.setattr(binary_transport, "_handlers", {})
+    server = BinaryRpcServer("127.0.0.1", 0)
+    await server.start()
+    port = server._server.sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def test_concurrent_calls_are_multiplexed(monkeypatch):
+    """RPC yang berjalan bersamaan di satu koneksi menerima responsnya masing-masing."""
+    server, url = await _start_server(monkeypatch)
+
+    async def slow_echo(data):
+        await asyncio.sleep(data["delay"])
+        return {"i": data["i"], "entries": data["entries"]}
+    register_handler("append_entries", slow_echo)
+
+    try:
+        # Request pertama selesai paling akhir: respons tiba tidak berurutan
+        results = await asyncio.gather(*(
+            call(url, "append_entries", {"i": i, "delay": 0.05 - i * 0.01, "entries": [{"term": i}]}, 1.0)
+            for i in range(5)
+        ))
+        assert [r["i"] for r in results] == list(range(5))
+        assert results[3]["entries"] == [{"term": 3}]
+        assert len(binary_transport._connections[asyncio.get_running_loop()]) == 1
+    finally:
+        await close_connections()
+        await server.close()
+
+
+async def test_unknown_endpoint_and_timeout_return_none(monkeypatch):
+    server, url = await _start_server(monkeypatch)
+
+    async def hang(data):
+        await asyncio.sleep(1)
+    register_handler("request_vote", hang)
+
+    try:
+        assert await call(url, "nope", {}, 1.0) is None
+        assert await call(url, "request_vote", {}, 0.05) is None
+    finally:
+        await close_connections()
+        await server.close()
+
+
+async def test_unreachable_peer_returns_none(monkeypatch):
+    server, url = await _start_server(monkeypatch)
+    await server.close()
+    assert await call(url, "append_entries", {}, 0.5) is None
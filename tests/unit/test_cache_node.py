@@ -0,0 +1,212 @@
+# tests/unit/test_cache_node.py
+
+import asyncio
+import pytest
+from src.nodes import cache_node as cache_module
+from src.nodes.cache_node import CacheNode
+from src.utils.consistent_hash import ConsistentHashRing
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_cache_cluster(monkeypatch, size=3, consistency="sync", rpc_delay=0.0):
+    """Cluster cache in-process; RPC invalidasi diarahkan ke CacheNode tujuan."""
+    urls = {f"c{i}": f"http://c{i}" for i in range(size)}
+    nodes = {
+        node_id: CacheNode(node_id, {pid: url for pid, url in urls.items() if pid != node_id},
+                           capacity_bytes=1_000_000, consistency=consistency)
+        for node_id in urls
+    }
+    calls = []
+
+    async def fake_send_rpc(peer_url, endpoint, data):
+        calls.append((peer_url, endpoint, data))
+        await asyncio.sleep(rpc_delay)
+        by_url = {urls[node_id]: node for node_id, node in nodes.items()}
+        if endpoint == "cache/invalidate_batch":
+            return await by_url[peer_url].handle_invalidation_batch(data["keys"])
+        if endpoint == "cache/owner_get":
+            return await by_url[peer_url].handle_owner_get(data["key"], data["from"], data["lease"])
+        if endpoint == "cache/owner_set":
+            return await by_url[peer_url].handle_owner_set(data["key"], data["value"], data["ttl"])
+        return None
+
+    monkeypatch.setattr(cache_module, "send_rpc", fake_send_rpc)
+    return nodes, calls
+
+
+def make_partitioned_cluster(monkeypatch, size=3, capacity_bytes=1_000_000, near_cache_bytes=64 * 1024):
+    nodes, calls = make_cache_cluster(monkeypatch, size)
+    ring = ConsistentHashRing(nodes=list(nodes), replicas=64)
+    for node_id, node in nodes.items():
+        nodes[node_id] = CacheNode(node_id, node.peers, capacity_bytes=capacity_bytes, num_shards=1,
+                                   mode="partitioned", ring=ring, near_cache_bytes=near_cache_bytes)
+    return nodes, calls
+
+
+async def test_write_burst_is_coalesced_into_batches(monkeypatch):
+    nodes, calls = make_cache_cluster(monkeypatch)
+    for node_id in ("c1", "c2"):
+        for i in range(50):
+            await nodes[node_id].store_local(f"k{i}", "stale")
+
+    results = await asyncio.gather(*(nodes["c0"].set(f"k{i % 25}", i) for i in range(100)))
+    assert all(r["success"] for r in results)
+    # 100 write x 2 peer tanpa batching = 200 RPC; dengan outbox hanya satu batch per peer
+    assert len(calls) == 2
+    assert all(len(data["keys"]) == 25 for _, _, data in calls)
+    assert all(nodes["c1"].peek(f"k{i}") is None for i in range(25))
+    assert nodes["c2"].peek("k30") == "stale"
+
+
+async def test_batch_size_triggers_early_flush(monkeypatch):
+    nodes, calls = make_cache_cluster(monkeypatch, size=2)
+    nodes["c0"].outbox.batch_size = 10
+    await asyncio.gather(*(nodes["c0"].set(f"k{i}", i) for i in range(30)))
+    assert [len(data["keys"]) for _, _, data in calls] == [10, 10, 10]
+
+
+async def test_async_mode_acknowledges_writer_before_peers(monkeypatch):
+    nodes, calls = make_cache_cluster(monkeypatch, consistency="async", rpc_delay=0.1)
+    await nodes["c1"].store_local("k", "stale")
+    started = asyncio.get_running_loop().time()
+    await nodes["c0"].set("k", "fresh")
+    assert asyncio.get_running_loop().time() - started < 0.05
+    assert nodes["c1"].peek("k") == "stale"
+    await asyncio.sleep(0.2)
+    assert nodes["c1"].peek("k") is None
+
+
+async def test_capacity_is_bounded_in_bytes():
+    node = CacheNode("c0", {}, capacity_bytes=8 * 1024, num_shards=2)
+    for i in range(200):
+        await node.store_local(f"k{i}", "x" * 100)
+    assert all(shard.bytes_used <= shard.capacity_bytes for shard in node.shards)
+    assert sum(shard.bytes_used for shard in node.shards) == sum(
+        sum(shard.sizes.values()) for shard in node.shards)
+    # Value yang lebih besar dari satu shard tidak di-cache
+    assert not await node.store_local("huge", "x" * 5000)
+    assert node.peek("huge") is None
+
+
+async def test_scan_of_cold_keys_does_not_flush_hot_set():
+    """W-TinyLFU: key dingin dari scan tidak diterima jika lebih jarang dari korban."""
+    node = CacheNode("c0", {}, capacity_bytes=64 * 1024, num_shards=1)
+    hot = [f"hot{i}" for i in range(50)]
+    for _ in range(5):
+        for key in hot:
+            if await node.get(key) is None:
+                await node.store_local(key, "v" * 200)
+    for i in range(2000):
+        await node.store_local(f"scan{i}", "v" * 200)
+    survivors = sum(1 for key in hot if node.peek(key) is not None)
+    assert survivors >= 45
+
+
+async def test_get_does_not_wait_for_writes_in_other_shards():
+    node = CacheNode("c0", {}, capacity_bytes=64 * 1024, num_shards=4)
+    await node.store_local("hot", 1)
+    busy = next(shard for shard in node.shards if shard is not node._shard("hot"))
+    async with busy.lock:
+        # Shard lain sedang ditulis; hit pada key panas tetap langsung dilayani
+        assert await asyncio.wait_for(node.get("hot"), 0.01) == 1
+
+
+async def test_ttl_expires_lazily_and_in_background():
+    node = CacheNode("c0", {}, capacity_bytes=64 * 1024, num_shards=4)
+    node.ttl_wheel.tick = 0.01
+    await node.set("short", "v", ttl=0.05)
+    await node.set("other", "v", ttl=0.05)
+    await node.set("forever", "v")
+
+    await asyncio.sleep(0.1)
+    # Pemeriksaan lazy di get, tanpa menunggu wheel
+    assert await node.get("short") is None
+    node.expire_due()
+    assert node._shard("other").entries.get("other") is None
+    assert await node.get("forever") == "v"
+    assert len(node.ttl_wheel) == 0
+
+
+async def test_set_without_ttl_clears_previous_ttl():
+    node = CacheNode("c0", {}, capacity_bytes=64 * 1024)
+    await node.set("k", "v1", ttl=0.05)
+    await node.set("k", "v2")
+    assert "k" not in node.ttl_wheel
+    await asyncio.sleep(0.1)
+    assert await node.get("k") == "v2"
+
+
+async def test_partitioned_mode_stores_each_key_once_on_its_owner(monkeypatch):
+    nodes, _ = make_partitioned_cluster(monkeypatch, capacity_bytes=40 * 1024, near_cache_bytes=0)
+    for i in range(300):
+        result = await nodes[f"c{i % 3}"].set(f"k{i}", "x" * 200)
+        assert result["success"]
+    owned = {node_id: set(node.shards[0].entries) for node_id, node in nodes.items()}
+    assert sum(len(keys) for keys in owned.values()) == len(set().union(*owned.values()))
+    for node_id, keys in owned.items():
+        assert all(nodes[node_id].owner_of(key) == node_id for key in keys)
+    # Tiga node x 40 KiB menampung lebih banyak key daripada satu node
+    assert sum(len(keys) for keys in owned.values()) > max(len(keys) for keys in owned.values()) * 2
+    assert await nodes["c1"].get("k0") == "x" * 200
+
+
+async def test_near_cache_lease_is_invalidated_by_owner_write(monkeypatch):
+    nodes, calls = make_partitioned_cluster(monkeypatch)
+    key = next(f"k{i}" for i in range(100) if nodes["c0"].owner_of(f"k{i}") == "c0")
+    await nodes["c0"].set(key, "v1")
+
+    assert await nodes["c1"].get(key) == "v1"
+    forwarded = len([c for c in calls if c[1] == "cache/owner_get"])
+    assert await nodes["c1"].get(key) == "v1"  # Dilayani near-cache
+    assert len([c for c in calls if c[1] == "cache/owner_get"]) == forwarded
+
+    await nodes["c2"].set(key, "v2")  # Diteruskan ke owner, owner menginvalidasi c1
+    invalidated = [url for url, endpoint, _ in calls if endpoint == "cache/invalidate_batch"]
+    assert invalidated == ["http://c1"]
+    assert await nodes["c1"].get(key) == "v2"
+
+
+def make_slow_loader(delay=0.05):
+    loads = []
+
+    async def loader(key):
+        loads.append(key)
+        await asyncio.sleep(delay)
+        return f"db:{key}:{len(loads)}"
+
+    return loader, loads
+
+
+async def test_concurrent_misses_share_a_single_load():
+    loader, loads = make_slow_loader()
+    node = CacheNode("c0", {}, capacity_bytes=64 * 1024, loader=loader)
+    values = await asyncio.gather(*(node.get("hot") for _ in range(50)))
+    assert loads == ["hot"]
+    assert set(values) == {"db:hot:1"}
+    assert node.peek("hot") == "db:hot:1"
+    assert not node._loads
+
+
+async def test_write_during_load_is_not_overwritten():
+    loader, _ = make_slow_loader()
+    node = CacheNode("c0", {}, capacity_bytes=64 * 1024, loader=loader)
+    pending = asyncio.create_task(node.get("k"))
+    await asyncio.sleep(0.01)
+    await node.set("k", "fresh")
+    assert await pending == "db:k:1"
+    assert node.peek("k") == "fresh"
+
+
+async def test_refresh_ahead_reloads_hot_key_before_expiry(monkeypatch):
+    monkeypatch.setattr(cache_module, "CACHE_DEFAULT_TTL", 0.2)
+    loader, loads = make_slow_loader(delay=0.01)
+    node = CacheNode("c0", {}, capacity_bytes=64 * 1024, loader=loader, refresh_ahead=0.5)
+    assert await node.get("hot") == "db:hot:1"
+    await asyncio.sleep(0.12)
+    # Hit setelah separuh TTL: pembaca tetap dapat nilai lama, reload berjalan di background
+    assert await node.get("hot") == "db:hot:1"
+    await asyncio.sleep(0.05)
+    assert loads == ["hot", "hot"]
+    await asyncio.sleep(0.1)  # TTL pertama sudah lewat, nilai hasil refresh masih berlaku
+    assert await node.get("hot") == "db:hot:2"
@@ -0,0 +1,70 @@
+# tests/unit/test_cache_snapshot.py
+
+import pytest
+from src.nodes import cache_snapshot as snapshot_module
+from src.nodes.cache_node import CacheNode, MappedValue
+from src.nodes.cache_snapshot import CacheSnapshotter
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_node(tmp_path, peers=None):
+    node = CacheNode("c0", peers or {}, capacity_bytes=64 * 1024, num_shards=2)
+    return node, CacheSnapshotter(node, str(tmp_path / "cache.snap"))
+
+
+async def test_snapshot_restores_entries_lazily_with_lru_order_and_ttl(tmp_path):
+    node, snapshotter = make_node(tmp_path)
+    await snapshotter.restore()
+    for i in range(20):
+        await node.set(f"k{i}", {"n": i}, ttl=60 if i % 2 else None)
+    await snapshotter.snapshot()
+
+    restarted, restarted_snapshotter = make_node(tmp_path)
+    assert await restarted_snapshotter.restore() == 20
+    shard = restarted._shard("k3")
+    assert type(shard.entries["k3"]) is MappedValue  # Belum di-decode sampai dibaca
+    assert await restarted.get("k3") == {"n": 3}
+    assert shard.entries["k3"] == {"n": 3}
+    assert "k3" in restarted.ttl_wheel and "k4" not in restarted.ttl_wheel
+    for before, after in zip(node.shards, restarted.shards):
+        assert list(before.window.order) == list(after.window.order)
+
+
+async def test_keys_written_after_snapshot_are_dropped_after_crash(tmp_path):
+    node, snapshotter = make_node(tmp_path)
+    await snapshotter.restore()
+    await node.set("changed", "old")
+    await node.set("kept", "v")
+    await snapshotter.snapshot()
+    await node.set("changed", "new")  # Proses crash sebelum snapshot berikutnya
+
+    restarted, restarted_snapshotter = make_node(tmp_path)
+    assert await restarted_snapshotter.restore() == 1
+    assert restarted.peek("changed") is None
+    assert restarted.peek("kept") == "v"
+
+
+async def test_peer_journal_drops_keys_written_while_down(tmp_path, monkeypatch):
+    peer = CacheNode("c1", {})
+    peer._journal_floor = 0  # Peer sudah berjalan jauh sebelum snapshot
+    node, snapshotter = make_node(tmp_path, {"c1": "http://c1"})
+    await snapshotter.restore()
+    await node.store_local("a", 1)
+    await node.store_local("b", 2)
+    await snapshotter.snapshot()
+    await peer.set("a", 10)  # Ditulis di peer selama c0 mati
+
+    async def fake_send_rpc(peer_url, endpoint, data):
+        return await peer.handle_journal(data["since"])
+
+    monkeypatch.setattr(snapshot_module, "send_rpc", fake_send_rpc)
+    restarted, restarted_snapshotter = make_node(tmp_path, {"c1": "http://c1"})
+    assert await restarted_snapshotter.restore() == 1
+    assert restarted.peek("a") is None and restarted.peek("b") == 2
+
+    # Peer yang baru restart tidak bisa menjamin jurnalnya: snapshot dibuang
+    peer._journal_floor = float("inf")
+    cold, cold_snapshotter = make_node(tmp_path, {"c1": "http://c1"})
+    assert await cold_snapshotter.restore() == 0
+    assert cold.peek("b") is None
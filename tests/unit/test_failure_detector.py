@@ -0,0 +1,50 @@
+# tests/unit/test_failure_detector.py
+
+from src.communication.failure_detector import FailureDetector
+
+PEER = "http://node2:5002"
+
+
+def _detector_with_heartbeats(interval=0.075, count=50):
+    fd = FailureDetector(threshold=8.0, min_std=0.02, acceptable_pause=0.05, probe_interval=1.0)
+    now = 0.0
+    for _ in range(count):
+        fd.expect(PEER, now)
+        fd.heartbeat(PEER, now)
+        now += interval
+    return fd, now - interval
+
+
+def test_phi_grows_with_silence_while_awaiting_reply():
+    """Heartbeat teratur -> phi rendah; peer yang berhenti menjawab cepat dicurigai."""
+    fd, last = _detector_with_heartbeats()
+    fd.expect(PEER, last + 0.075)
+    assert fd.phi(PEER, last + 0.1) < 1
+    assert not fd.is_suspected(PEER, last + 0.1)
+    assert fd.is_suspected(PEER, last + 0.5)
+    # Bukti hidup baru langsung memulihkan status
+    fd.heartbeat(PEER, last + 0.6)
+    assert fd.phi(PEER, last + 0.6) == 0.0
+
+
+def test_idle_peer_is_not_suspected():
+    """Keheningan tanpa RPC yang menunggu jawaban bukan bukti kegagalan."""
+    fd, last = _detector_with_heartbeats()
+    assert not fd.is_suspected(PEER, last + 60)
+
+
+def test_unknown_peer_uses_first_heartbeat_estimate():
+    fd = FailureDetector(first_heartbeat_estimate=0.5, acceptable_pause=0.0, min_std=0.05)
+    fd.expect(PEER, 0.0)
+    assert not fd.is_suspected(PEER, 0.3)
+    assert fd.is_suspected(PEER, 5.0)
+
+
+def test_allow_request_lets_through_one_probe_per_interval():
+    fd, last = _detector_with_heartbeats()
+    fd.expect(PEER, last + 0.075)
+    now = last + 2.0
+    assert fd.is_suspected(PEER, now)
+    assert fd.allow_request(PEER, now)          # probe
+    assert not fd.allow_request(PEER, now + 0.5)
+    assert fd.allow_request(PEER, now + 1.0)    # probe berikutnya
@@ -0,0 +1,20 @@
+# tests/unit/test_lock_forward_redirect.py
+
+import pytest
+from src.nodes import base_node
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_redirect_points_at_client_url_of_leader(monkeypatch):
+    """LOCK_FORWARD_MODE=redirect: 307 menuju alamat leader untuk klien, bukan URL internal PEERS."""
+    monkeypatch.setattr(base_node, "LOCK_FORWARD_MODE", "redirect")
+    monkeypatch.setattr(base_node, "PEERS", {"node2": "http://node2:5002"})
+    monkeypatch.setattr(base_node, "CLIENT_URLS", {"node2": "http://localhost:5002"})
+    command = {"resource_id": "r1", "client_id": "c1", "lock_type": "exclusive"}
+    monkeypatch.setattr(base_node.multi_raft.group_for_command(command), "leader_id", "node2")
+
+    response = await base_node.app.test_client().post("/lock/acquire", json=command)
+
+    assert response.status_code == 307
+    assert response.headers["Location"] == "http://localhost:5002/lock/acquire"
@@ -14,7 +14,7 @@ async def test_lock_acquire_new():
     manager = LockManager()
     command = {"action": "acquire", "resource_id": "res1", "lock_type": "exclusive", "client_id": "c1"}
     result = await manager.apply_command(command)
-    assert result == {"success": True, "message": "Lock granted"}
+    assert result == {"success": True, "message": "Lock granted", "fencing_token": 1}
 
     status = manager.get_locks_status()
     assert "res1" in status["active_locks"]
@@ -51,13 +51,16 @@ async def test_lock_release():
     # c1 lepas res1
     command_release = {"action": "release", "resource_id": "res1", "client_id": "c1"}
     result_release = await manager.apply_command(command_release)
-    assert result_release == {"success": True, "message": "Lock released"}
+    assert result_release == {"success": True, "message": "Lock released", "granted": [["c2", 2]]}
 
     status = manager.get_locks_status()
-    assert "res1" not in status["active_locks"] # Lock sudah bebas
-    # Penting: Implementasi saat ini tidak otomatis memberi lock ke waiter.
-    # Wait list untuk res1 harusnya juga hilang KETIKA lock dihapus.
-    assert "res1" not in status["wait_list"] # Verifikasi ini sesuai kode terakhir Anda
+    # Lock langsung diberikan ke waiter terdepan (c2), wait list res1 kosong
+    assert status["active_locks"]["res1"]["owners"] == ["c2"]
+    assert "res1" not in status["wait_list"]
+
+    result_release = await manager.apply_command({"action": "release", "resource_id": "res1", "client_id": "c2"})
+    assert result_release == {"success": True, "message": "Lock released"}
+    assert "res1" not in manager.get_locks_status()["active_locks"] # Lock sudah bebas
 
 async def test_deadlock_detection_scenario_unit(caplog):
      """Tes skenario deadlock secara unit (jika logika bisa dipanggil langsung)."""
@@ -96,4 +99,183 @@ async def test_deadlock_detection_scenario_unit(caplog):
 
      # (Cleanup manual jika perlu untuk tes berikutnya)
      manager._internal_handle_release("X", "A")
-     manager._internal_handle_release("Y", "B")
\ No newline at end of file
+     manager._internal_handle_release("Y", "B")
+
+
+async def test_wait_for_graph_stays_consistent_with_lock_table():
+    """Graph inkremental harus sama dengan graph yang dibangun ulang dari _locks/_wait_list."""
+    import random
+    rng = random.Random(7)
+    manager = LockManager()
+    clients = [f"c{i}" for i in range(8)]
+    resources = [f"r{i}" for i in range(6)]
+    for _ in range(2000):
+        client, resource = rng.choice(clients), rng.choice(resources)
+        roll = rng.random()
+        if roll < 0.6:
+            manager._internal_handle_acquire(resource, rng.choice(["shared", "exclusive"]), client)
+        elif roll < 0.65:
+            manager._internal_handle_release_all(client)
+        else:
+            manager._internal_handle_release(resource, client)
+        incremental = {w: dict(edges) for w, edges in manager._wait_for.items()}
+        waiting_on = {c: set(r) for c, r in manager._waiting_on.items()}
+        held = {c: set(r) for c, r in manager._held.items()}
+        manager._rebuild_indexes()
+        assert incremental == {w: dict(edges) for w, edges in manager._wait_for.items()}
+        assert waiting_on == {c: set(r) for c, r in manager._waiting_on.items()}
+        assert held == {c: set(r) for c, r in manager._held.items()}
+
+
+async def test_deadlock_check_ignores_unrelated_waiters():
+    """Rantai panjang A->B->C->D terdeteksi, sementara ribuan waiter lain tidak disentuh DFS."""
+    manager = LockManager()
+    for i in range(5000):
+        manager._internal_handle_acquire(f"busy{i}", "exclusive", f"owner{i}")
+        manager._internal_handle_acquire(f"busy{i}", "exclusive", f"waiter{i}")
+    chain = ["A", "B", "C", "D"]
+    for client in chain:
+        manager._internal_handle_acquire(f"res_{client}", "exclusive", client)
+    for waiter, holder in zip(chain, chain[1:]):
+        assert "wait list" in manager._internal_handle_acquire(f"res_{holder}", "exclusive", waiter)["message"]
+    result = manager._internal_handle_acquire("res_A", "exclusive", "D")
+    assert "Deadlock detected" in result["message"]
+    assert "D" not in manager._wait_for
+
+
+async def test_release_all_frees_held_locks_and_wait_entries():
+    manager = LockManager()
+    for resource in ("r1", "r2", "r3"):
+        await manager.apply_command({"action": "acquire", "resource_id": resource, "lock_type": "shared", "client_id": "c1"})
+    await manager.apply_command({"action": "acquire", "resource_id": "r2", "lock_type": "shared", "client_id": "c2"})
+    await manager.apply_command({"action": "acquire", "resource_id": "x", "lock_type": "exclusive", "client_id": "c2"})
+    await manager.apply_command({"action": "acquire", "resource_id": "x", "lock_type": "exclusive", "client_id": "c1"})
+
+    result = await manager.apply_command({"action": "release_all", "client_id": "c1"})
+    assert result["success"] is True
+    assert result["released"] == ["r1", "r2", "r3"]
+    status = manager.get_locks_status()
+    assert status["active_locks"] == {"r2": {"type": "shared", "owners": ["c2"]},
+                                      "x": {"type": "exclusive", "owners": ["c2"]}}
+    assert status["wait_list"] == {}
+    assert "c1" not in manager._held and "c1" not in manager._waiting_on
+
+    # Index ikut terbangun ulang dari snapshot
+    restored = LockManager()
+    restored.restore_state(manager.snapshot_state())
+    assert restored._held == {"c2": {"r2", "x"}}
+
+
+async def test_lease_expires_on_tick_and_keepalive_extends_it():
+    manager = LockManager()
+    await manager.apply_command({"action": "acquire", "resource_id": "a", "lock_type": "exclusive", "client_id": "c1", "ttl": 5})
+    await manager.apply_command({"action": "acquire", "resource_id": "b", "lock_type": "exclusive", "client_id": "c2", "ttl": 5})
+    assert manager.needs_tick()
+    # Tick belum berjalan saat grant (clock bisa basi): lease mulai dihitung dari tick berikutnya
+    await manager.apply_command({"action": "tick", "now": 1000.0})
+
+    await manager.apply_command({"action": "tick", "now": 1004.0})
+    renewed = await manager.apply_command({"action": "keepalive", "client_id": "c1"})
+    assert renewed["renewed"] == ["a"]
+
+    result = await manager.apply_command({"action": "tick", "now": 1005.5})
+    assert result["expired"] == [["b", "c2"]]  # Lease c1 diperpanjang sampai 1009
+    assert "b" not in manager.get_locks_status()["active_locks"]
+
+    result = await manager.apply_command({"action": "tick", "now": 1009.0})
+    assert result["expired"] == [["a", "c1"]]
+    assert not manager.needs_tick()
+    late = await manager.apply_command({"action": "keepalive", "client_id": "c1", "resource_id": "a"})
+    assert late["success"] is False
+
+
+async def test_fencing_tokens_increase_and_reentry_keeps_token():
+    manager = LockManager()
+    first = await manager.apply_command({"action": "acquire", "resource_id": "a", "lock_type": "exclusive", "client_id": "c1"})
+    again = await manager.apply_command({"action": "acquire", "resource_id": "a", "lock_type": "exclusive", "client_id": "c1"})
+    assert again["fencing_token"] == first["fencing_token"] == 1
+    await manager.apply_command({"action": "release", "resource_id": "a", "client_id": "c1"})
+    second = await manager.apply_command({"action": "acquire", "resource_id": "a", "lock_type": "exclusive", "client_id": "c2"})
+    assert second["fencing_token"] == 2
+    assert manager.get_lock_info("a")["fencing_tokens"] == {"c2": 2}
+
+
+async def test_lease_deadlines_survive_snapshot_restore():
+    manager = LockManager()
+    # Lease yang diberikan sebelum tick pertama mulai dihitung dari tick pertama
+    await manager.apply_command({"action": "acquire", "resource_id": "a", "lock_type": "shared", "client_id": "c1", "ttl": 3})
+    await manager.apply_command({"action": "tick", "now": 50.0})
+    await manager.apply_command({"action": "acquire", "resource_id": "a", "lock_type": "shared", "client_id": "c2", "ttl": 10})
+
+    restored = LockManager()
+    restored.restore_state(manager.snapshot_state())
+    assert restored.snapshot_state() == manager.snapshot_state()
+    for replica in (manager, restored):
+        assert (await replica.apply_command({"action": "tick", "now": 53.0}))["expired"] == [["a", "c1"]]
+        assert (await replica.apply_command({"action": "tick", "now": 59.9}))["expired"] == []
+        assert (await replica.apply_command({"action": "tick", "now": 60.0}))["expired"] == [["a", "c2"]]
+    next_grant = await restored.apply_command({"action": "acquire", "resource_id": "a", "lock_type": "exclusive", "client_id": "c3"})
+    assert next_grant["fencing_token"] == 3
+
+
+async def test_release_grants_waiters_fifo_and_batches_shared():
+    manager = LockManager()
+    await manager.apply_command({"action": "acquire", "resource_id": "r", "lock_type": "exclusive", "client_id": "w0"})
+    for client, lock_type in [("s1", "shared"), ("s2", "shared"), ("x1", "exclusive"), ("s3", "shared")]:
+        result = await manager.apply_command({"action": "acquire", "resource_id": "r", "lock_type": lock_type, "client_id": client})
+        assert result["waiting"] is True
+
+    # s1 dan s2 diberikan bersama; s3 tetap di belakang x1 (FIFO, writer tidak kelaparan)
+    result = await manager.apply_command({"action": "release", "resource_id": "r", "client_id": "w0"})
+    assert result["granted"] == [["s1", 2], ["s2", 3]]
+    assert manager.get_lock_info("r")["waiters"] == ["x1", "s3"]
+
+    await manager.apply_command({"action": "release", "resource_id": "r", "client_id": "s1"})
+    result = await manager.apply_command({"action": "release", "resource_id": "r", "client_id": "s2"})
+    assert result["granted"] == [["x1", 4]]
+    result = await manager.apply_command({"action": "release", "resource_id": "r", "client_id": "x1"})
+    assert result["granted"] == [["s3", 5]]
+    assert manager._wait_for == {} and manager._waiting_on == {}
+
+
+async def test_watch_grant_wakes_on_grant_and_cancel_wait_reports_late_grant():
+    manager = LockManager()
+    await manager.apply_command({"action": "acquire", "resource_id": "r", "lock_type": "exclusive", "client_id": "a", "ttl": 5})
+    grant = manager.watch_grant("r", "b")
+    await manager.apply_command({"action": "acquire", "resource_id": "r", "lock_type": "exclusive", "client_id": "b", "ttl": 7})
+    assert not grant.done()
+
+    # Lease a habis lewat tick: b langsung diberi lock dengan ttl miliknya
+    await manager.apply_command({"action": "tick", "now": 100.0})
+    await manager.apply_command({"action": "tick", "now": 105.0})
+    assert grant.result() == {"success": True, "message": "Lock granted", "fencing_token": 2}
+    # Tidak ada lease lain yang berjalan: lease b mulai dihitung dari tick berikutnya
+    assert manager.get_lock_info("r")["lease_remaining"] == {"b": None}
+    await manager.apply_command({"action": "tick", "now": 106.0})
+    assert manager.get_lock_info("r")["lease_remaining"] == {"b": 7}
+
+    # cancel_wait yang kalah cepat dari grant mengembalikan grant tersebut
+    result = await manager.apply_command({"action": "cancel_wait", "resource_id": "r", "client_id": "b"})
+    assert result["fencing_token"] == 2
+    await manager.apply_command({"action": "acquire", "resource_id": "r", "lock_type": "exclusive", "client_id": "c"})
+    result = await manager.apply_command({"action": "cancel_wait", "resource_id": "r", "client_id": "c"})
+    assert result == {"success": True, "message": "Removed from wait list"}
+    assert manager.get_lock_info("r")["waiters"] == []
+
+
+async def test_restored_replica_expires_leases_on_same_tick_after_release():
+    """Keputusan lease berjalan/tertunda hanya bergantung pada state yang direplikasi."""
+    live = LockManager()
+    await live.apply_command({"action": "acquire", "resource_id": "r1", "lock_type": "exclusive", "client_id": "c1", "ttl": 5})
+    await live.apply_command({"action": "tick", "now": 100.0})
+    await live.apply_command({"action": "release", "resource_id": "r1", "client_id": "c1"})
+    restored = LockManager()
+    restored.restore_state(live.snapshot_state())
+
+    for replica in (live, restored):
+        await replica.apply_command({"action": "acquire", "resource_id": "r2", "lock_type": "exclusive", "client_id": "c2", "ttl": 10})
+        assert replica.needs_tick()
+        assert (await replica.apply_command({"action": "tick", "now": 109.0}))["expired"] == []
+        assert (await replica.apply_command({"action": "tick", "now": 118.9}))["expired"] == []
+        assert (await replica.apply_command({"action": "tick", "now": 119.0}))["expired"] == [["r2", "c2"]]
+    assert live.snapshot_state() == restored.snapshot_state()
@@ -0,0 +1,101 @@
+# tests/unit/test_membership.py
+
+import asyncio
+import pytest
+from src.communication import membership as membership_module
+from src.communication.membership import SwimMembership, ALIVE, DEAD
+from tests.unit.helpers import cluster_urls, install_fake_rpc, wait_for
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_swim_cluster(monkeypatch, size):
+    """Cluster SWIM in-process: n0 adalah seed, node lain hanya mengenal seed."""
+    urls = cluster_urls(size)
+    nodes = {
+        node_id: SwimMembership(node_id, url, {"n0": urls["n0"]}, probe_interval=0.02,
+                                indirect_probes=2, suspect_timeout=0.1)
+        for node_id, url in urls.items()
+    }
+    down = set()
+    pings = []
+
+    async def dispatch(node, endpoint, data):
+        if node.node_id in down:
+            return None
+        if endpoint == "swim/join":
+            return await node.handle_join(data)
+        if endpoint == "swim/ping":
+            pings.append(data["from"])
+            return await node.handle_ping(data)
+        if endpoint == "swim/ping_req":
+            return await node.handle_ping_req(data)
+        return None
+
+    install_fake_rpc(monkeypatch, [membership_module], {urls[node_id]: node for node_id, node in nodes.items()}, dispatch)
+    return nodes, down, pings
+
+
+async def test_nodes_discover_each_other_through_seed(monkeypatch):
+    nodes, _, _ = make_swim_cluster(monkeypatch, 6)
+    tasks = [asyncio.create_task(node.run()) for node in nodes.values()]
+    try:
+        await wait_for(lambda: all(len(node.peers) == 5 for node in nodes.values()))
+        assert nodes["n3"].peers["n5"] == "http://n5"
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def test_dead_member_is_removed_and_listeners_notified(monkeypatch):
+    nodes, down, _ = make_swim_cluster(monkeypatch, 5)
+    left = []
+    nodes["n1"].add_listener(lambda member_id, url, joined: left.append(member_id) if not joined else None)
+    tasks = {node_id: asyncio.create_task(node.run()) for node_id, node in nodes.items()}
+    try:
+        await wait_for(lambda: all(len(node.peers) == 4 for node in nodes.values()))
+        down.add("n4")
+        tasks.pop("n4").cancel()
+        await wait_for(lambda: all("n4" not in node.peers for node_id, node in nodes.items() if node_id != "n4"))
+        assert nodes["n2"].members["n4"]["state"] == DEAD
+        assert left == ["n4"]
+    finally:
+        for task in tasks.values():
+            task.cancel()
+
+
+async def test_live_member_refutes_suspicion(monkeypatch):
+    nodes, _, _ = make_swim_cluster(monkeypatch, 3)
+    tasks = [asyncio.create_task(node.run()) for node in nodes.values()]
+    try:
+        await wait_for(lambda: all(len(node.peers) == 2 for node in nodes.values()))
+        target = nodes["n0"].members["n2"]
+        nodes["n0"]._apply({"id": "n2", "url": target["url"], "state": "suspect",
+                            "incarnation": target["incarnation"]})
+        # n2 menerima gosip suspect tentang dirinya dan membantah dengan incarnation baru
+        await wait_for(lambda: nodes["n0"].members["n2"]["state"] == "alive"
+                        and nodes["n0"].members["n2"]["incarnation"] > target["incarnation"])
+        assert "n2" in nodes["n1"].peers
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def test_probe_traffic_is_one_ping_per_node_per_period(monkeypatch):
+    """Tanpa kegagalan, setiap node hanya mengirim satu ping per periode (trafik linear)."""
+    nodes, _, pings = make_swim_cluster(monkeypatch, 8)
+    for node in nodes.values():
+        await node.join()
+    for node in nodes.values():
+        await node._probe_round()
+    assert sorted(pings) == sorted(nodes)
+
+
+async def test_member_rejoining_with_new_url_updates_peers():
+    node = SwimMembership("n0", "http://n0", {})
+    events = []
+    node.add_listener(lambda member_id, url, joined: events.append((member_id, url, joined)))
+    node._apply({"id": "n2", "url": "http://old-n2", "state": ALIVE, "incarnation": 0})
+    node._apply({"id": "n2", "url": "http://new-n2", "state": ALIVE, "incarnation": 1})
+    assert node.peers["n2"] == node.members["n2"]["url"] == "http://new-n2"
+    assert events == [("n2", "http://old-n2", True), ("n2", "http://old-n2", False), ("n2", "http://new-n2", True)]
@@ -0,0 +1,98 @@
+# tests/unit/test_message_passing.py
+
+import asyncio
+import pytest
+from aiohttp import web
+from src.communication import message_passing
+from src.communication.message_passing import send_rpc, close_sessions, gather_until
+
+pytestmark = pytest.mark.asyncio
+
+
+async def _start_peer(handler):
+    """Peer HTTP lokal; mengembalikan (url, runner, daftar port klien per request)."""
+    client_ports = []
+
+    async def endpoint(request):
+        client_ports.append(request.transport.get_extra_info("peername")[1])
+        return await handler(request)
+
+    app = web.Application()
+    app.router.add_post("/{endpoint}", endpoint)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return f"http://127.0.0.1:{port}", runner, client_ports
+
+
+async def test_rpcs_to_same_peer_reuse_connection():
+    """RPC berurutan ke peer yang sama memakai koneksi keep-alive yang sama."""
+    async def echo(request):
+        return web.json_response(await request.json())
+
+    url, runner, client_ports = await _start_peer(echo)
+    try:
+        for i in range(5):
+            assert await send_rpc(url, "append_entries", {"i": i}) == {"i": i}
+        assert len(set(client_ports)) == 1
+    finally:
+        await close_sessions()
+        await runner.cleanup()
+
+
+async def test_endpoint_timeout_applies(monkeypatch):
+    """Endpoint dengan timeout pendek gagal cepat tanpa menunggu timeout default."""
+    async def slow(request):
+        await asyncio.sleep(1)
+        return web.json_response({})
+
+    monkeypatch.setitem(message_passing.RPC_ENDPOINT_TIMEOUTS, "pre_vote", 0.05)
+    url, runner, _ = await _start_peer(slow)
+    try:
+        started = asyncio.get_running_loop().time()
+        assert await send_rpc(url, "pre_vote", {}) is None
+        assert asyncio.get_running_loop().time() - started < 0.5
+    finally:
+        await close_sessions()
+        await runner.cleanup()
+
+
+async def test_gather_until_returns_at_quorum_and_cancels_stragglers():
+    """Hasil kembali begitu mayoritas sukses; peer yang hang tidak ditunggu."""
+    straggler = asyncio.Event()
+
+    async def fast(value):
+        return {"ok": value}
+
+    async def hang():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            straggler.set()
+            raise
+
+    started = asyncio.get_running_loop().time()
+    responses = await gather_until(
+        {"a": fast(1), "b": fast(2), "c": hang()},
+        lambda r: sum(1 for v in r.values() if v) >= 2,
+    )
+    assert set(responses) == {"a", "b"}
+    assert asyncio.get_running_loop().time() - started < 0.5
+    await asyncio.sleep(0)
+    assert straggler.is_set()
+
+
+async def test_gather_until_can_leave_stragglers_running():
+    """Dengan cancel_pending=False, call yang lambat tetap selesai di background."""
+    finished = asyncio.Event()
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        finished.set()
+        return {"ok": True}
+
+    responses = await gather_until({"slow": slow()}, timeout=0.01, cancel_pending=False)
+    assert responses == {}
+    await asyncio.wait_for(finished.wait(), 1.0)
@@ -0,0 +1,113 @@
+# tests/unit/test_multi_raft.py
+
+import asyncio
+import pytest
+from src.consensus import raft as raft_module
+from src.consensus import multi_raft as multi_raft_module
+from src.consensus.multi_raft import MultiRaft, HeartbeatBatcher
+from src.consensus.raft import NodeState
+from src.nodes.lock_manager import LockManager
+from tests.unit.helpers import cluster_urls, peers_of, install_fake_rpc, dispatch_raft_rpc, wait_for
+
+pytestmark = pytest.mark.asyncio
+
+
+def make_multi_cluster(monkeypatch, size=3, groups=3):
+    """Cluster Multi-Raft in-process: RPC diarahkan ke grup tujuan berdasarkan group_id."""
+    urls = cluster_urls(size)
+    nodes = {node_id: MultiRaft(node_id, peers_of(urls, node_id), groups, LockManager) for node_id in urls}
+    calls = []
+
+    async def dispatch(node, endpoint, data):
+        if endpoint == "append_entries_batch":
+            return {"responses": await node.handle_append_entries_batch(data["requests"])}
+        if endpoint == "client_request":
+            return await node.handle_client_request(data["command"], forwarded=True)
+        return await dispatch_raft_rpc(node.group(data.get("group_id")), endpoint, data)
+
+    install_fake_rpc(monkeypatch, [raft_module, multi_raft_module],
+                     {urls[node_id]: node for node_id, node in nodes.items()}, dispatch, calls)
+    return nodes, calls
+
+
+def _leaders(nodes):
+    """group_id -> node_id leader (hanya grup yang sudah punya leader)."""
+    leaders = {}
+    for node_id, node in nodes.items():
+        for group_id, group in node.groups.items():
+            if group.state == NodeState.LEADER:
+                leaders[group_id] = node_id
+    return leaders
+
+
+async def test_leadership_is_spread_across_nodes(monkeypatch):
+    """Setiap node memimpin grup 'preferred'-nya sehingga beban leader tersebar."""
+    nodes, calls = make_multi_cluster(monkeypatch)
+    tasks = [asyncio.create_task(node.run()) for node in nodes.values()]
+    try:
+        await wait_for(lambda: len(_leaders(nodes)) == 3)
+        assert sorted(_leaders(nodes).values()) == ["n0", "n1", "n2"]
+
+        # Heartbeat grup-grup yang idle dikirim lewat RPC gabungan
+        await asyncio.sleep(0.3)
+        assert any(c[1] == "append_entries_batch" for c in calls)
+        assert not [c for c in calls if c[1] == "append_entries" and not c[2]["entries"]]
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def test_commands_are_routed_to_owning_group(monkeypatch):
+    """Command dan pembacaan untuk resource_id yang sama selalu ditangani grup yang sama."""
+    nodes, _ = make_multi_cluster(monkeypatch)
+    tasks = [asyncio.create_task(node.run()) for node in nodes.values()]
+    try:
+        await wait_for(lambda: len(_leaders(nodes)) == 3)
+        entry = nodes["n0"]
+        await wait_for(lambda: all(group.leader_id for group in entry.groups.values()))
+        resources = [f"res-{i}" for i in range(30)]
+        results = await asyncio.gather(*(entry.handle_client_request(
+            {"action": "acquire", "resource_id": r, "lock_type": "exclusive", "client_id": "c1"}) for r in resources))
+        assert all(r["success"] for r in results)
+
+        owning_groups = {entry.group_for(r).group_id for r in resources}
+        assert len(owning_groups) > 1
+        leaders = _leaders(nodes)
+        for resource_id in resources:
+            group_id = entry.group_for(resource_id).group_id
+            owner = nodes[leaders[group_id]].groups[group_id]
+            assert resource_id in owner.lock_manager.get_locks_status()["active_locks"]
+        # Follower grup menerapkan commit lewat heartbeat berikutnya
+        await wait_for(lambda: set(entry.get_locks_status()["active_locks"]) == set(resources))
+
+        info = await nodes["n2"].read_lock_info("res-7")
+        assert info["success"] and info["owners"] == ["c1"]
+
+        # release_all diajukan ke semua grup karena resource c1 tersebar
+        result = await nodes["n1"].handle_client_request_all({"action": "release_all", "client_id": "c1"})
+        assert result["success"] and result["released"] == sorted(resources)
+        await wait_for(lambda: not entry.get_locks_status()["active_locks"])
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def test_heartbeat_batcher_resolves_every_future_on_rpc_failure(monkeypatch):
+    """Error RPC atau respons yang kurang tidak boleh membuat replikator grup menunggu selamanya."""
+    async def short_send_rpc(peer_url, endpoint, data):
+        return {"responses": [{"term": 1, "success": True}]}
+
+    async def failing_send_rpc(peer_url, endpoint, data):
+        raise ConnectionError("peer reset")
+
+    batcher = HeartbeatBatcher(window=0.01)
+    monkeypatch.setattr(multi_raft_module, "send_rpc", short_send_rpc)
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.send("n1", "http://n1", {"group_id": g})
+                                                      for g in range(3))), timeout=1)
+    assert results == [{"term": 1, "success": True}, None, None]
+
+    monkeypatch.setattr(multi_raft_module, "send_rpc", failing_send_rpc)
+    results = await asyncio.wait_for(asyncio.gather(*(batcher.send("n1", "http://n1", {"group_id": g})
+                                                      for g in range(2))), timeout=1)
+    assert results == [None, None]
+    assert batcher._pending == {}
@@ -0,0 +1,303 @@
+# tests/unit/test_raft_replication.py
+
+import asyncio
+import pytest
+from src.consensus import raft as raft_module
+from src.consensus.raft import RaftNode, NodeState
+from src.nodes.lock_manager import LockManager
+from tests.unit.helpers import cluster_urls, peers_of, install_fake_rpc, dispatch_raft_rpc, wait_for
+
+pytestmark = pytest.mark.asyncio
+
+
+def _acquire(resource_id, client_id):
+    return {"action": "acquire", "resource_id": resource_id, "lock_type": "exclusive", "client_id": client_id}
+
+
+def make_cluster(monkeypatch, size=3):
+    """Cluster Raft in-process: send_rpc diarahkan langsung ke handler node tujuan."""
+    urls = cluster_urls(size)
+    nodes = {node_id: RaftNode(node_id, peers_of(urls, node_id), LockManager()) for node_id in urls}
+    calls = []
+    install_fake_rpc(monkeypatch, [raft_module], {urls[node_id]: node for node_id, node in nodes.items()},
+                     dispatch_raft_rpc, calls)
+    return nodes, calls
+
+
+async def test_concurrent_commands_share_one_batch(monkeypatch):
+    """Command yang datang bersamaan dikirim dalam satu AppendEntries per follower."""
+    nodes, calls = make_cluster(monkeypatch)
+    leader = nodes["n0"]
+    leader.current_term = 1
+    leader._become_leader()
+
+    results = await asyncio.gather(*(leader.handle_client_request(_acquire(f"r{i}", "c1")) for i in range(10)))
+
+    assert all(r["success"] for r in results)
+    append_calls = [c for c in calls if c[1] == "append_entries" and c[2]["entries"]]
+    assert len(append_calls) == 2  # satu batch x dua follower (heartbeat tidak dihitung)
+    assert len(append_calls[0][2]["entries"]) == 11  # 10 command + no-op leader baru
+    assert leader.commit_index == 10
+    assert "r9" in leader.lock_manager.get_locks_status()["active_locks"]
+
+
+async def test_client_gets_state_machine_result(monkeypatch):
+    """Setiap klien menerima hasil command-nya sendiri dari state machine."""
+    nodes, _ = make_cluster(monkeypatch)
+    leader = nodes["n0"]
+    leader.current_term = 1
+    leader._become_leader()
+
+    first, second = await asyncio.gather(
+        leader.handle_client_request(_acquire("res", "c1")),
+        leader.handle_client_request(_acquire("res", "c2")),
+    )
+    assert first == {"success": True, "message": "Lock granted", "fencing_token": 1}
+    assert second["success"] is False and "wait list" in second["message"]
+
+
+async def test_follower_accepts_out_of_order_batches():
+    """Batch lama yang tiba terlambat tidak boleh memotong entri yang lebih baru."""
+    follower = RaftNode("n1", {}, LockManager())
+    batch1 = [{"term": 1, "command": _acquire("a", "c1")}]
+    batch2 = [{"term": 1, "command": _acquire("b", "c1")}]
+
+    resp = await follower.handle_append_entries(1, "n0", 0, 1, batch2, -1)
+    assert resp["success"] is False  # index 0 belum ada
+
+    await follower.handle_append_entries(1, "n0", -1, 0, batch1 + batch2, -1)
+    await follower.handle_append_entries(1, "n0", -1, 0, batch1, -1)  # duplikat terlambat
+    assert len(follower.log) == 2
+
+
+async def test_not_leader_is_rejected():
+    node = RaftNode("n1", {}, LockManager())
+    result = await node.handle_client_request(_acquire("a", "c1"))
+    assert result["success"] is False
+    assert node.state == NodeState.FOLLOWER
+
+
+async def test_lagging_follower_catches_up_in_chunks(monkeypatch):
+    """Follower yang jauh tertinggal disusulkan dengan chunk besar, bukan satu entri per RPC."""
+    nodes, calls = make_cluster(monkeypatch)
+    leader = nodes["n0"]
+    leader.current_term = 1
+    leader.log = [{"term": 1, "command": _acquire(f"r{i}", "c1")} for i in range(1000)]
+    leader._durable_index = 999
+    leader._become_leader()
+    for event in leader._peer_events.values():
+        event.set()
+
+    await wait_for(lambda: all(m == 999 for m in leader.match_index.values()))
+    assert len(nodes["n1"].log) == 1000
+    # 1 probe yang ditolak + 2 chunk (512 + 488) per follower
+    assert len([c for c in calls if c[0] == "http://n1"]) <= 4
+
+
+async def test_conflict_term_hint_skips_whole_term(monkeypatch):
+    """Follower dengan entri term lama yang konflik mundur satu term sekaligus."""
+    nodes, calls = make_cluster(monkeypatch)
+    leader, follower = nodes["n0"], nodes["n1"]
+    leader.current_term = 3
+    leader.log = [{"term": t, "command": _acquire(f"r{i}", "c1")} for i, t in enumerate([1, 1, 3, 3, 3, 3])]
+    leader._durable_index = 5
+    follower.current_term = 2
+    follower.log = [{"term": t, "command": _acquire(f"x{i}", "c2")} for i, t in enumerate([1, 1] + [2] * 50)]
+
+    resp = await follower.handle_append_entries(3, "n0", 5, 3, [], -1)
+    assert resp["success"] is False
+    assert (resp["conflict_index"], resp["conflict_term"]) == (2, 2)
+
+    leader._become_leader()
+    for event in leader._peer_events.values():
+        event.set()
+    await wait_for(lambda: leader.match_index["n1"] == 6)  # termasuk no-op term 3
+    assert [e["term"] for e in follower.log] == [1, 1, 3, 3, 3, 3, 3]
+    assert len([c for c in calls if c[0] == "http://n1" and c[2]["entries"]]) <= 2
+
+
+async def test_snapshot_compacts_log_and_installs_on_new_follower(monkeypatch):
+    """Log dipangkas setelah snapshot; follower baru disusulkan lewat InstallSnapshot bertahap."""
+    monkeypatch.setattr(raft_module, "SNAPSHOT_THRESHOLD", 20)
+    monkeypatch.setattr(raft_module, "SNAPSHOT_CHUNK_SIZE", 64)
+    nodes, calls = make_cluster(monkeypatch)
+    leader, lagging = nodes["n0"], nodes["n2"]
+    leader.current_term = 1
+    leader._become_leader()
+
+    # n2 "mati" selama 30 command pertama
+    lagging_handler = lagging._handle_append_entries
+    async def unreachable(*args):
+        return {"term": 0, "success": False, "conflict_index": 0, "conflict_term": None}
+    lagging._handle_append_entries = unreachable
+
+    for i in range(30):
+        await leader.handle_client_request(_acquire(f"r{i}", "c1"))
+    await wait_for(lambda: leader.snapshot_index >= 19)
+    assert len(leader.log) == leader._last_log_index() - leader.snapshot_index
+
+    lagging._handle_append_entries = lagging_handler
+    await wait_for(lambda: leader.match_index["n2"] == leader._last_log_index())
+    assert lagging.snapshot_index == leader.snapshot_index
+    assert "r0" in lagging.lock_manager.get_locks_status()["active_locks"]
+    assert len([c for c in calls if c[1] == "install_snapshot"]) > 1  # dikirim dalam beberapa chunk
+
+
+async def test_read_index_reads_are_linearizable(monkeypatch):
+    """Leader dan follower membaca state yang mencakup semua command yang sudah dikonfirmasi."""
+    monkeypatch.setattr(raft_module, "LEASE_READS", False)
+    nodes, calls = make_cluster(monkeypatch)
+    leader, follower = nodes["n0"], nodes["n1"]
+    leader.current_term = 1
+    leader._become_leader()
+    await leader.handle_client_request(_acquire("res", "c1"))
+
+    result = await leader.linearizable_read(lambda: leader.lock_manager.get_lock_info("res"))
+    assert result["success"] and result["owners"] == ["c1"]
+
+    # Follower membaca lewat read index dari leader, lalu menunggu state machine lokal menyusul
+    await follower.handle_append_entries(1, "n0", -1, 0, [], -1)
+    result = await follower.linearizable_read(lambda: follower.lock_manager.get_lock_info("res"))
+    assert result["success"] and result["owners"] == ["c1"]
+    assert any(c[1] == "read_index" for c in calls)
+
+
+async def test_lease_read_skips_heartbeat_round(monkeypatch):
+    """Selama lease berlaku, pembacaan di leader tidak butuh RPC tambahan."""
+    nodes, calls = make_cluster(monkeypatch)
+    leader = nodes["n0"]
+    leader.current_term = 1
+    leader._become_leader()
+    await leader.handle_client_request(_acquire("res", "c1"))
+
+    calls.clear()
+    results = await asyncio.gather(*(leader.linearizable_read(lambda: {}) for _ in range(10)))
+    assert all(r["success"] for r in results)
+    assert calls == []
+
+
+async def test_partitioned_leader_cannot_serve_reads(monkeypatch):
+    """Leader lama yang terisolasi tidak boleh melayani pembacaan basi."""
+    monkeypatch.setattr(raft_module, "READ_INDEX_TIMEOUT", 0.2)
+    nodes, _ = make_cluster(monkeypatch)
+    leader = nodes["n0"]
+    leader.current_term = 1
+    leader._become_leader()
+    await leader.handle_client_request(_acquire("res", "c1"))
+
+    async def partitioned(*args):
+        return None
+    monkeypatch.setattr(raft_module, "send_rpc", partitioned)
+    leader._last_ack_sent = {}  # lease habis
+
+    result = await leader.linearizable_read(lambda: {})
+    assert result["success"] is False
+
+
+async def test_follower_ignores_votes_while_leader_alive(monkeypatch):
+    """Follower yang baru mendengar leader menolak candidate lain (syarat keamanan lease)."""
+    follower = RaftNode("n1", {}, LockManager())
+    await follower.handle_append_entries(1, "n0", -1, 0, [], -1)
+
+    resp = await follower.handle_request_vote(5, "n2", 10, 4)
+    assert resp["vote_granted"] is False
+    assert follower.current_term == 1
+
+
+async def test_election_finishes_without_waiting_for_dead_peer(monkeypatch):
+    """Candidate menang begitu mayoritas memberi suara, tanpa menunggu peer yang hang."""
+    nodes, _ = make_cluster(monkeypatch)
+    dispatch = raft_module.send_rpc
+
+    async def one_peer_hangs(peer_url, endpoint, data):
+        if peer_url == "http://n2":
+            await asyncio.sleep(10)
+        return await dispatch(peer_url, endpoint, data)
+    monkeypatch.setattr(raft_module, "send_rpc", one_peer_hangs)
+
+    candidate = nodes["n0"]
+    candidate.state = NodeState.CANDIDATE
+    started = asyncio.get_running_loop().time()
+    await candidate._run_candidate()
+
+    assert candidate.state == NodeState.LEADER
+    assert candidate.current_term == 1
+    assert asyncio.get_running_loop().time() - started < 0.2
+
+
+async def test_pre_vote_does_not_disrupt_live_leader(monkeypatch):
+    """Node yang terputus sesaat tidak menaikkan term selama mayoritas masih mendengar leader."""
+    nodes, _ = make_cluster(monkeypatch)
+    leader, follower, rejoining = nodes["n0"], nodes["n1"], nodes["n2"]
+    async def unreachable(*args):
+        return None
+    rejoining._handle_append_entries = unreachable  # n2 tidak menerima heartbeat leader
+    leader.current_term = 1
+    leader._become_leader()
+    await follower.handle_append_entries(1, "n0", -1, 0, [], -1)
+
+    rejoining.state = NodeState.CANDIDATE
+    await rejoining._run_candidate()
+
+    assert rejoining.state == NodeState.FOLLOWER
+    assert rejoining.current_term == 1  # hanya mengikuti term leader dari respons pre-vote
+    assert follower.current_term == 1 and follower.leader_id == "n0"
+    assert leader.state == NodeState.LEADER and leader.current_term == 1
+
+
+async def test_follower_forwards_commands_to_leader(monkeypatch):
+    """Command yang masuk ke follower diteruskan ke leader dan hasilnya dikembalikan ke klien."""
+    nodes, calls = make_cluster(monkeypatch)
+    leader, follower = nodes["n0"], nodes["n1"]
+    leader.current_term = 1
+    leader._become_leader()
+    await wait_for(lambda: follower.leader_id == "n0")
+
+    result = await follower.handle_client_request(_acquire("res", "c1"))
+    assert result == {"success": True, "message": "Lock granted", "fencing_token": 1}
+    assert "res" in leader.lock_manager.get_locks_status()["active_locks"]
+    assert [c[0] for c in calls if c[1] == "client_request"] == ["http://n0"]
+
+
+async def test_forwarded_command_is_not_forwarded_again(monkeypatch):
+    """Leader lama yang menerima command hasil forward menolak, bukan meneruskan lagi."""
+    nodes, calls = make_cluster(monkeypatch)
+    stale = nodes["n1"]
+    stale.leader_id = "n2"
+
+    result = await stale.handle_client_request(_acquire("res", "c1"), forwarded=True)
+    assert result["success"] is False and result["leader"] == "n2"
+    assert not [c for c in calls if c[1] == "client_request"]
+
+
+async def test_blocking_acquire_on_follower_is_woken_by_release(monkeypatch):
+    """Acquire blocking di follower menunggu grant yang diterapkan lokal, tanpa polling ke leader."""
+    nodes, calls = make_cluster(monkeypatch)
+    leader, follower = nodes["n0"], nodes["n1"]
+    leader.current_term = 1
+    leader._become_leader()
+    await wait_for(lambda: follower.leader_id == "n0")
+    await leader.handle_client_request(_acquire("res", "c1"))
+
+    waiting = asyncio.create_task(follower.handle_blocking_acquire(_acquire("res", "c2"), wait=5))
+    await wait_for(lambda: "c2" in leader.lock_manager.get_lock_info("res")["waiters"])
+    forwarded = len([c for c in calls if c[1] == "client_request"])
+    await leader.handle_client_request({"action": "release", "resource_id": "res", "client_id": "c1"})
+
+    assert await waiting == {"success": True, "message": "Lock granted", "fencing_token": 2}
+    assert len([c for c in calls if c[1] == "client_request"]) == forwarded  # tidak ada request tambahan
+    assert follower.lock_manager._grant_watchers == {}
+
+
+async def test_blocking_acquire_timeout_leaves_wait_list(monkeypatch):
+    nodes, _ = make_cluster(monkeypatch)
+    leader = nodes["n0"]
+    leader.current_term = 1
+    leader._become_leader()
+    await leader.handle_client_request(_acquire("res", "c1"))
+
+    result = await leader.handle_blocking_acquire(_acquire("res", "c2"), wait=0.05)
+    assert result == {"success": False, "message": "Timed out waiting for lock"}
+    assert leader.lock_manager.get_lock_info("res")["waiters"] == []
+    release = await leader.handle_client_request({"action": "release", "resource_id": "res", "client_id": "c1"})
+    assert "granted" not in release
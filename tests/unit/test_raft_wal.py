@@ -0,0 +1,203 @@
+# tests/unit/test_raft_wal.py
+
+import asyncio
+import base64
+import os
+import time
+import pytest
+from src.consensus.wal import WriteAheadLog
+from src.consensus.snapshot import SnapshotStore, encode_snapshot
+from src.consensus.raft import RaftNode
+from src.nodes.lock_manager import LockManager
+from src.utils.metrics import metrics_data
+
+pytestmark = pytest.mark.asyncio
+
+
+def _entry(term, i):
+    return {"term": term, "command": {"action": "acquire", "resource_id": f"r{i}", "client_id": "c1"}}
+
+
+async def test_wal_recovers_entries_and_hard_state(tmp_path):
+    """Entri dan hard state harus kembali utuh setelah restart."""
+    wal = WriteAheadLog(str(tmp_path))
+    wal.load()
+    await wal.save_hard_state(3, "node2")
+    await wal.append(0, [_entry(1, 0), _entry(1, 1)])
+    await wal.append(2, [_entry(3, 2)])
+    await wal.close()
+
+    term, voted_for, entries = WriteAheadLog(str(tmp_path)).load()
+    assert (term, voted_for) == (3, "node2")
+    assert [e["term"] for e in entries] == [1, 1, 3]
+    assert entries[2]["command"]["resource_id"] == "r2"
+
+
+async def test_wal_truncate_is_replayed(tmp_path):
+    """Truncate karena konflik log harus ikut di-replay saat recovery."""
+    wal = WriteAheadLog(str(tmp_path))
+    wal.load()
+    await wal.append(0, [_entry(1, i) for i in range(4)])
+    await wal.truncate(2)
+    await wal.append(2, [_entry(2, 2)])
+    await wal.close()
+
+    _, _, entries = WriteAheadLog(str(tmp_path)).load()
+    assert [e["term"] for e in entries] == [1, 1, 2]
+
+
+async def test_wal_group_commit_batches_concurrent_appends(tmp_path):
+    """Append yang bersamaan harus digabung ke dalam jauh lebih sedikit fsync."""
+    wal = WriteAheadLog(str(tmp_path))
+    wal.load()
+    fsyncs_before = metrics_data["raft_wal_fsyncs"]["value"]
+
+    await asyncio.gather(*(wal.append(i, [_entry(1, i)]) for i in range(50)))
+    await wal.close()
+
+    fsyncs = metrics_data["raft_wal_fsyncs"]["value"] - fsyncs_before
+    assert 1 <= fsyncs < 50
+    _, _, entries = WriteAheadLog(str(tmp_path)).load()
+    assert len(entries) == 50
+
+
+async def test_wal_torn_tail_is_discarded(tmp_path):
+    """Record terakhir yang terpotong (crash saat write) dibuang saat recovery."""
+    wal = WriteAheadLog(str(tmp_path))
+    wal.load()
+    await wal.append(0, [_entry(1, 0), _entry(1, 1)])
+    await wal.close()
+
+    segment = sorted(p for p in os.listdir(tmp_path) if p.endswith(".log"))[-1]
+    with open(os.path.join(tmp_path, segment), "ab") as f:
+        f.write(b"\x40\x00\x00\x00garbage")
+
+    wal = WriteAheadLog(str(tmp_path))
+    _, _, entries = wal.load()
+    assert len(entries) == 2
+    await wal.append(2, [_entry(1, 2)])
+    await wal.close()
+    _, _, entries = WriteAheadLog(str(tmp_path)).load()
+    assert len(entries) == 3
+
+
+async def test_wal_rolls_segments(tmp_path):
+    """Segmen baru dibuat saat ukuran segmen terlampaui tanpa kehilangan entri."""
+    wal = WriteAheadLog(str(tmp_path), segment_size=256)
+    wal.load()
+    for i in range(20):
+        await wal.append(i, [_entry(1, i)])
+    await wal.close()
+
+    assert len([p for p in os.listdir(tmp_path) if p.endswith(".log")]) > 1
+    _, _, entries = WriteAheadLog(str(tmp_path)).load()
+    assert len(entries) == 20
+
+
+async def test_compaction_drops_old_segments_and_recovers_from_snapshot(tmp_path):
+    """Setelah snapshot, segmen lama dihapus dan recovery hanya me-replay sisa log."""
+    wal = WriteAheadLog(str(tmp_path), segment_size=256)
+    store = SnapshotStore(str(tmp_path))
+    node = RaftNode("n1", {}, LockManager(), storage=wal, snapshot_store=store)
+    entries = [{"term": 1, "command": _entry(1, i)["command"]} for i in range(30)]
+    await node._append_to_log(entries)
+    node.commit_index = 24
+    await node._apply_log_entries()
+
+    segments_before = len([p for p in os.listdir(tmp_path) if p.endswith(".log")])
+    await node._save_snapshot(24, 1, encode_snapshot(24, 1, node.lock_manager.snapshot_state()))
+    await wal.close()
+    assert len([p for p in os.listdir(tmp_path) if p.endswith(".log")]) < segments_before
+
+    restarted = RaftNode("n1", {}, LockManager(), storage=WriteAheadLog(str(tmp_path)),
+                         snapshot_store=SnapshotStore(str(tmp_path)))
+    assert restarted.snapshot_index == 24
+    assert restarted._last_log_index() == 29  # entri 25..29 di-replay dari WAL
+    active = restarted.lock_manager.get_locks_status()["active_locks"]
+    assert "r24" in active and "r25" not in active
+
+
+async def test_wal_truncate_then_roll_survives_reload(tmp_path):
+    """Segmen yang dibuka setelah truncate ke index lama tetap di-replay sesudah segmen yang lebih tua."""
+    wal = WriteAheadLog(str(tmp_path), segment_size=300)
+    wal.load()
+    for i in range(12):
+        await wal.append(i, [_entry(1, i)])
+    await wal.truncate(5)
+    for i in range(5, 12):
+        await wal.append(i, [_entry(2, i)])
+    await wal.close()
+
+    _, _, entries = WriteAheadLog(str(tmp_path)).load()
+    assert [e["term"] for e in entries] == [1] * 5 + [2] * 7
+
+
+async def test_local_snapshot_never_overwrites_installed_snapshot(tmp_path):
+    """Snapshot lokal yang lebih lama, meski selesai belakangan, tidak menimpa snapshot dari InstallSnapshot."""
+    store = SnapshotStore(str(tmp_path))
+    assert store.save(encode_snapshot(10, 1, {}), 10) is True
+    assert store.save(encode_snapshot(4, 1, {}), 4) is False
+    assert SnapshotStore(str(tmp_path)).load() == encode_snapshot(10, 1, {})
+
+    node_dir = tmp_path / "node"
+    node = RaftNode("n1", {}, LockManager(), storage=WriteAheadLog(str(node_dir)),
+                    snapshot_store=SnapshotStore(str(node_dir)))
+    await node._append_to_log([{"term": 1, "command": _entry(1, i)["command"]} for i in range(5)])
+    node.commit_index = 4
+    await node._apply_log_entries()
+    local = asyncio.create_task(node._save_snapshot(4, 1, encode_snapshot(4, 1, node.lock_manager.snapshot_state())))
+    installed = LockManager()
+    await installed.apply_command(_entry(1, 99)["command"])
+    data = encode_snapshot(20, 2, installed.snapshot_state())
+    resp = await node.handle_install_snapshot(2, "n0", 20, 2, 0, base64.b64encode(data).decode("ascii"), True)
+    await local
+    await node.storage.close()
+
+    assert resp["success"] and node.snapshot_index == 20
+    assert SnapshotStore(str(node_dir)).load() == data
+
+
+class SlowWAL(WriteAheadLog):
+    """WAL yang menulis record bertipe 'slow_kind' dengan lambat, untuk menguji interleaving handler."""
+
+    def __init__(self, data_dir, slow_kind):
+        super().__init__(data_dir)
+        self.slow_kind = slow_kind
+
+    def _write_batch(self, records):
+        if any(record["t"] == self.slow_kind for record in records):
+            time.sleep(0.2)
+        super()._write_batch(records)
+
+
+async def test_append_entries_during_install_snapshot_sees_new_snapshot_index(tmp_path):
+    """AppendEntries yang tiba saat WAL InstallSnapshot masih ditulis tidak boleh memakai snapshot_index lama."""
+    node = RaftNode("n1", {}, LockManager(), storage=SlowWAL(str(tmp_path), "x"))
+    x, y = _entry(1, 0), _entry(1, 1)
+    await node._append_to_log([x])
+
+    data = encode_snapshot(10, 2, LockManager().snapshot_state())
+    install = asyncio.create_task(
+        node.handle_install_snapshot(2, "n0", 10, 2, 0, base64.b64encode(data).decode("ascii"), True))
+    await asyncio.sleep(0.05)
+    resp = await node.handle_append_entries(2, "n0", -1, 0, [x, y], -1)
+    assert (await install)["success"] and resp["success"]
+    await node.storage.close()
+
+    assert node.snapshot_index == 10 and node.log == []
+    assert WriteAheadLog(str(tmp_path)).load(10)[2] == []
+
+
+async def test_matching_entry_is_acked_only_after_it_is_durable(tmp_path):
+    """Entri yang sudah ada di memori tapi belum di-fsync tidak boleh di-ack oleh AppendEntries lain."""
+    node = RaftNode("n1", {}, LockManager(), storage=SlowWAL(str(tmp_path), "e"))
+    entry = _entry(1, 0)
+    first = asyncio.create_task(node.handle_append_entries(1, "n0", -1, 0, [entry], -1))
+    await asyncio.sleep(0.05)
+    second = asyncio.create_task(node.handle_append_entries(1, "n0", -1, 0, [entry], -1))
+    await asyncio.sleep(0.05)
+    assert not second.done()
+
+    assert (await first)["success"] and (await second)["success"]
+    await node.storage.close()
+    assert len(WriteAheadLog(str(tmp_path)).load()[2]) == 1
@@ -0,0 +1,36 @@
+# tests/unit/test_timing_wheel.py
+
+from src.utils.timing_wheel import TimingWheel
+
+
+def test_timers_fire_at_deadline_across_levels():
+    """Timer di level atas turun (cascade) dan kedaluwarsa tepat pada tick-nya."""
+    wheel = TimingWheel(tick=1, slots=4, levels=3, start=0)
+    deadlines = {"a": 2, "b": 5, "c": 17, "d": 40, "e": 100}  # 100 melewati horizon 4^3 tick
+    for key, deadline in deadlines.items():
+        wheel.schedule(key, deadline)
+
+    fired = {}
+    for now in range(0, 120):
+        for key in wheel.advance(now):
+            fired[key] = now
+    assert fired == deadlines
+    assert len(wheel) == 0
+
+
+def test_cancel_and_reschedule():
+    wheel = TimingWheel(tick=1, slots=4, levels=2, start=0)
+    wheel.schedule("a", 3)
+    wheel.schedule("b", 3)
+    wheel.cancel("a")
+    wheel.schedule("b", 9)  # Schedule ulang menggantikan deadline lama
+    assert wheel.advance(5) == []
+    assert "b" in wheel and "a" not in wheel
+    assert wheel.advance(9) == ["b"]
+
+
+def test_past_deadline_fires_on_next_tick():
+    wheel = TimingWheel(tick=0.5, slots=8, levels=2, start=0)
+    assert wheel.advance(10) == []
+    wheel.schedule("late", 1)
+    assert wheel.advance(10.5) == ["late"]